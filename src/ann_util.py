@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))  # Inverted lists scanned per query, higher is slower but more exact
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64  # Training rows per centroid, k-means never sees more than this
+ASSIGN_BLOCK_ROWS = 8192
+
+
+def default_lists(count: int) -> int:
+    return max(1, int(np.sqrt(count)))
+
+
+def _rows(matrix, start, end, scales=None):
+    rows = np.asarray(matrix[start:end], dtype=np.float32)
+    if scales is not None:
+        rows = rows * scales[start:end, None]
+    return rows
+
+
+def _nearest(matrix, centroids, scales=None):
+    assignments = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), ASSIGN_BLOCK_ROWS):
+        block = _rows(matrix, start, start + ASSIGN_BLOCK_ROWS, scales)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def spherical_kmeans(vectors, n_lists: int, iterations=KMEANS_ITERATIONS, seed=0):
+    """Clusters row-normalized vectors by cosine similarity, returning unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        # Lists that lost every member are reseeded on random rows rather than left empty.
+        empty = np.flatnonzero(np.bincount(assignments, minlength=n_lists) == 0)
+        sums[empty] = vectors[rng.choice(len(vectors), size=len(empty), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index over the rows of a VectorIndex matrix.
+
+    Rows are grouped under their nearest k-means centroid. The rows of list l are
+    order[offsets[l]:offsets[l + 1]], so a query only scores the nprobe closest lists.
+    """
+
+    def __init__(self, centroids, offsets, order):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.order = order
+
+    @classmethod
+    def build(cls, matrix, scales=None, n_lists=None, iterations=KMEANS_ITERATIONS, seed=0):
+        n_lists = min(n_lists or default_lists(len(matrix)), len(matrix))
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(matrix), n_lists * KMEANS_SAMPLE_PER_LIST)
+        sample = np.sort(rng.choice(len(matrix), size=sample_size, replace=False))
+        training = np.asarray(matrix[sample], dtype=np.float32)
+        if scales is not None:
+            training = training * scales[sample, None]
+        centroids = spherical_kmeans(_normalize(training), n_lists, iterations, seed)
+
+        assignments = _nearest(matrix, centroids, scales)
+        order = np.argsort(assignments, kind="stable").astype(np.int32)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=n_lists), out=offsets[1:])
+        return cls(centroids, offsets, order)
+
+    def __len__(self):
+        return len(self.centroids)
+
+    def candidates(self, query, nprobe=ANN_NPROBE):
+        """Returns the row ids stored in the nprobe lists closest to a unit-length query."""
+        nprobe = min(nprobe, len(self))
+        lists = np.argpartition(self.centroids @ query, -nprobe)[-nprobe:]
+        return np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists])
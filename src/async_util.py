@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+
+class AsyncRuntime:
+    """A single event loop running on a daemon thread for the lifetime of the process.
+
+    Coroutines from any thread are scheduled onto it with submit() or run(), so async clients
+    created for this loop keep their connection pools between questions.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run_loop, daemon=True)
+                self._thread.start()
+
+    def submit(self, coro):
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        return self.submit(coro).result(timeout)
+
+
+runtime = AsyncRuntime()
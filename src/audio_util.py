@@ -0,0 +1,291 @@
+import contextvars
+import functools
+import io
+import os
+import re
+import subprocess
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from pydub import AudioSegment
+from scipy.signal import resample_poly
+
+from trace_util import span
+from vad_util import trim_silence
+
+SPEECH_RATE = 16000  # Whisper resamples to 16 kHz mono internally, anything above is wasted upload
+AUDIO_CODEC = os.getenv("AUDIO_CODEC")  # opus, mp3 or wav; unset picks the smallest one ffmpeg can encode
+SPEECH_CODECS = {
+    "opus": ("segment.ogg", {"format": "ogg", "codec": "libopus", "bitrate": "24k"}),
+    "mp3": ("segment.mp3", {"format": "mp3", "bitrate": "32k"}),
+    "wav": ("segment.wav", None),
+}
+RING_SECONDS = float(os.getenv("RING_SECONDS", "60"))  # Audio history kept by the always-on capture thread
+PREROLL_SECONDS = float(os.getenv("PREROLL_SECONDS", "1.0"))  # Audio before the hotkey press included in a question
+SEGMENT_SECONDS = 8.0  # Length of each segment sent for transcription while recording continues
+SEGMENT_OVERLAP_SECONDS = 1.0  # Audio shared by neighbouring segments so no word is cut in half
+MIN_TAIL_SECONDS = 0.3  # Final segments with less new audio than this are dropped
+MAX_OVERLAP_WORDS = 12
+
+
+def to_speech(pcm, rate: int, channels: int, target_rate=SPEECH_RATE):
+    # Always returns a new array, so callers may pass views into a buffer that is later overwritten.
+    samples = pcm.reshape(-1) if isinstance(pcm, np.ndarray) else np.frombuffer(pcm, dtype=np.int16)
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    if rate != target_rate:
+        divisor = np.gcd(rate, target_rate)
+        samples = resample_poly(samples.astype(np.float32), target_rate // divisor, rate // divisor)
+    return np.clip(np.rint(samples), -32768, 32767).astype(np.int16)
+
+
+@functools.lru_cache(maxsize=None)
+def speech_codec() -> str:
+    """AUDIO_CODEC, or opus if this ffmpeg build has libopus, then mp3 if it has libmp3lame, then wav."""
+    if AUDIO_CODEC:
+        return AUDIO_CODEC
+    try:
+        encoders = subprocess.run([AudioSegment.converter, "-hide_banner", "-encoders"], capture_output=True,
+                                  text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return "wav"  # No usable ffmpeg, upload uncompressed
+    for codec, encoder in (("opus", " libopus "), ("mp3", " libmp3lame ")):
+        if encoder in encoders:
+            return codec
+    return "wav"
+
+
+def encode_speech(samples, rate=SPEECH_RATE, codec=None):
+    filename, export_options = SPEECH_CODECS[codec or speech_codec()]
+    buffer = io.BytesIO()
+    if export_options is None:
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(rate)
+            wav_file.writeframes(samples.tobytes())
+    else:
+        audio_segment = AudioSegment(data=samples.tobytes(), sample_width=2, frame_rate=rate, channels=1)
+        audio_segment.export(buffer, **export_options)
+    return filename, buffer.getvalue()
+
+
+def stream_speech(path, block_seconds=10.0, rate=SPEECH_RATE):
+    """Yields a recording as blocks of 16 kHz mono int16 samples, never holding more than one block.
+
+    16-bit WAV files are read directly; anything else (mp3, m4a, ...) is decoded by ffmpeg,
+    whose output is read through a pipe as it is produced.
+    """
+    block = int(block_seconds * rate)
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as wav_file:
+            if wav_file.getsampwidth() != 2:
+                raise ValueError(f"{path}: only 16-bit PCM WAV files are supported, convert it or use mp3")
+            channels, source_rate = wav_file.getnchannels(), wav_file.getframerate()
+            source_block = int(block_seconds * source_rate)
+            while data := wav_file.readframes(source_block):
+                yield to_speech(data, source_rate, channels, rate)
+        return
+
+    decoder = subprocess.Popen([AudioSegment.converter, "-nostdin", "-loglevel", "error", "-i", path,
+                                "-f", "s16le", "-ac", "1", "-ar", str(rate), "-"],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while data := decoder.stdout.read(2 * block):
+            yield np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16)
+        if decoder.wait():
+            raise RuntimeError(f"{path}: ffmpeg failed: {decoder.stderr.read().decode(errors='replace').strip()}")
+    finally:
+        if decoder.poll() is None:
+            decoder.kill()
+        decoder.wait()
+        decoder.stdout.close()
+        decoder.stderr.close()
+
+
+def _normalize(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch_transcripts(parts):
+    """Joins overlapping segment transcripts, dropping the words repeated across each seam."""
+    words = []
+    for part in parts:
+        next_words = part.split()
+        if not next_words:
+            continue
+        overlap = 0
+        limit = min(MAX_OVERLAP_WORDS, len(words), len(next_words))
+        for size in range(limit, 0, -1):
+            if [_normalize(w) for w in words[-size:]] == [_normalize(w) for w in next_words[:size]]:
+                overlap = size
+                break
+        words.extend(next_words[overlap:])
+    return " ".join(words)
+
+
+class RingBuffer:
+    """Preallocated int16 frame buffer addressed by absolute frame position.
+
+    position counts every frame ever written, so readers can hold on to offsets while the
+    writer wraps around. Frames older than position - capacity have been overwritten.
+    """
+
+    def __init__(self, capacity: int, channels: int):
+        self.capacity = capacity
+        self.channels = channels
+        self.position = 0
+        self._data = np.zeros((capacity, channels), dtype=np.int16)
+        self._condition = threading.Condition()
+
+    @property
+    def oldest(self) -> int:
+        return max(0, self.position - self.capacity)
+
+    def write(self, frames):
+        frames = frames[-self.capacity:]
+        start = self.position % self.capacity
+        first = min(len(frames), self.capacity - start)
+        self._data[start:start + first] = frames[:first]
+        self._data[:len(frames) - first] = frames[first:]
+        with self._condition:
+            self.position += len(frames)
+            self._condition.notify_all()
+
+    def wait(self, position: int, timeout=0.1) -> int:
+        with self._condition:
+            self._condition.wait_for(lambda: self.position > position, timeout=timeout)
+            return self.position
+
+    def read(self, start: int, end: int):
+        """Returns frames [start, end); a view unless the range wraps around the end of the buffer."""
+        start = max(start, self.oldest)
+        end = min(end, self.position)
+        if end <= start:
+            return self._data[:0]
+        first, last = start % self.capacity, end % self.capacity
+        if first < last or last == 0:
+            return self._data[first:last or self.capacity]
+        return np.concatenate((self._data[first:], self._data[:last]))
+
+
+class AudioCapture:
+    """Keeps one input stream open and continuously writes it into a RingBuffer.
+
+    A hotkey press only has to call mark(), which returns a start position that already
+    includes PREROLL_SECONDS of audio, so no words are lost to stream setup or reaction time.
+    """
+
+    def __init__(self, audio, format, channels: int, rate: int, chunk: int, device_index,
+                 ring_seconds=RING_SECONDS, preroll_seconds=PREROLL_SECONDS):
+        self.audio = audio
+        self.format = format
+        self.channels = channels
+        self.rate = rate
+        self.chunk = chunk
+        self.device_index = device_index
+        self.preroll = int(preroll_seconds * rate)
+        self.ring = RingBuffer(int(ring_seconds * rate), channels)
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._error = None
+
+    def _capture(self):
+        try:
+            stream = self.audio.open(format=self.format, channels=self.channels,
+                                     rate=self.rate, input=True, input_device_index=self.device_index,
+                                     frames_per_buffer=self.chunk)
+            try:
+                while not self._stop_event.is_set():
+                    data = stream.read(self.chunk, exception_on_overflow=False)
+                    self.ring.write(np.frombuffer(data, dtype=np.int16).reshape(-1, self.channels))
+            finally:
+                stream.stop_stream()
+                stream.close()
+        except Exception as e:
+            self._error = e  # Raised by check() rather than lost with the thread
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._capture, daemon=True)
+            self._thread.start()
+
+    def check(self):
+        """Raises if the capture thread has died, for example because the device could not be opened."""
+        if self._error is not None:
+            raise RuntimeError(f"Audio capture stopped: {self._error}") from self._error
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.check()
+
+    def mark(self) -> int:
+        self.check()
+        return max(self.ring.oldest, self.ring.position - self.preroll)
+
+
+class StreamingTranscriber:
+    """Cuts a live recording into overlapping segments and transcribes them in the background.
+
+    advance() is called with the capture position as audio arrives. Once a full segment is
+    available it is sliced out of the ring buffer, silence-trimmed, encoded and submitted to
+    a worker thread, so by the time finish() is called only the final partial segment is
+    still outstanding.
+    """
+
+    def __init__(self, transcribe_fn, ring: RingBuffer, start: int, rate: int,
+                 segment_seconds=SEGMENT_SECONDS, overlap_seconds=SEGMENT_OVERLAP_SECONDS, max_workers=4):
+        self.transcribe_fn = transcribe_fn
+        self.ring = ring
+        self.rate = rate
+
+        self.segment_frames = int(segment_seconds * rate)
+        self.overlap_frames = int(overlap_seconds * rate)
+        self.min_tail_frames = int(MIN_TAIL_SECONDS * rate)
+
+        self._segment_start = start
+        self._futures = []
+        self.seconds_captured = 0.0
+        self.seconds_removed = 0.0
+        self._stats_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _transcribe_segment(self, samples) -> str:
+        with span("vad"):
+            speech = trim_silence(samples, SPEECH_RATE)
+        with self._stats_lock:
+            self.seconds_captured += len(samples) / SPEECH_RATE
+            self.seconds_removed += (len(samples) - len(speech)) / SPEECH_RATE
+        if not len(speech):
+            return ""  # Pure silence, skip the API call entirely
+        with span("encode"):
+            encoded = encode_speech(speech)
+        return self.transcribe_fn(encoded)
+
+    def _submit(self, start: int, end: int):
+        # Downmix on this thread so the worker never reads ring memory the capture thread may reuse.
+        samples = to_speech(self.ring.read(start, end), self.rate, self.ring.channels)
+        # The copied context carries the question's trace into the worker thread.
+        self._futures.append(self._executor.submit(contextvars.copy_context().run, self._transcribe_segment, samples))
+
+    @property
+    def speech_detected(self) -> bool:
+        return self.seconds_removed < self.seconds_captured
+
+    def advance(self, position: int):
+        while position - self._segment_start >= self.segment_frames:
+            self._submit(self._segment_start, self._segment_start + self.segment_frames)
+            self._segment_start += self.segment_frames - self.overlap_frames
+
+    def finish(self, position: int) -> str:
+        self.advance(position)
+        if not self._futures or position - self._segment_start - self.overlap_frames >= self.min_tail_frames:
+            self._submit(self._segment_start, position)
+        try:
+            return stitch_transcripts([future.result() for future in self._futures])
+        finally:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+
+import openai
+from colorama import Fore, Style
+
+import openai_util
+from async_util import runtime
+from audio_util import SPEECH_RATE, encode_speech, speech_codec, stream_speech
+from config import config_store
+from context_util import SessionSummary
+from indexer import FolderIndexer
+from trace_util import Tracer
+from vad_util import SilenceSplitter, trim_silence
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))  # Segments transcribed and answered at once
+QUESTION_PAUSE_SECONDS = float(os.getenv("QUESTION_PAUSE_SECONDS", "1.5"))  # Silence that ends a question segment
+MIN_QUESTION_SECONDS = 1.0  # Segments with less speech than this are coughs and clicks, not questions
+MAX_SEGMENT_SECONDS = 120.0  # Longer stretches without a pause are split here
+
+
+def timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class BatchReview:
+    """Answers every question in a recorded practice session, as if each had been asked with the hotkey.
+
+    The recording is streamed and cut into segments at long pauses. Up to concurrency segments
+    are transcribed and answered at once on the shared runtime loop while the reader keeps
+    splitting; it waits when twice that many are outstanding, so memory stays bounded by the
+    segments in flight however long the recording is. Each result is appended to the JSONL
+    report as soon as it is ready. Every segment is answered with a copy of the session summary,
+    and exchanges are added to it in segment order, so its order does not depend on which
+    answer finishes first.
+    """
+
+    def __init__(self, index, jsonl_path, concurrency=BATCH_CONCURRENCY, questions_only=False, tracer=None):
+        self.index = index
+        self.jsonl_path = jsonl_path
+        self.concurrency = concurrency
+        self.questions_only = questions_only
+        self.tracer = tracer or Tracer()
+        self.records = []
+        self.audio_seconds = 0.0
+        self._limit = None
+        self._lock = threading.Lock()
+        self._outstanding = threading.BoundedSemaphore(2 * concurrency)
+        self.summary = SessionSummary(openai_util.SESSION_SUMMARY_TOKENS, openai_util.num_tokens)
+        self._unsummarized = {}  # Finished segments waiting for an earlier one before joining the summary
+        self._next_summarized = 1
+
+    async def _answer(self, number, start, samples):
+        self.tracer.question(number).activate()
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.concurrency)  # Created on the runtime loop that uses it
+        record = {"segment": number, "start": start / SPEECH_RATE, "end": (start + len(samples)) / SPEECH_RATE}
+        async with self._limit:
+            try:
+                audio = await asyncio.to_thread(lambda: encode_speech(trim_silence(samples, SPEECH_RATE), SPEECH_RATE))
+                del samples
+                question = openai_util.clean_transcription(await openai_util.atranscribe(audio))
+                record["question"] = question
+                if question == openai_util.TRANSCRIPTION_FAILED:
+                    record["error"] = question
+                elif self.questions_only and "?" not in question:
+                    record["skipped"] = True
+                else:
+                    answer = []
+                    try:
+                        async for kind, value in openai_util.answer_events(question, self.index, threading.Event(),
+                                                                             self.summary.copy()):
+                            if kind == "delta":
+                                answer.append(value)
+                            else:
+                                record.update(first_token=value["first_token"], cached=value["cached"] is not None,
+                                              sources=[title for title, _ in value["docs_used"]],
+                                              prompt_tokens=value["prompt_tokens"],
+                                              cached_prompt_tokens=value["cached_tokens"])
+                    except openai.OpenAIError as e:
+                        record["error"] = str(e)
+                    finally:
+                        record["answer"] = "".join(answer)  # Whatever streamed is kept, even if a later step failed
+            except Exception as e:
+                record["error"] = repr(e)  # Keep the segment in the report and the summary order moving
+        self._summarize(number, record)
+        await asyncio.to_thread(self._save, record)
+        return record
+
+    def _summarize(self, number, record):
+        # Runs on the loop thread, like every reader of self.summary.
+        self._unsummarized[number] = record
+        while self._next_summarized in self._unsummarized:
+            record = self._unsummarized.pop(self._next_summarized)
+            if record.get("answer") and not record.get("error"):
+                self.summary.add(record["question"], record["answer"])
+            self._next_summarized += 1
+
+    def _save(self, record):
+        with self._lock:
+            self.records.append(record)
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        status = record.get("error") or ("skipped, not a question" if record.get("skipped") else
+                                          f"answered{' from cache' if record.get('cached') else ''}")
+        print(Fore.LIGHTBLACK_EX + f"[STATUS] Segment {record['segment']} at {timestamp(record['start'])}: {status}")
+
+    def _finished(self, future):
+        self._outstanding.release()
+
+    def _submit(self, number, segment):
+        self._outstanding.acquire()  # Backpressure: stop reading while enough segments are waiting
+        future = runtime.submit(self._answer(number, *segment))
+        future.add_done_callback(self._finished)
+        return future
+
+    def run(self, path, splitter=None):
+        splitter = splitter or SilenceSplitter(SPEECH_RATE, QUESTION_PAUSE_SECONDS, MIN_QUESTION_SECONDS,
+                                               MAX_SEGMENT_SECONDS)
+        open(self.jsonl_path, "w").close()
+        futures = []
+        for block in stream_speech(path):
+            for segment in splitter.feed(block):
+                futures.append(self._submit(len(futures) + 1, segment))
+        for segment in splitter.finish():
+            futures.append(self._submit(len(futures) + 1, segment))
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                self.records.append({"error": repr(e)})  # Only reached if the segment's task itself failed
+        self.audio_seconds = splitter.position / SPEECH_RATE
+        self.records.sort(key=lambda record: record.get("segment", 0))
+        return self.records
+
+    def write_markdown(self, path, recording):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(f"# Practice session review: {os.path.basename(recording)}\n")
+            for record in self.records:
+                if record.get("skipped") or "segment" not in record:
+                    continue
+                f.write(f"\n## {timestamp(record['start'])}–{timestamp(record['end'])}\n\n")
+                f.write(f"**Question:** {record.get('question', '')}\n\n")
+                if record.get("error"):
+                    f.write(f"_Failed: {record['error']}_\n")
+                    continue
+                f.write(record.get("answer", "") + "\n")
+                if record.get("sources"):
+                    f.write(f"\n_Sources: {', '.join(record['sources'])}_\n")
+        os.replace(path + ".tmp", path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer every question in a recorded practice session")
+    parser.add_argument("recording", help="a WAV or MP3 (anything ffmpeg decodes) recording of the session")
+    parser.add_argument("--folder", default=None, help="document folder, the configured one if omitted")
+    parser.add_argument("--out", default=None, help="report path without extension, next to the recording if omitted")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help="segments transcribed and answered at once")
+    parser.add_argument("--questions-only", action="store_true",
+                        help="only answer segments whose transcript contains a question mark")
+    args = parser.parse_args()
+
+    folder_path = args.folder or config_store.get("SETTINGS", "folder_path", fallback="")
+    if not folder_path or not os.path.isdir(folder_path):
+        parser.error("set folder_path in config.ini or pass --folder")
+    out = args.out or os.path.splitext(args.recording)[0] + ".review"
+
+    indexer = FolderIndexer(folder_path)
+    indexer.load()
+    indexer.refresh()
+    openai_util.warm_up()
+    print(Style.BRIGHT + Fore.CYAN + f"Reviewing {args.recording} against {folder_path} ({len(indexer.index)} chunks), "
+                                     f"{args.concurrency} segments at once, {speech_codec()} uploads")
+
+    review = BatchReview(indexer.index, out + ".jsonl", args.concurrency, args.questions_only)
+    started = time.perf_counter()
+    records = review.run(args.recording)
+    elapsed = time.perf_counter() - started
+    review.write_markdown(out + ".md", args.recording)
+
+    answered = sum(1 for record in records if "answer" in record and not record.get("error"))
+    failed = sum(1 for record in records if record.get("error"))
+    print(Style.BRIGHT + Fore.CYAN + f"{len(records)} segments, {answered} answered, {failed} failed: "
+                                     f"{review.audio_seconds / 60:.1f} min of audio in {elapsed / 60:.1f} min "
+                                     f"({review.audio_seconds / elapsed:.1f} min of audio per minute)")
+    print(Fore.LIGHTBLACK_EX + f"Reports in {out}.jsonl and {out}.md, traces in {review.tracer.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,600 @@
+import argparse
+import asyncio
+import os
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from colorama import Fore, Style
+from openai import AsyncOpenAI
+
+import openai_util
+from async_util import runtime
+from audio_util import SPEECH_RATE, encode_speech, to_speech
+from cache_util import EmbeddingCache, PromptCacheStats
+from context_util import SessionSummary
+from ann_util import IVFIndex
+from index_util import INDEX_DTYPES, VectorIndex, load_index, save_index
+from ingest_util import INGEST_PROCESSES, IngestPipeline
+from mock_openai import MockLatency, MockOpenAIServer
+from ratelimit_util import AdaptiveLimiter
+from startup_util import import_times
+from vad_util import trim_silence
+from config import configure_user_settings
+
+
+def print_result(label, seconds, items, unit="chunks", requests=None):
+    rate = items / seconds if seconds else float("inf")
+    line = f"{label:<28} {seconds:8.2f}s  {rate:10.1f} {unit}/s"
+    if requests is not None:
+        line += f"  ({requests} requests)"
+    print(Fore.LIGHTGREEN_EX + line)
+
+
+def bench_embeddings(folder_path, limit=None, num_workers=8):
+    texts = [section["text"] for section in openai_util.load_sections(folder_path)]
+    if limit:
+        texts = texts[:limit]
+    print(Style.BRIGHT + Fore.CYAN + f"Embedding {len(texts)} chunks with {openai_util.EMBEDDING_MODEL}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        per_chunk = list(executor.map(openai_util.get_embeddings, texts))
+    print_result("one chunk per request", time.perf_counter() - start, len(texts), requests=len(texts))
+
+    max_inputs = min(openai_util.EMBEDDING_BATCH_SIZE, -(-len(texts) // num_workers))
+    batches = list(openai_util.batch_corpus(texts, max_inputs=max_inputs))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        results = executor.map(openai_util.get_embeddings_batch, [[texts[i] for i in batch] for batch in batches])
+        batched = [embedding for result in results for embedding in result]
+    print_result("batched", time.perf_counter() - start, len(texts), requests=len(batches))
+
+    mismatched = sum(
+        openai_util.cosine_similarity(a, b) < 0.999 for a, b in zip(per_chunk, batched)
+    )
+    if mismatched:
+        print(Fore.RED + f"{mismatched} batched embeddings do not match their source chunk")
+
+
+def bench_retrieval(num_chunks=5000, dimensions=1536, queries=50):
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((num_chunks, dimensions)).astype(np.float32)
+    embedding_lists = embeddings.tolist()
+    query_embeddings = rng.standard_normal((queries, dimensions)).astype(np.float32)
+    print(Style.BRIGHT + Fore.CYAN + f"Ranking {num_chunks} chunks x {dimensions} dims for {queries} queries")
+
+    start = time.perf_counter()
+    for query in query_embeddings:
+        scores = np.array([openai_util.cosine_similarity(query, embedding) for embedding in embedding_lists])
+        np.argsort(scores)[::-1][:openai_util.TOP_N]
+    print_result("per-embedding loop", time.perf_counter() - start, queries, unit="queries")
+
+    start = time.perf_counter()
+    index = VectorIndex([""] * num_chunks, [""] * num_chunks, [""] * num_chunks, embeddings)
+    print_result("index build", time.perf_counter() - start, num_chunks)
+
+    start = time.perf_counter()
+    for query in query_embeddings:
+        index.search(query, openai_util.TOP_N)
+    print_result("matrix index", time.perf_counter() - start, queries, unit="queries")
+
+
+def bench_ingest(folder_path, use_api=True, processes=None):
+    names = sorted(name for name in os.listdir(folder_path) if openai_util.is_document(name))
+    documents = [(name, os.path.join(folder_path, name), os.path.splitext(name)[0], "other") for name in names]
+    print(Style.BRIGHT + Fore.CYAN + f"Ingesting {len(documents)} documents from {folder_path}")
+
+    cache_dir = openai_util.CACHE_DIR
+    try:
+        for label in ("sequential", "pipeline"):
+            # A fresh cache per run, so both runs pay for every embedding.
+            openai_util.CACHE_DIR = tempfile.mkdtemp()
+            tracemalloc.start()
+            start = time.perf_counter()
+            if label == "sequential":
+                texts = [section["text"] for section in openai_util.load_sections(folder_path)]
+                if use_api:
+                    openai_util.embed_corpus(texts)
+                chunks = len(texts)
+            else:
+                pipeline = IngestPipeline(processes or INGEST_PROCESSES, embed=use_api)
+                chunks = sum(len(sections) for sections in pipeline.run(documents).values())
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print_result(label, elapsed, chunks)
+            print(Fore.CYAN + f"{'':<28} peak Python memory in this process {peak / 2 ** 20:.1f} MiB")
+            if label == "pipeline":
+                pipeline.report()
+    finally:
+        openai_util.CACHE_DIR = cache_dir
+
+
+def legacy_split_text(text, max_length=openai_util.MAX_LENGTH):
+    # The token-at-a-time chunker split_text replaced, kept as the baseline.
+    text = re.sub(r'\n', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    sections, processed_tokens, loc = [], [], ""
+    for token_id in openai_util.tokenizer.encode(text):
+        processed_tokens.append(token_id)
+        if len(processed_tokens) == 10:
+            loc = openai_util.tokenizer.decode(processed_tokens).strip()
+        if len(processed_tokens) >= max_length:
+            sections.append({"loc": loc, "text": openai_util.tokenizer.decode(processed_tokens).strip()})
+            processed_tokens = []
+    if processed_tokens:
+        sections.append({"loc": loc, "text": openai_util.tokenizer.decode(processed_tokens).strip()})
+    return sections
+
+
+def bench_chunking(folder_path=None, megabytes=4):
+    if folder_path:
+        paths = [os.path.join(folder_path, name) for name in sorted(os.listdir(folder_path))
+                 if openai_util.is_document(name)]
+        sample = " ".join(openai_util.load_document(path) for path in paths)
+    else:
+        sample = "I led the migration of our billing platform to Kubernetes. It cut deploy time from hours " \
+                 "to minutes!\nWhat did I learn?  Mostly that small, reversible steps beat big rewrites.\n\n"
+    corpus = sample * max(1, int(megabytes * 2 ** 20 / max(len(sample), 1)))
+    tokens = len(openai_util.tokenizer.encode(openai_util.preprocess_text(corpus)))
+    print(Style.BRIGHT + Fore.CYAN + f"Chunking {len(corpus) / 2 ** 20:.1f} MB ({tokens} tokens) into "
+                                     f"{openai_util.MAX_LENGTH}-token chunks")
+
+    start = time.perf_counter()
+    legacy_split_text(corpus)
+    print_result("token-at-a-time loop", time.perf_counter() - start, tokens, unit="tokens")
+
+    for overlap, sentences in ((0, False), (openai_util.MAX_LENGTH // 10, False), (0, True)):
+        openai_util.CHUNK_OVERLAP, openai_util.CHUNK_SENTENCES = overlap, sentences
+        start = time.perf_counter()
+        openai_util.split_text(corpus, "benchmark", "other")
+        elapsed = time.perf_counter() - start
+        label = f"bulk, overlap {overlap}" + (", sentences" if sentences else "")
+        print_result(label, elapsed, tokens, unit="tokens")
+
+
+SAMPLE_QUESTIONS = [
+    "Tell me about yourself.",
+    "Why do you want to work at this company?",
+    "Describe a project you are proud of.",
+    "What was your biggest technical challenge and how did you solve it?",
+    "How do you handle disagreements with teammates?",
+    "What are your greatest strengths and weaknesses?",
+    "Where do you see yourself in five years?",
+    "What experience do you have with the main requirements of this role?",
+]
+
+
+def bench_hybrid(folder_path, questions_path=None, k=openai_util.TOP_N):
+    sections = openai_util.load_sections(folder_path)
+    texts = [section["text"] for section in sections]
+    index = VectorIndex([s["title"] for s in sections], [s["id"] for s in sections], texts,
+                        openai_util.embed_corpus(texts))
+    if questions_path:
+        with open(questions_path, "r") as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = SAMPLE_QUESTIONS
+
+    start = time.perf_counter()
+    index.lexical
+    print(Style.BRIGHT + Fore.CYAN + f"Retrieval over {len(texts)} chunks for {len(questions)} questions, "
+                                     f"BM25 index built in {1000 * (time.perf_counter() - start):.1f} ms")
+
+    openai_util.warm_up().result()
+    timings = {mode: [] for mode in ("vector", "lexical", "hybrid")}
+    results = {mode: [] for mode in timings}
+    skipped = 0
+    for question in questions:
+        for mode in timings:
+            start = time.perf_counter()
+            results[mode].append(set(runtime.run(openai_util.strings_ranked_by_relatedness(question, index, k, mode))))
+            timings[mode].append(time.perf_counter() - start)
+        skipped += index.lexical.search(question, k)[2] >= openai_util.LEXICAL_SKIP_CONFIDENCE
+
+    # There are no relevance labels, so quality is agreement with the current vector-only ranking.
+    for mode, elapsed in timings.items():
+        overlap = np.mean([len(found & expected) / k for found, expected in zip(results[mode], results["vector"])])
+        print(Fore.LIGHTGREEN_EX + f"{mode:<8} p50 {1000 * np.median(elapsed):8.2f} ms  max {1000 * max(elapsed):8.2f} ms  "
+                                   f"overlap@{k} with vector {overlap:6.3f}")
+    print(Style.BRIGHT + Fore.CYAN + f"hybrid skipped the query embedding for {skipped} of {len(questions)} questions")
+
+
+def bench_context(folder_path, questions_path=None, k=openai_util.TOP_N):
+    sections = openai_util.load_sections(folder_path)
+    texts = [section["text"] for section in sections]
+    index = VectorIndex([s["title"] for s in sections], [s["id"] for s in sections], texts,
+                        openai_util.embed_corpus(texts), [s["tokens"] for s in sections])
+    if questions_path:
+        with open(questions_path, "r") as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = SAMPLE_QUESTIONS
+    print(Style.BRIGHT + Fore.CYAN + f"Prompt tokens for {len(questions)} questions, budget "
+                                     f"{openai_util.PROMPT_TOKEN_BUDGET}")
+
+    verbatim, packed, excerpts = [], [], []
+    for question in questions:
+        # The previous layout: the TOP_N chunks appended verbatim with their headers.
+        top = runtime.run(openai_util.strings_ranked_by_relatedness(question, index, k))
+        full_message = "".join(f'\n\nTitle: {index.titles[i]}\nTextual excerpt section:\n"""\n{index.texts[i]}\n"""'
+                               for i in top) + question
+        verbatim.append(openai_util.num_tokens(openai_util.SYSTEM_PROMPT + full_message))
+        _, full_message, docs_used = runtime.run(openai_util.query_message(question, index))
+        packed.append(openai_util.num_tokens(openai_util.SYSTEM_PROMPT + full_message))
+        excerpts.append(sum(len(ids) for _, ids in docs_used))
+
+    print(Fore.LIGHTGREEN_EX + f"top {k} verbatim  {np.mean(verbatim):8.1f} prompt tokens on average")
+    print(Fore.LIGHTGREEN_EX + f"packed           {np.mean(packed):8.1f} prompt tokens on average, "
+                               f"{np.mean(excerpts):.1f} chunks after merging and de-duplication")
+
+
+def bench_throttle(chunks=4000, batch=16, rate=20.0, failure_rate=0.02):
+    from e2e_bench import point_clients_at
+
+    texts = [f"Synthetic chunk {i} about {' '.join(SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)].split()[:6])}"
+             for i in range(chunks)]
+    print(Style.BRIGHT + Fore.CYAN + f"Embedding {chunks} chunks in batches of {batch} against a mock limited to "
+                                     f"{rate:g} requests/s with {100 * failure_rate:g}% server errors")
+    configurations = [
+        ("fixed 8, no retry", AdaptiveLimiter(8, 8, min_limit=8), 1),
+        ("adaptive", AdaptiveLimiter(openai_util.EMBEDDING_CONCURRENCY, openai_util.EMBEDDING_MAX_CONCURRENCY),
+         openai_util.EMBEDDING_RETRIES),
+    ]
+    for name, limiter, attempts in configurations:
+        server = MockOpenAIServer(MockLatency(embeddings=0.05), embedding_rate=rate, failure_rate=failure_rate).start()
+        point_clients_at(server)
+        openai_util.embedding_limiter = limiter
+        openai_util.EMBEDDING_RETRIES = attempts
+        openai_util.CACHE_DIR = tempfile.mkdtemp()
+        start = time.perf_counter()
+        try:
+            openai_util.embed_corpus(texts, num_workers=-(-chunks // batch))
+        except openai_util.openai.OpenAIError as e:
+            print(Fore.RED + f"{name}: {type(e).__name__}")
+        elapsed = time.perf_counter() - start
+        kept = len(EmbeddingCache(openai_util.CACHE_DIR, openai_util.EMBEDDING_CACHE_KEY))
+        server.stop()
+        print(Fore.LIGHTGREEN_EX + f"{name:<18} {kept:6d}/{chunks} chunks kept  {kept / elapsed:8.1f} chunks/s  "
+                                   f"{limiter.throttles} throttled, {limiter.retries} retried, "
+                                   f"{limiter.failures} failed batches, final concurrency {int(limiter.limit)}")
+
+
+def bench_prompt_cache(questions=20, per_prompt_token=0.0004, profile_tokens=3000, seed=0):
+    from e2e_bench import WORDS, point_clients_at
+
+    # A resume and job description long enough to be cached (the mock counts words, not tokens), among other notes.
+    rng = np.random.default_rng(seed)
+    documents = [("candidate", "resume", 1500), ("role", "job_description", 1000)] + \
+                [(f"notes_{i:02d}", "other", 1500) for i in range(10)]
+    sections = []
+    for title, file_type, words in documents:
+        sentences = [" ".join(rng.choice(WORDS, size=12)).capitalize() + "." for _ in range(words // 12)]
+        sections.extend(openai_util.split_text(" ".join(sentences), title, file_type))
+    texts = [section["text"] for section in sections]
+    openai_util.CACHE_DIR = tempfile.mkdtemp()
+    openai_util.answer_cache = None  # Every question should reach the chat endpoint
+    openai_util.PROFILE_TOKEN_BUDGET = profile_tokens
+
+    print(Style.BRIGHT + Fore.CYAN + f"{questions} questions per prompt layout against a mock that prefills "
+                                     f"{1 / per_prompt_token:.0f} uncached prompt tokens/s")
+    for layout in ("classic", "cached"):
+        server = MockOpenAIServer(MockLatency(first_token=0.1, per_token=0.0, per_prompt_token=per_prompt_token)).start()
+        point_clients_at(server)
+        index = VectorIndex([s["title"] for s in sections], [s["id"] for s in sections], texts,
+                            openai_util.embed_corpus(texts), [s["tokens"] for s in sections])
+        openai_util.PROMPT_LAYOUT = layout
+        openai_util.prompt_cache_stats = PromptCacheStats()
+        session = SessionSummary(openai_util.SESSION_SUMMARY_TOKENS, openai_util.num_tokens)
+
+        async def answer(question):
+            async for kind, value in openai_util.answer_events(question, index, threading.Event(), session):
+                if kind == "done":
+                    return value
+
+        first_tokens = []
+        for i in range(questions):
+            info = runtime.run(answer(f"{SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]} (#{i})"))
+            first_tokens.append(info["first_token"])
+        server.stop()
+        stats = openai_util.prompt_cache_stats
+        print(Fore.LIGHTGREEN_EX + f"{layout:<8} first token p50 {1000 * np.median(first_tokens):7.1f} ms  "
+                                   f"{stats.prompt_tokens / questions:7.0f} prompt tokens per question, "
+                                   f"{100 * stats.hit_rate:3.0f}% cached")
+
+
+def bench_startup(modules, top=8):
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "startup-benchmark")  # openai_util builds its clients at import
+    print(Style.BRIGHT + Fore.CYAN + "Import time per module in a fresh interpreter (python -X importtime)")
+    for module in modules:
+        try:
+            rows = import_times(module, env)
+        except RuntimeError as e:
+            print(Fore.RED + f"{module:<12} failed: {e}")
+            continue
+        total = next(cumulative for _, cumulative, depth, name in reversed(rows) if depth == 0 and name == module)
+        direct = sorted(((cumulative, name) for _, cumulative, depth, name in rows if depth == 1), reverse=True)
+        heaviest = ", ".join(f"{name} {cumulative / 1000:.0f}ms" for cumulative, name in direct[:top])
+        print(Fore.LIGHTGREEN_EX + f"{module:<12} {total / 1000:8.1f} ms  " + Fore.RESET + heaviest)
+
+
+def load_benchmark_vectors(num_chunks, dimensions, rng):
+    cache = EmbeddingCache(openai_util.CACHE_DIR, openai_util.EMBEDDING_CACHE_KEY)
+    if cache.vectors is not None and len(cache.vectors) >= 100:
+        print(Fore.CYAN + f"Using {min(num_chunks, len(cache.vectors))} cached document embeddings")
+        return np.asarray(cache.vectors[:num_chunks], dtype=np.float32)
+    print(Fore.CYAN + f"No embedding cache found, using {num_chunks} synthetic vectors")
+    return rng.standard_normal((num_chunks, dimensions)).astype(np.float32)
+
+
+def bench_quantization(num_chunks=5000, dimensions=1536, queries=50, k=openai_util.TOP_N):
+    rng = np.random.default_rng(0)
+    embeddings = load_benchmark_vectors(num_chunks, dimensions, rng)
+    # Queries are perturbed document vectors, which keeps the neighbourhoods realistic.
+    picks = rng.choice(len(embeddings), size=queries)
+    query_embeddings = embeddings[picks] + 0.5 * rng.standard_normal((queries, embeddings.shape[1])).astype(np.float32) \
+        * np.abs(embeddings[picks]).mean()
+
+    truth = []
+    for query in query_embeddings:
+        scores = np.array([openai_util.cosine_similarity(query, embedding) for embedding in embeddings])
+        truth.append(set(np.argsort(scores)[::-1][:k].tolist()))
+
+    index = VectorIndex([""] * len(embeddings), [""] * len(embeddings), [""] * len(embeddings), embeddings)
+    print(Style.BRIGHT + Fore.CYAN + f"recall@{k} against full-precision cosine_similarity over {queries} queries")
+    with tempfile.TemporaryDirectory() as path:
+        for dtype in INDEX_DTYPES:
+            save_index(index, path, dtype)
+            size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)
+                       if name.endswith(".npy") and not name.startswith("text"))
+            mapped = load_index(path)
+
+            start = time.perf_counter()
+            results = [set(mapped.search(query, k)[0].tolist()) for query in query_embeddings]
+            elapsed = time.perf_counter() - start
+
+            recall = np.mean([len(found & expected) / k for found, expected in zip(results, truth)])
+            print(Fore.LIGHTGREEN_EX + f"{dtype:<8} recall@{k} {recall:6.3f}  {size / 2 ** 20:8.2f} MiB  "
+                                       f"{1000 * elapsed / queries:7.3f} ms/query")
+
+
+def clustered_vectors(count, dimensions, rng, clusters=1000, block=100000):
+    # Real embeddings are clumpy; uniform noise would make every IVF list equally close to every query.
+    centers = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    vectors = np.empty((count, dimensions), dtype=np.float32)
+    for start in range(0, count, block):
+        size = min(block, count - start)
+        vectors[start:start + size] = centers[rng.integers(0, clusters, size)] \
+            + 0.7 * rng.standard_normal((size, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def bench_ann(sizes=(10000, 100000, 1000000), dimensions=128, queries=100, nprobes=(1, 4, 16, 64),
+              k=openai_util.TOP_N):
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        vectors = clustered_vectors(size, dimensions, rng)
+        index = VectorIndex.from_matrix([""] * size, [""] * size, [""] * size, vectors)
+        query_embeddings = vectors[rng.choice(size, size=queries)] \
+            + 0.3 * rng.standard_normal((queries, dimensions)).astype(np.float32) / np.sqrt(dimensions)
+
+        start = time.perf_counter()
+        truth = [set(index.search(query, k, exact=True)[0].tolist()) for query in query_embeddings]
+        exact_ms = 1000 * (time.perf_counter() - start) / queries
+
+        start = time.perf_counter()
+        index.ann = IVFIndex.build(vectors)
+        build_seconds = time.perf_counter() - start
+        print(Style.BRIGHT + Fore.CYAN + f"{size} vectors x {dimensions} dims: {len(index.ann)} lists built in "
+                                         f"{build_seconds:.1f}s, brute force {exact_ms:.3f} ms/query")
+
+        for nprobe in nprobes:
+            start = time.perf_counter()
+            results = [set(index.search(query, k, nprobe=nprobe)[0].tolist()) for query in query_embeddings]
+            elapsed_ms = 1000 * (time.perf_counter() - start) / queries
+            recall = np.mean([len(found & expected) / k for found, expected in zip(results, truth)])
+            print(Fore.LIGHTGREEN_EX + f"nprobe {nprobe:<4} recall@{k} {recall:6.3f}  {elapsed_ms:7.3f} ms/query  "
+                                       f"{exact_ms / elapsed_ms:6.1f}x faster")
+
+
+def read_wav(path):
+    with wave.open(path, "rb") as wav_file:
+        if wav_file.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV fixtures are supported")
+        pcm = wav_file.readframes(wav_file.getnframes())
+        return to_speech(pcm, wav_file.getframerate(), wav_file.getnchannels())
+
+
+def timed_transcription(samples):
+    if not len(samples):
+        return 0.0
+    start = time.perf_counter()
+    openai_util.transcribe(encode_speech(samples))
+    return time.perf_counter() - start
+
+
+def bench_vad(fixtures_dir, use_api=True):
+    fixtures = sorted(name for name in os.listdir(fixtures_dir) if name.endswith(".wav"))
+    print(Style.BRIGHT + Fore.CYAN + f"Silence trimming on {len(fixtures)} fixtures in {fixtures_dir}")
+
+    total_audio = total_removed = total_saved = 0.0
+    for name in fixtures:
+        samples = read_wav(os.path.join(fixtures_dir, name))
+        start = time.perf_counter()
+        trimmed = trim_silence(samples, SPEECH_RATE)
+        vad_ms = 1000 * (time.perf_counter() - start)
+
+        seconds = len(samples) / SPEECH_RATE
+        removed = seconds - len(trimmed) / SPEECH_RATE
+        line = f"{name:<32} {seconds:7.2f}s audio  {removed:7.2f}s removed  vad {vad_ms:6.1f} ms"
+        if use_api:
+            saved = timed_transcription(samples) - timed_transcription(trimmed)
+            total_saved += saved
+            line += f"  transcription {saved:+6.2f}s saved"
+        print(Fore.LIGHTGREEN_EX + line)
+        total_audio += seconds
+        total_removed += removed
+
+    if total_audio:
+        summary = f"removed {total_removed:.1f}s of {total_audio:.1f}s ({100 * total_removed / total_audio:.0f}%)"
+        if use_api:
+            summary += f", transcription latency saved {total_saved:.2f}s"
+        print(Style.BRIGHT + Fore.CYAN + summary)
+
+
+async def first_token_latency(async_client, question):
+    start = time.perf_counter()
+    response = await async_client.chat.completions.create(
+        model=openai_util.GPT_MODEL,
+        messages=[{"role": "user", "content": question}],
+        max_tokens=16,
+        stream=True,
+    )
+    elapsed = None
+    async for chunk in response:
+        if elapsed is None and chunk.choices and chunk.choices[0].delta.content:
+            elapsed = time.perf_counter() - start
+    return elapsed if elapsed is not None else time.perf_counter() - start
+
+
+async def cold_first_token(question):
+    # What every question paid before the shared runtime: a new client and a new connection.
+    async_client = AsyncOpenAI(api_key=openai_util.get_config('openai_api_key'))
+    try:
+        return await first_token_latency(async_client, question)
+    finally:
+        await async_client.close()
+
+
+def bench_ttft(questions=5, question="Tell me about yourself in one sentence."):
+    print(Style.BRIGHT + Fore.CYAN + f"Time to first token over {questions} questions with {openai_util.GPT_MODEL}")
+
+    def cold():
+        start = time.perf_counter()
+        ttft = asyncio.run(cold_first_token(question))
+        return time.perf_counter() - start, ttft
+
+    cold_results = []
+    for _ in range(questions):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            cold_results.append(executor.submit(cold).result())
+
+    openai_util.warm_up().result()
+    warm_results = []
+    for _ in range(questions):
+        start = time.perf_counter()
+        ttft = runtime.run(first_token_latency(openai_util.async_client, question))
+        warm_results.append((time.perf_counter() - start, ttft))
+
+    for label, results in (("asyncio.run + new client", cold_results), ("shared runtime + pool", warm_results)):
+        totals, ttfts = np.array(results).T
+        print(Fore.LIGHTGREEN_EX + f"{label:<28} first token p50 {1000 * np.median(ttfts):7.1f} ms  "
+                                   f"max {1000 * ttfts.max():7.1f} ms  with loop setup {1000 * np.median(totals):7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hinterview performance benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    embeddings_parser = subparsers.add_parser("embeddings", help="per-chunk vs batched embedding throughput")
+    embeddings_parser.add_argument("folder", nargs="?", default=None)
+    embeddings_parser.add_argument("--limit", type=int, default=None)
+    embeddings_parser.add_argument("--workers", type=int, default=8)
+
+    retrieval_parser = subparsers.add_parser("retrieval", help="per-query ranking latency on synthetic vectors")
+    retrieval_parser.add_argument("--chunks", type=int, default=5000)
+    retrieval_parser.add_argument("--queries", type=int, default=50)
+
+    quantization_parser = subparsers.add_parser("quantization", help="recall@k and size of float16/int8 indexes")
+    quantization_parser.add_argument("--chunks", type=int, default=5000)
+    quantization_parser.add_argument("--queries", type=int, default=50)
+
+    ann_parser = subparsers.add_parser("ann", help="IVF recall@k and latency against brute force on synthetic vectors")
+    ann_parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ann_parser.add_argument("--dimensions", type=int, default=128)
+    ann_parser.add_argument("--queries", type=int, default=100)
+    ann_parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+
+    vad_parser = subparsers.add_parser("vad", help="audio removed and transcription time saved by silence trimming")
+    vad_parser.add_argument("fixtures", help="directory of 16-bit PCM .wav recordings")
+    vad_parser.add_argument("--no-api", action="store_true", help="only measure trimming, skip transcription")
+
+    ingest_parser = subparsers.add_parser("ingest", help="sequential vs streaming process-pool ingestion")
+    ingest_parser.add_argument("folder", nargs="?", default=None)
+    ingest_parser.add_argument("--processes", type=int, default=None)
+    ingest_parser.add_argument("--no-api", action="store_true", help="only extract and chunk, skip embedding")
+
+    chunking_parser = subparsers.add_parser("chunking", help="split_text throughput in tokens per second")
+    chunking_parser.add_argument("folder", nargs="?", default=None, help="documents to repeat, synthetic text if omitted")
+    chunking_parser.add_argument("--megabytes", type=float, default=4)
+
+    hybrid_parser = subparsers.add_parser("hybrid", help="latency and agreement of vector, BM25 and fused retrieval")
+    hybrid_parser.add_argument("folder", nargs="?", default=None)
+    hybrid_parser.add_argument("--questions", default=None, help="text file with one question per line")
+
+    context_parser = subparsers.add_parser("context", help="prompt tokens of verbatim top-N vs packed context")
+    context_parser.add_argument("folder", nargs="?", default=None)
+    context_parser.add_argument("--questions", default=None, help="text file with one question per line")
+
+    throttle_parser = subparsers.add_parser("throttle", help="embedding ingestion against a rate-limited mock API")
+    throttle_parser.add_argument("--chunks", type=int, default=4000)
+    throttle_parser.add_argument("--batch", type=int, default=16, help="chunks per embeddings request")
+    throttle_parser.add_argument("--rate", type=float, default=20.0, help="mock requests per second before 429s")
+    throttle_parser.add_argument("--failure-rate", type=float, default=0.02, help="fraction of mock 500 responses")
+
+    startup_parser = subparsers.add_parser("startup", help="import time of the menu and interview modules")
+    startup_parser.add_argument("modules", nargs="*", default=["gui_util", "openai_util", "indexer", "audio_util",
+                                                               "helper"])
+
+    prompt_cache_parser = subparsers.add_parser("prompt-cache", help="classic vs cached prompt layout on a mock API "
+                                                                     "that caches prompt prefixes")
+    prompt_cache_parser.add_argument("--questions", type=int, default=20)
+    prompt_cache_parser.add_argument("--prompt-token-seconds", type=float, default=0.0004,
+                                     help="mock prefill time per uncached prompt token")
+    prompt_cache_parser.add_argument("--profile-tokens", type=int, default=3000,
+                                     help="PROFILE_TOKEN_BUDGET, the mock caches prefixes of 1024 words or more")
+
+    ttft_parser = subparsers.add_parser("ttft", help="time to first token with fresh vs pooled API clients")
+    ttft_parser.add_argument("--questions", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.command == "embeddings":
+        bench_embeddings(args.folder or configure_user_settings()[0], args.limit, args.workers)
+    elif args.command == "retrieval":
+        bench_retrieval(args.chunks, queries=args.queries)
+    elif args.command == "quantization":
+        bench_quantization(args.chunks, queries=args.queries)
+    elif args.command == "ann":
+        bench_ann(args.sizes, args.dimensions, args.queries, args.nprobe)
+    elif args.command == "vad":
+        bench_vad(args.fixtures, use_api=not args.no_api)
+    elif args.command == "ingest":
+        bench_ingest(args.folder or configure_user_settings()[0], use_api=not args.no_api, processes=args.processes)
+    elif args.command == "chunking":
+        bench_chunking(args.folder, args.megabytes)
+    elif args.command == "hybrid":
+        bench_hybrid(args.folder or configure_user_settings()[0], args.questions)
+    elif args.command == "context":
+        bench_context(args.folder or configure_user_settings()[0], args.questions)
+    elif args.command == "throttle":
+        bench_throttle(args.chunks, args.batch, args.rate, args.failure_rate)
+    elif args.command == "startup":
+        bench_startup(args.modules)
+    elif args.command == "prompt-cache":
+        bench_prompt_cache(args.questions, args.prompt_token_seconds, args.profile_tokens)
+    elif args.command == "ttft":
+        configure_user_settings()
+        bench_ttft(args.questions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+import atexit
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+def write_atomically(path, write, binary=True):
+    """Calls write(file) on a uniquely named temp file beside path, then renames it over path.
+
+    Readers never see a torn file, and concurrent writers never share or steal a temp file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                                    suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb" if binary else "w") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+_save_locks = {}  # One per cache file, shared by every EmbeddingCache on it in this process
+_save_locks_guard = threading.Lock()
+
+
+def _save_lock(path):
+    with _save_locks_guard:
+        return _save_locks.setdefault(path, threading.Lock())
+
+
+class EmbeddingCache:
+    """Content-addressed on-disk store of chunk embeddings for a single embedding model.
+
+    {model}.keys holds the vector width on its first line and then one key per line; row i of
+    the raw float32 matrix in {model}.vectors.f32 belongs to key line i. save() appends only
+    the new rows and then their keys, under a lock shared by every instance on the same files,
+    so a save costs the same however large the cache is and concurrent savers never drop each
+    other's rows. Keys are written after their rows, so a crash leaves at most unreferenced
+    trailing rows or a torn key line, and the next save cuts both off before appending.
+    """
+
+    def __init__(self, cache_dir: str, model: str):
+        self.cache_dir = cache_dir
+        self.model = model
+        self.keys_path = os.path.join(cache_dir, f"{model}.keys")
+        self.vectors_path = os.path.join(cache_dir, f"{model}.vectors.f32")
+        # The previous layout, rewritten in full on every save; converted on first open.
+        self.legacy_paths = (os.path.join(cache_dir, f"{model}.keys.json"),
+                             os.path.join(cache_dir, f"{model}.vectors.npy"))
+        self._keys = []
+        self._rows = {}
+        self._vectors = None
+        self._width = None
+        self._end = 0  # Size of the keys file when this instance last read or wrote it
+        self._pending = {}
+        if not os.path.exists(self.keys_path) and os.path.exists(self.legacy_paths[0]):
+            self._migrate()
+        self._load()
+
+    def _read_keys(self):
+        """Returns (width, keys, bytes up to the last complete line), or (None, [], 0) without a cache."""
+        try:
+            with open(self.keys_path, "rb") as f:
+                data = f.read()
+            end = data.rfind(b"\n") + 1
+            lines = data[:end].decode("ascii").split("\n")[:-1]
+            return int(lines[0]), lines[1:], end
+        except (OSError, ValueError, IndexError):
+            return None, [], 0
+
+    def _load(self):
+        width, keys, end = self._read_keys()
+        if not keys:
+            return
+        try:
+            if os.path.getsize(self.vectors_path) < len(keys) * width * 4:
+                return
+            vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(keys), width))
+        except (OSError, ValueError):
+            return
+        # Rows never move, so a reader that sees the new vectors with the old rows is still right.
+        self._vectors = vectors
+        self._keys = keys
+        self._rows = {key: row for row, key in enumerate(keys)}
+        self._width, self._end = width, end
+
+    def _migrate(self):
+        try:
+            with open(self.legacy_paths[0], "r") as f:
+                keys = json.load(f)
+            vectors = np.load(self.legacy_paths[1], mmap_mode="r")
+        except (OSError, ValueError):
+            return
+        if len(keys) != len(vectors) or not len(keys):
+            return
+
+        def write_vectors(f):
+            for start in range(0, len(vectors), 4096):
+                f.write(np.asarray(vectors[start:start + 4096], dtype=np.float32).tobytes())
+
+        with _save_lock(self.vectors_path):
+            if os.path.exists(self.keys_path):
+                return  # Another instance converted it first
+            write_atomically(self.vectors_path, write_vectors)
+            write_atomically(self.keys_path, lambda f: f.write(f"{vectors.shape[1]}\n" + "".join(
+                key + "\n" for key in keys)), binary=False)
+        del vectors
+        for path in self.legacy_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @property
+    def vectors(self):
+        return self._vectors
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def __len__(self):
+        return len(self._rows) + len(self._pending)
+
+    def __contains__(self, text: str):
+        key = self.key(text)
+        return key in self._pending or key in self._rows
+
+    def get(self, text: str):
+        key = self.key(text)
+        if key in self._pending:
+            return self._pending[key]
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        return np.array(self._vectors[row], dtype=np.float32)
+
+    def get_many(self, texts):
+        return [self.get(text) for text in texts]
+
+    def put(self, text: str, embedding):
+        key = self.key(text)
+        if key not in self._rows:
+            self._pending[key] = np.asarray(embedding, dtype=np.float32)
+
+    def save(self):
+        if not self._pending:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with _save_lock(self.vectors_path):
+            pending = dict(self._pending)
+            width = len(next(iter(pending.values())))
+            if self._width == width and os.path.exists(self.keys_path) and os.path.getsize(self.keys_path) == self._end:
+                stored_width, keys, end = width, self._keys, self._end  # Unchanged since this instance's last look
+            else:
+                stored_width, keys, end = self._read_keys()
+            size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else -1
+            if stored_width != width or size < len(keys) * width * 4:
+                # No cache yet, a damaged one, or one of another width under the same name: start a new one.
+                write_atomically(self.keys_path, lambda f: f.write(f"{width}\n"), binary=False)
+                keys, end = [], len(f"{width}\n")
+                open(self.vectors_path, "wb").close()
+                size = 0
+            # Another instance may have saved some of the same texts since this one loaded.
+            stored = self._rows if keys is self._keys else set(keys)
+            new = [(key, vector) for key, vector in pending.items() if key not in stored]
+            if new:
+                with open(self.vectors_path, "r+b") as f:
+                    if size > len(keys) * width * 4:
+                        f.truncate(len(keys) * width * 4)  # Rows a crash left without a key line
+                    f.seek(len(keys) * width * 4)
+                    f.write(np.stack([vector for _, vector in new]).astype(np.float32).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())  # Rows reach the disk before the keys that refer to them
+                with open(self.keys_path, "r+b") as f:
+                    if os.fstat(f.fileno()).st_size > end:
+                        f.truncate(end)  # A torn last line would be glued to the first new key
+                    f.seek(end)
+                    f.write("".join(key + "\n" for key, _ in new).encode("ascii"))
+                    end = f.tell()
+            if stored_width == width and len(keys) == len(self._keys):
+                # Nothing was added behind this instance's back, so only the new rows need indexing.
+                count = len(keys) + len(new)
+                self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, width))
+                self._keys = keys + [key for key, _ in new]
+                self._rows.update((key, row) for row, (key, _) in enumerate(new, len(keys)))
+                self._width, self._end = width, end
+            else:
+                self._load()
+            for key in pending:
+                self._pending.pop(key, None)
+
+
+class AnswerCache:
+    """On-disk store of answers keyed by the embedding of the question they answered.
+
+    A question at least `similarity` cosine-similar to a cached one reuses its answer. Every
+    entry records the fingerprint of the index and prompt settings it was answered against,
+    and lookups drop entries whose fingerprint no longer matches. Entries older than ttl
+    seconds expire, and beyond max_entries the least recently used are evicted.
+
+    save() writes only when something changed since the last save, one save at a time, so a
+    burst of concurrent saves collapses into one or two writes. save_later() debounces further:
+    every change made within the delay goes out in a single write.
+    """
+
+    def __init__(self, cache_dir: str, similarity: float = 0.95, max_entries: int = 256, ttl: float = 7 * 86400):
+        self.cache_dir = cache_dir
+        self.similarity = similarity
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries_path = os.path.join(cache_dir, "answers.json")
+        self.vectors_path = os.path.join(cache_dir, "answers.npy")
+        self.hits = 0
+        self.misses = 0
+        self._entries = []
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # Held for the whole write, so saves never interleave
+        self._changes = 0
+        self._saved_changes = 0
+        self._timer = None
+        self._flush_at_exit = False
+        self._load()
+
+    def _load(self):
+        if not (os.path.exists(self.entries_path) and os.path.exists(self.vectors_path)):
+            return
+        try:
+            with open(self.entries_path, "r") as f:
+                entries = json.load(f)
+            vectors = np.load(self.vectors_path)
+        except (OSError, ValueError):
+            return
+        if len(entries) != len(vectors):
+            return
+        self._entries = entries
+        self._vectors = vectors.astype(np.float32)
+        self._evict(time.time())
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @staticmethod
+    def _unit(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _keep(self, mask):
+        self._entries = [entry for entry, keep in zip(self._entries, mask) if keep]
+        self._vectors = self._vectors[np.asarray(mask, dtype=bool)]
+
+    def _evict(self, now):
+        self._keep([now - entry["created"] <= self.ttl for entry in self._entries])
+        if len(self._entries) > self.max_entries:
+            recent = sorted(range(len(self._entries)), key=lambda i: self._entries[i]["used"])[-self.max_entries:]
+            mask = np.zeros(len(self._entries), dtype=bool)
+            mask[recent] = True
+            self._keep(mask)
+
+    def _nearest(self, vector, fingerprint):
+        if not self._entries or self._vectors.shape[1] != len(vector):
+            return None, 0.0
+        similarities = self._vectors @ vector
+        similarities[[entry["fingerprint"] != fingerprint for entry in self._entries]] = -np.inf
+        best = int(np.argmax(similarities))
+        return best, float(similarities[best])
+
+    def lookup(self, embedding, fingerprint: str):
+        """Returns (entry, similarity) for the closest cached question above the threshold, else None."""
+        vector = self._unit(embedding)
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            # Answers built from an older index or prompt would cite stale excerpts.
+            self._keep([entry["fingerprint"] == fingerprint for entry in self._entries])
+            best, similarity = self._nearest(vector, fingerprint)
+            if best is None or similarity < self.similarity:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._changes += 1
+            entry = self._entries[best]
+            entry["used"] = now
+            entry["hits"] = entry.get("hits", 0) + 1
+            return dict(entry), similarity
+
+    def put(self, question: str, embedding, answer: str, fingerprint: str):
+        vector = self._unit(embedding)
+        now = time.time()
+        with self._lock:
+            if len(self._entries) and self._vectors.shape[1] != len(vector):
+                self._keep([False] * len(self._entries))  # The embedding dimensions changed
+            best, similarity = self._nearest(vector, fingerprint)
+            entry = {"question": question, "answer": answer, "fingerprint": fingerprint, "created": now, "used": now}
+            if best is not None and similarity >= self.similarity:
+                # A refreshed answer replaces the one it was served from.
+                entry["hits"] = self._entries[best].get("hits", 0)
+                self._entries[best] = entry
+                self._vectors[best] = vector
+            else:
+                entry["hits"] = 0
+                self._entries.append(entry)
+                vectors = self._vectors if self._vectors.size else self._vectors.reshape(0, len(vector))
+                self._vectors = np.concatenate([vectors, vector[None, :]])
+            self._evict(now)
+            self._changes += 1
+
+    def save(self):
+        with self._save_lock:
+            with self._lock:
+                if self._changes == self._saved_changes:
+                    return  # Nothing new, or a save that was waiting for the lock already wrote it
+                changes = self._changes
+                entries = [dict(entry) for entry in self._entries]
+                vectors = self._vectors.copy()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            write_atomically(self.vectors_path, lambda f: np.save(f, vectors))
+            write_atomically(self.entries_path, lambda f: json.dump(entries, f), binary=False)
+            self._saved_changes = changes
+
+    def save_later(self, delay: float):
+        with self._lock:
+            if self._timer is not None:
+                return  # The pending save will include this change
+            if not self._flush_at_exit:
+                atexit.register(self.save)  # Flush whatever the last timer has not written yet
+                self._flush_at_exit = True
+            self._timer = threading.Timer(delay, self._timed_save)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timed_save(self):
+        with self._lock:
+            self._timer = None
+        self.save()
+
+
+class PromptCacheStats:
+    """Prompt tokens the chat API reported as read from its own prompt cache, summed over a session."""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def usage_tokens(usage):
+        """(prompt_tokens, cached_tokens) from a usage object, or the plain dict older openai versions leave."""
+        if usage is None:
+            return None
+        if not isinstance(usage, dict):
+            usage = usage.model_dump()
+        details = usage.get("prompt_tokens_details") or {}
+        return usage.get("prompt_tokens") or 0, details.get("cached_tokens") or 0
+
+    def add(self, usage):
+        tokens = self.usage_tokens(usage)
+        if tokens is not None:
+            with self._lock:
+                self.requests += 1
+                self.prompt_tokens += tokens[0]
+                self.cached_tokens += tokens[1]
+        return tokens
+
+    @property
+    def hit_rate(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
@@ -0,0 +1,51 @@
+import hashlib
+
+import numpy as np
+
+SENTENCE_ENDINGS = (b".", b"?", b"!")
+MIN_SENTENCE_FRACTION = 0.5  # A sentence boundary is only used if the chunk keeps at least this share of max_length
+
+
+def sentence_end_mask(tokens, token_bytes):
+    """Flags tokens that finish a sentence, decoding each distinct token id once."""
+    unique, inverse = np.unique(tokens, return_inverse=True)
+    ends = np.fromiter((token_bytes(int(token)).rstrip().endswith(SENTENCE_ENDINGS) for token in unique),
+                       dtype=bool, count=len(unique))
+    return ends[inverse.reshape(-1)]
+
+
+def chunk_bounds(count: int, max_length: int, overlap: int = 0, sentence_ends=None):
+    """Returns [start, end) token offsets of every chunk.
+
+    Without sentence_ends the bounds are a fixed stride computed in one step. With it,
+    each chunk is cut after the last sentence-ending token that keeps it at least
+    MIN_SENTENCE_FRACTION of max_length long, falling back to a hard cut.
+    """
+    if not count:
+        return np.empty((0, 2), dtype=np.int64)
+    overlap = min(overlap, max_length - 1)
+    if sentence_ends is None:
+        starts = np.arange(0, max(count - overlap, 1), max_length - overlap, dtype=np.int64)
+        return np.stack((starts, np.minimum(starts + max_length, count)), axis=1)
+
+    # Chunk ends that would close a sentence, i.e. one past each sentence-ending token.
+    boundaries = np.flatnonzero(sentence_ends) + 1
+    min_length = max(1, int(max_length * MIN_SENTENCE_FRACTION))
+    bounds = []
+    start = 0
+    while True:
+        end = min(start + max_length, count)
+        if end < count:
+            candidate = np.searchsorted(boundaries, end, side="right") - 1
+            if candidate >= 0 and boundaries[candidate] >= start + min_length:
+                end = int(boundaries[candidate])
+        bounds.append((start, end))
+        if end >= count:
+            break
+        start = max(end - overlap, start + 1)
+    return np.asarray(bounds, dtype=np.int64)
+
+
+def chunk_id(document_title: str, start: int, text: str) -> str:
+    # Stable while the document and chunking settings are unchanged, unique within a folder.
+    return hashlib.sha256(f"{document_title}\0{start}\0{text}".encode("utf-8")).hexdigest()[:16]
@@ -1,43 +1,146 @@
 import configparser
-import json
+import contextlib
 import os
+import threading
 from pathlib import Path
 from typing import Any, Dict
 
 from dotenv import load_dotenv
-import openai
 from colorama import init
 
 init(autoreset=True)
 
 load_dotenv()
 
+CONFIG_PATH = "config.ini"
+DEFAULT_SETTINGS = {
+    "folder_path": "",
+    "openai_api_key": "",
+    "hotkey": "alt_l",
+    "gpt_model": "gpt-4-turbo",
+    "system_prompt": "You are a knowledgeable job interview assistant that uses information from provided textual excerpts to provide impressive, but concise answers to interview questions.",
+    "temperature": "1.0",
+    "top_p": "1.0",
+    "max_tokens": "1000",
+}
+SETTING_TYPES = {"temperature": float, "top_p": float, "max_tokens": int}
+
 config_data: Dict[str, Any] = {}
 
-def open_config() -> configparser.ConfigParser:
-    config = configparser.ConfigParser()
-
-    if Path("config.ini").exists():
-        config.read("config.ini")
-    else:
-        config["SETTINGS"] = {
-            "folder_path": "",
-            "openai_api_key": "",
-            "hotkey": "alt_l",
-            "gpt_model": "gpt-4-turbo",
-            "system_prompt": "You are a knowledgeable job interview assistant that uses information from provided textual excerpts to provide impressive, but concise answers to interview questions.",
-            "temperature": "1.0",
-            "top_p": "1.0",
-            "max_tokens": "1000",
-        }
-        config["FILES"] = {}  # Add an empty [FILES] section
-        with open("config.ini", "w") as configfile:
-            config.write(configfile)
 
-    if not config.has_section("FILES"):
-        config.add_section("FILES")
+class ConfigStore:
+    """Process-wide copy of config.ini: parsed once, read from memory, written atomically.
+
+    Every change is written as a whole new file through a temp file and os.replace, so a crash
+    never leaves a truncated config. Changes made inside batch() are coalesced into one write
+    when the outermost batch ends. Subscribers are called with (section, key, value) after each
+    change, so components holding copies of a setting can follow it without a restart. Setting
+    a key to None removes it, and subscribers see None.
+    """
+
+    def __init__(self, path=CONFIG_PATH):
+        self.path = path
+        self._parser = None
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._dirty = False
+        self._subscribers = []
+
+    @property
+    def parser(self) -> configparser.ConfigParser:
+        with self._lock:
+            if self._parser is None:
+                self._parser = configparser.ConfigParser()
+                if Path(self.path).exists():
+                    self._parser.read(self.path)
+                else:
+                    self._parser["SETTINGS"] = DEFAULT_SETTINGS
+                    self._dirty = True
+                if not self._parser.has_section("FILES"):
+                    self._parser.add_section("FILES")
+                if self._dirty:
+                    self._write()
+            return self._parser
+
+    def get(self, section: str, key: str, fallback=None):
+        with self._lock:
+            return self.parser.get(section, key, fallback=fallback)
+
+    def getint(self, section: str, key: str, fallback=None):
+        with self._lock:
+            return self.parser.getint(section, key, fallback=fallback)
+
+    def getfloat(self, section: str, key: str, fallback=None):
+        with self._lock:
+            return self.parser.getfloat(section, key, fallback=fallback)
+
+    def options(self, section: str) -> list:
+        with self._lock:
+            return self.parser.options(section) if self.parser.has_section(section) else []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    @contextlib.contextmanager
+    def batch(self):
+        with self._lock:
+            self._depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._depth -= 1
+                if not self._depth and self._dirty:
+                    self._write()
+
+    def set(self, section: str, key: str, value):
+        if value is None:
+            # str(None) would save the literal "None", which reads back as a configured value.
+            self.remove(section, key)
+            return
+        value = str(value)
+        with self._lock:
+            if not self.parser.has_section(section):
+                self.parser.add_section(section)
+            if self.parser.get(section, key, fallback=None) == value:
+                return
+            self.parser.set(section, key, value)
+            self._changed()
+        for callback in self._subscribers:
+            callback(section, key, value)
+
+    def remove(self, section: str, key: str):
+        with self._lock:
+            if not self.parser.has_section(section) or not self.parser.remove_option(section, key):
+                return
+            self._changed()
+        for callback in self._subscribers:
+            callback(section, key, None)
+
+    def _changed(self):
+        self._dirty = True
+        if not self._depth:
+            self._write()
+
+    def _write(self):
+        with open(self.path + ".tmp", "w") as configfile:
+            self._parser.write(configfile)
+        os.replace(self.path + ".tmp", self.path)
+        self._dirty = False
+
+
+config_store = ConfigStore()
+
+
+def _track_setting(section, key, value):
+    # Keeps the typed copies served by get_config in step with the file.
+    if section == "SETTINGS" and key in config_data and value is not None:
+        config_data[key] = SETTING_TYPES.get(key, str)(value)
+
+
+config_store.subscribe(_track_setting)
+
 
-    return config
 def get_config(key: str) -> Any:
     return config_data.get(key)
 
@@ -48,108 +151,73 @@ def get_user_input(prompt, fallback=None, strip_quotes=True):
         response = response.strip('"')
     return response if response else fallback
 
-def configure_folder_path(config):
+def configure_folder_path():
     """Configure the folder path setting."""
-    folder_path = config.get('SETTINGS', 'folder_path', fallback=None)
+    folder_path = config_store.get('SETTINGS', 'folder_path', fallback=None)
     if not folder_path:
         folder_path = get_user_input("Enter directory path for .txt or .pdf documents: ")
-        config['SETTINGS']['folder_path'] = folder_path
+        config_store.set('SETTINGS', 'folder_path', folder_path)
     return folder_path
 
-def configure_api_key(config):
+def configure_api_key():
     """Configure the OpenAI API key setting."""
-    openai_api_key = config.get('SETTINGS', 'openai_api_key', fallback=None)
+    openai_api_key = config_store.get('SETTINGS', 'openai_api_key', fallback=None)
     if not openai_api_key:
         openai_api_key = get_user_input("Enter your OpenAI API key: ")
-        config['SETTINGS']['openai_api_key'] = openai_api_key
+        config_store.set('SETTINGS', 'openai_api_key', openai_api_key)
     return openai_api_key
 
-def configure_hotkey(config):
+def configure_hotkey():
     """Configure the hotkey setting."""
-    hotkey = config.get('SETTINGS', 'hotkey', fallback='alt_r')
+    hotkey = config_store.get('SETTINGS', 'hotkey', fallback='alt_r')
     return hotkey
 
 
 def configure_file_types(folder_path):
-    config = configparser.ConfigParser()
-    config.read("config.ini")
-
-    if not config.has_section("FILES"):
-        config.add_section("FILES")
-
-    # Remove file types for files that are no longer present
-    existing_files = set(os.path.basename(file) for file in os.listdir(folder_path))
-    config_files = set(config.options("FILES"))
-    removed_files = config_files - existing_files
-
-    for filename in removed_files:
-        config.remove_option("FILES", filename)
-
-    # Prompt for file types for new files
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".txt") or filename.endswith(".pdf"):
-            if not config.has_option("FILES", filename):
-                file_type = get_user_input(f"Indicate the type of file '{filename}' (resume/job_description/company_description/other/none): ", "none", False)
-                if file_type.lower() != "none":
-                    config.set("FILES", filename, file_type)
-
-    with open("config.ini", "w") as configfile:
-        config.write(configfile)
-
-def save_config(config):
-    """Save the updated configuration to the file."""
-    with open("config.ini", "w") as configfile:
-        config.write(configfile)
+    with config_store.batch():
+        # Remove file types for files that are no longer present
+        existing_files = set(os.path.basename(file) for file in os.listdir(folder_path))
+        config_files = set(config_store.options("FILES"))
+        removed_files = config_files - existing_files
+
+        for filename in removed_files:
+            config_store.remove("FILES", filename)
+
+        # Prompt for file types for new files
+        for filename in os.listdir(folder_path):
+            if filename.endswith(".txt") or filename.endswith(".pdf"):
+                if config_store.get("FILES", filename) is None:
+                    file_type = get_user_input(f"Indicate the type of file '{filename}' (resume/job_description/company_description/other/none): ", "none", False)
+                    if file_type.lower() != "none":
+                        config_store.set("FILES", filename, file_type)
 
 def configure_user_settings():
-    config = open_config()
-    folder_path = configure_folder_path(config)
-    openai_api_key = configure_api_key(config)
-    hotkey = configure_hotkey(config)
-
-    save_config(config)
+    with config_store.batch():
+        folder_path = configure_folder_path()
+        openai_api_key = configure_api_key()
+        hotkey = configure_hotkey()
 
     return folder_path, openai_api_key, hotkey
 
 
 def get_file_type(filename):
-    config = configparser.ConfigParser()
-    config_file = Path("config.ini")
-
-    if config_file.exists():
-        config.read(config_file)
-    else:
-        return "other"
-
-    if not config.has_section("FILES"):
-        return "other"
-
-    if config.has_option("FILES", filename):
-        file_type = config.get("FILES", filename)
-        if file_type.lower() != "none":
-            return file_type
+    file_type = config_store.get("FILES", filename)
+    if file_type and file_type.lower() != "none":
+        return file_type
     return "other"
 
 def configure_gpt_settings() -> tuple:
-    config = open_config()
-
-    gpt_model = config.get("SETTINGS", "gpt_model") or os.getenv("GPT_MODEL", "gpt-4-turbo")
+    gpt_model = config_store.get("SETTINGS", "gpt_model") or os.getenv("GPT_MODEL", "gpt-4-turbo")
     system_prompt = (
-        config.get("SETTINGS", "system_prompt")
+        config_store.get("SETTINGS", "system_prompt")
         or os.getenv(
             "SYSTEM_PROMPT",
             "You are a knowledgeable job interview assistant that uses information from provided textual excerpts to provide impressive, but concise answers to interview questions.",
         )
     )
-    temperature = config.getfloat("SETTINGS", "temperature") or float(os.getenv("TEMPERATURE", "1.0"))
-    top_p = config.getfloat("SETTINGS", "top_p") or float(os.getenv("TOP_P", "1.0"))
-    max_tokens = config.getint("SETTINGS", "max_tokens") or int(os.getenv("MAX_TOKENS", "1000"))
-
-    config["SETTINGS"]["gpt_model"] = gpt_model
-    config["SETTINGS"]["system_prompt"] = system_prompt
-    config["SETTINGS"]["temperature"] = str(temperature)
-    config["SETTINGS"]["top_p"] = str(top_p)
-    config["SETTINGS"]["max_tokens"] = str(max_tokens)
+    temperature = config_store.getfloat("SETTINGS", "temperature") or float(os.getenv("TEMPERATURE", "1.0"))
+    top_p = config_store.getfloat("SETTINGS", "top_p") or float(os.getenv("TOP_P", "1.0"))
+    max_tokens = config_store.getint("SETTINGS", "max_tokens") or int(os.getenv("MAX_TOKENS", "1000"))
 
     config_data.update(
         {
@@ -161,28 +229,29 @@ def configure_gpt_settings() -> tuple:
         }
     )
 
+    with config_store.batch():
+        for key in ("gpt_model", "system_prompt", "temperature", "top_p", "max_tokens"):
+            config_store.set("SETTINGS", key, config_data[key])
+
     return gpt_model, system_prompt, temperature, top_p, max_tokens
 
 
 def configure_settings(**kwargs: Any) -> tuple:
-    config = open_config()
-    user_settings = configure_user_settings()
-    gpt_settings = configure_gpt_settings()
-
-    if kwargs:
-        for key, value in kwargs.items():
-            config["SETTINGS"][key] = str(value)
-            config_data[key] = value
+    # Raises ValueError before anything is saved if a numeric setting does not parse.
+    typed = {key: None if value is None else SETTING_TYPES.get(key, str)(value) for key, value in kwargs.items()}
 
-    with open("config.ini", "w") as configfile:
-        config.write(configfile)
+    with config_store.batch():
+        for key, value in typed.items():
+            config_store.set("SETTINGS", key, value)
+        user_settings = configure_user_settings()
+        gpt_settings = configure_gpt_settings()
 
     config_data.update(
         dict(
             zip(
                 [
                     "folder_path",
-                    "openai_client",
+                    "openai_api_key",
                     "hotkey",
                     "gpt_model",
                     "system_prompt",
@@ -195,4 +264,4 @@ def configure_settings(**kwargs: Any) -> tuple:
         )
     )
 
-    return user_settings + gpt_settings
\ No newline at end of file
+    return user_settings + gpt_settings
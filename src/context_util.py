@@ -0,0 +1,150 @@
+import numpy as np
+
+MMR_LAMBDA = 0.7  # Weight of relevance against novelty when ordering candidates
+DUPLICATE_SIMILARITY = 0.95  # Candidates at least this similar to a chosen chunk are dropped outright
+MAX_MERGE_OVERLAP = 2000  # Characters searched for text shared by merged neighbouring chunks
+MIN_MERGE_OVERLAP = 16  # Shorter matches are coincidence, not CHUNK_OVERLAP
+PROFILE_TYPES = ("resume", "job_description")  # FILES types whose documents lead every cached-layout prompt, in order
+SUMMARY_ANSWER_CHARS = 240  # Characters of each earlier answer kept in the session summary
+
+
+def mmr_order(vectors, lambda_=MMR_LAMBDA, duplicate_similarity=DUPLICATE_SIMILARITY):
+    """Orders candidates by maximal marginal relevance, dropping near-duplicates.
+
+    vectors are unit-length rows in retrieval order, and relevance falls linearly with
+    rank so no query embedding is needed. Returns positions into vectors.
+    """
+    count = len(vectors)
+    if not count:
+        return []
+    relevance = 1.0 - np.arange(count) / count
+    similarity = vectors @ vectors.T
+    redundancy = np.full(count, -np.inf)
+    available = np.ones(count, dtype=bool)
+    order = []
+    while available.any():
+        scores = lambda_ * relevance - (1 - lambda_) * np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        available[best] = False
+        if redundancy[best] >= duplicate_similarity:
+            continue
+        order.append(best)
+        redundancy = np.maximum(redundancy, similarity[best])
+    return order
+
+
+def merge_texts(first: str, second: str) -> str:
+    # Neighbouring chunks may share CHUNK_OVERLAP tokens, which should appear only once.
+    for size in range(min(len(first), len(second), MAX_MERGE_OVERLAP), MIN_MERGE_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first + " " + second
+
+
+def pack_context(index, ranked, token_budget: int, count_tokens, header_tokens: int = 16):
+    """Chooses excerpts for the prompt from ranked chunk rows within token_budget.
+
+    Candidates are taken in MMR order while their cached token counts plus header_tokens
+    each still fit. Chosen chunks that are neighbours in the same document are then merged
+    into one excerpt. Returns (title, rows, text) tuples, most relevant excerpt first.
+    """
+    ranked = [int(row) for row in ranked]
+    if not ranked or token_budget <= 0:
+        return []
+
+    vectors = index.vectors(ranked)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    chosen = []
+    used = 0
+    for position in mmr_order(vectors / norms):
+        row = ranked[position]
+        tokens = index.token_counts[row] if index.token_counts is not None else count_tokens(index.texts[row])
+        if used + tokens + header_tokens > token_budget:
+            continue
+        chosen.append(row)
+        used += tokens + header_tokens
+
+    rank = {row: i for i, row in enumerate(chosen)}
+    excerpts = []
+    for row in sorted(chosen):
+        previous = excerpts[-1] if excerpts else None
+        if previous and previous["rows"][-1] == row - 1 and index.titles[row] == previous["title"]:
+            previous["rows"].append(row)
+            previous["text"] = merge_texts(previous["text"], index.texts[row])
+            previous["rank"] = min(previous["rank"], rank[row])
+        else:
+            excerpts.append({"title": index.titles[row], "rows": [row], "text": index.texts[row], "rank": rank[row]})
+    excerpts.sort(key=lambda excerpt: excerpt["rank"])
+    return [(excerpt["title"], excerpt["rows"], excerpt["text"]) for excerpt in excerpts]
+
+
+def profile_context(index, token_budget: int, count_tokens, header_tokens: int = 16, types=PROFILE_TYPES):
+    """The opening of every document tagged with one of types, for the stable start of the prompt.
+
+    Titles carry the FILES type as their " - Type" suffix. Documents are taken in types order,
+    then by title, and each is filled from its first chunk up to an equal share of token_budget
+    (plus whatever earlier documents left unused), so the same index always yields the same
+    text. Returns (title, rows, text) tuples like pack_context.
+    """
+    documents = {}
+    for row, title in enumerate(index.titles):
+        file_type = title.rsplit(" - ", 1)[-1].lower()
+        if file_type in types:
+            documents.setdefault((types.index(file_type), title), []).append(row)
+
+    profile = []
+    used = 0
+    for remaining, ((_, title), rows) in zip(range(len(documents), 0, -1), sorted(documents.items())):
+        share = used + (token_budget - used) // remaining
+        chosen = []
+        for row in rows:
+            tokens = index.token_counts[row] if index.token_counts is not None else count_tokens(index.texts[row])
+            tokens += 0 if chosen else header_tokens
+            if used + tokens > share:
+                break
+            chosen.append(row)
+            used += tokens
+        if chosen:
+            text = index.texts[chosen[0]]
+            for previous, row in zip(chosen, chosen[1:]):
+                text = merge_texts(text, index.texts[row]) if row == previous + 1 else text + " " + index.texts[row]
+            profile.append((title, chosen, text))
+    return profile
+
+
+class SessionSummary:
+    """Rolling digest of the questions answered so far in one interview.
+
+    Each exchange keeps its question and the first line of its answer. Exchanges are only
+    appended until the digest outgrows token_budget, then the oldest half is dropped at once,
+    so consecutive prompts usually share the whole digest as a prefix.
+    """
+
+    def __init__(self, token_budget: int, count_tokens):
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens
+        self.exchanges = []
+        self.tokens = 0
+
+    def add(self, question: str, answer: str):
+        if self.token_budget <= 0:
+            return
+        first_line = next((line.strip() for line in answer.splitlines() if line.strip()), "")
+        exchange = f"Q: {question.strip()}\nA: {first_line[:SUMMARY_ANSWER_CHARS]}"
+        self.exchanges.append((exchange, self.count_tokens(exchange)))
+        self.tokens += self.exchanges[-1][1]
+        if self.tokens > self.token_budget:
+            while len(self.exchanges) > 1 and self.tokens > self.token_budget // 2:
+                self.tokens -= self.exchanges.pop(0)[1]
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(exchange for exchange, _ in self.exchanges)
+
+    def copy(self) -> "SessionSummary":
+        summary = SessionSummary(self.token_budget, self.count_tokens)
+        summary.exchanges = list(self.exchanges)
+        summary.tokens = self.tokens
+        return summary
@@ -0,0 +1,183 @@
+import os
+
+# openai_util builds its clients at import time; the harness swaps them for mock-backed ones below.
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import threading
+import time
+import wave
+
+import httpx
+import numpy as np
+from colorama import Fore, Style
+from openai import AsyncOpenAI, OpenAI
+
+import openai_util
+from async_util import runtime
+from audio_util import RingBuffer, StreamingTranscriber
+from index_util import VectorIndex
+from ingest_util import IngestPipeline
+from mock_openai import MockLatency, MockOpenAIServer
+from trace_util import Tracer, load_spans, summarize
+
+CAPTURE_RATE = 44100
+CAPTURE_CHANNELS = 2
+CAPTURE_CHUNK = 1024
+REGRESSION_TOLERANCE = 0.2  # Relative slowdown against the baseline that counts as a regression
+REGRESSION_FLOOR_MS = 5.0  # Latency changes smaller than this are noise, however large relative to a tiny stage
+WORDS = ("python kubernetes latency cache team migration customer roadmap database pipeline incident mentoring "
+         "testing deployment metrics budget stakeholder prototype release onboarding").split()
+
+
+def point_clients_at(server: MockOpenAIServer):
+    openai_util.client = OpenAI(api_key="mock", base_url=server.base_url,
+                                http_client=httpx.Client(limits=openai_util.HTTP_LIMITS))
+    openai_util.async_client = AsyncOpenAI(api_key="mock", base_url=server.base_url,
+                                           http_client=httpx.AsyncClient(limits=openai_util.HTTP_LIMITS))
+
+
+def synthetic_corpus(folder, documents=20, sentences=400, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(documents):
+        with open(os.path.join(folder, f"document_{i:03d}.txt"), "w") as f:
+            for _ in range(sentences):
+                f.write(" ".join(rng.choice(WORDS, size=rng.integers(8, 20))).capitalize() + ". ")
+
+
+def synthetic_recording(seconds=6.0, seed=0):
+    # Syllable-rate modulated noise with pauses: loud enough for the VAD, silent enough to trim.
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * CAPTURE_RATE)) / CAPTURE_RATE
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) * (np.sin(2 * np.pi * 0.3 * t) > -0.5)
+    mono = (8000 * envelope * rng.standard_normal(len(t))).astype(np.int16)
+    return np.repeat(mono[:, None], CAPTURE_CHANNELS, axis=1), CAPTURE_RATE
+
+
+def read_recording(path):
+    with wave.open(path, "rb") as wav_file:
+        if wav_file.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV fixtures are supported")
+        channels = wav_file.getnchannels()
+        frames = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+        return frames.reshape(-1, channels), wav_file.getframerate()
+
+
+def bench_ingestion(folder):
+    names = sorted(name for name in os.listdir(folder) if openai_util.is_document(name))
+    documents = [(name, os.path.join(folder, name), os.path.splitext(name)[0], "other") for name in names]
+
+    start = time.perf_counter()
+    pipeline = IngestPipeline()
+    sections = [section for sections in pipeline.run(documents).values() for section in sections]
+    elapsed = time.perf_counter() - start
+    pipeline.report()
+
+    texts = [section["text"] for section in sections]
+    index = VectorIndex([s["title"] for s in sections], [s["id"] for s in sections], texts,
+                        openai_util.embed_corpus(texts), [s["tokens"] for s in sections])
+    index.lexical
+    return index, len(sections) / elapsed
+
+
+def ask_recording(frames, rate, index, trace):
+    """Replays a recording through the capture ring buffer, then transcribes and answers it like record_audio."""
+    trace.activate()
+    ring = RingBuffer(len(frames) + 1, frames.shape[1])
+    transcriber = StreamingTranscriber(openai_util.transcribe, ring, 0, rate)
+    with trace.span("capture"):
+        for start in range(0, len(frames), CAPTURE_CHUNK):
+            ring.write(frames[start:start + CAPTURE_CHUNK])
+            transcriber.advance(ring.position)
+
+    released, released_at = time.perf_counter(), time.time()
+    with trace.span("transcript_ready"):
+        transcription = openai_util.clean_transcription(transcriber.finish(ring.position))
+    with contextlib.redirect_stdout(io.StringIO()):
+        runtime.run(openai_util.ask(transcription, index, threading.Event()))
+    trace.record("end_to_end", released_at, time.perf_counter() - released)
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    regressions = []
+    for name, value in results.items():
+        expected = baseline.get(name)
+        if expected is None or not expected:
+            continue
+        # Throughputs regress when they drop, latencies when they grow.
+        change = (expected - value) / expected if name.endswith("_per_second") else (value - expected) / expected
+        line = f"{name:<36} {value:10.2f}  baseline {expected:10.2f}  {100 * change:+6.1f}%"
+        if change > tolerance and (not name.endswith("_ms") or value - expected > REGRESSION_FLOOR_MS):
+            regressions.append(name)
+            print(Fore.RED + line + "  REGRESSION")
+        else:
+            print(Fore.LIGHTGREEN_EX + line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end Hinterview benchmark against a local mock OpenAI server")
+    parser.add_argument("fixtures", nargs="*", help="16-bit PCM .wav recordings, a synthetic one if omitted")
+    parser.add_argument("--folder", default=None, help="documents to ingest, a synthetic corpus if omitted")
+    parser.add_argument("--questions", type=int, default=10, help="questions asked, cycling through the fixtures")
+    parser.add_argument("--first-token", type=float, default=0.25, help="mock seconds to the first chat token")
+    parser.add_argument("--transcription", type=float, default=0.3, help="mock seconds per transcription request")
+    parser.add_argument("--embeddings", type=float, default=0.05, help="mock seconds per embeddings request")
+    parser.add_argument("--baseline", default="e2e_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(MockLatency(embeddings=args.embeddings, transcription=args.transcription,
+                                          first_token=args.first_token)).start()
+    point_clients_at(server)
+    openai_util.answer_cache = None  # The fixtures repeat, and every question should take the full pipeline
+    recordings = [read_recording(path) for path in args.fixtures] or [synthetic_recording()]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        openai_util.CACHE_DIR = os.path.join(workdir, "cache")  # Every run embeds from scratch
+        folder = args.folder
+        if folder is None:
+            folder = os.path.join(workdir, "documents")
+            os.makedirs(folder)
+            synthetic_corpus(folder)
+        print(Style.BRIGHT + Fore.CYAN + f"Mock OpenAI server at {server.base_url}, ingesting {folder}")
+        index, chunks_per_second = bench_ingestion(folder)
+
+        tracer = Tracer(os.path.join(workdir, "trace.jsonl"))
+        openai_util.warm_up().result()
+        for question in range(args.questions):
+            frames, rate = recordings[question % len(recordings)]
+            ask_recording(frames, rate, index, tracer.question(question))
+        stages = summarize(load_spans([tracer.path]))
+    server.stop()
+
+    results = {"ingest_chunks_per_second": chunks_per_second}
+    for stage, seconds in stages.items():
+        results[f"{stage}_p50_ms"] = float(np.percentile(1000 * seconds, 50))
+        results[f"{stage}_p95_ms"] = float(np.percentile(1000 * seconds, 95))
+    print(Style.BRIGHT + Fore.CYAN + f"{args.questions} questions, mock requests served: {server.requests}")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline) if baseline else []
+    if not baseline:
+        for name, value in results.items():
+            print(Fore.LIGHTGREEN_EX + f"{name:<36} {value:10.2f}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(Fore.CYAN + f"Baseline saved to {args.baseline}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 import os
 from colorama import Fore, Style
 from art import *
-from config import configure_settings, get_config, configure_file_types
-from openai_util import embed_documents
+from config import configure_settings, get_config, configure_file_types, config_store
+from startup_util import startup
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -69,7 +69,11 @@ def handle_settings_menu():
             if setting_name == 'folder_path' and new_value.lower() != 'b' and not os.path.exists(new_value.strip('"')):
                 print(Fore.RED + "Invalid folder path. Please enter a valid path.")
             else:
-                configure_settings(**{setting_name: new_value})
+                try:
+                    configure_settings(**{setting_name: new_value})
+                except ValueError:
+                    print(Fore.RED + f"Invalid value for {setting_name}. Please enter a number.")
+                    continue
             clear_screen()
         else:
             print(Fore.RED + "Invalid choice. Please try again.")
@@ -84,6 +88,22 @@ def display_recording():
 def display_transcribing():
     print(Fore.BLUE + "[STATUS] Transcribing...")
 
+def display_transcription_latency(seconds):
+    print(Fore.LIGHTBLACK_EX + f"[STATUS] Transcript ready {seconds:.2f}s after release")
+
+def display_no_speech():
+    print(Fore.YELLOW + "[STATUS] No speech detected.")
+
+def display_cancelled(saved):
+    requests = ", ".join(f"{count} {kind}" for kind, count in sorted(saved["requests"].items()))
+    line = f"[STATUS] Cancelled question {saved['job']} after {saved['seconds']:.1f}s: aborted {requests} request(s)"
+    if saved["upload_bytes"]:
+        line += f", {saved['upload_bytes'] / 1024:.0f} KiB of audio upload"
+    print(Fore.LIGHTBLACK_EX + line)
+
+def display_waiting_for_index():
+    print(Fore.LIGHTBLACK_EX + "[STATUS] Waiting for the document index...")
+
 def display_processing():
     print(Fore.MAGENTA + "[STATUS] Fetching AI Response...")
 
@@ -93,11 +113,13 @@ def display_error(error_message):
 
 def primary_gui():
     display_intro()
+    startup.preload(config_store.get("SETTINGS", "folder_path", fallback=""))
 
     while True:
         choice = display_initial_menu()
 
         if choice == '1':
+            startup.mark("start")
             print(Fore.GREEN + "Starting Interview...\n")
             break
         elif choice == '2':
@@ -114,8 +136,9 @@ def primary_gui():
 
     configure_file_types(folder_path)
 
-    titles, locs, texts, embeddings = embed_documents(folder_path)
+    # Opened in the background while the menu was up; new and changed files are embedded after the hotkey is live.
+    indexer = startup.indexer(folder_path)
 
     display_instructions()
 
-    return titles, locs, texts, embeddings
\ No newline at end of file
+    return indexer
\ No newline at end of file
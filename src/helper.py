@@ -1,78 +1,100 @@
 import threading
-import asyncio
+import time
+from concurrent.futures import CancelledError
 from config import get_config, configure_user_settings
 from gui_util import display_recording, display_transcribing, display_processing, \
-    clear_screen, primary_gui
+    display_transcription_latency, display_no_speech, display_cancelled, display_waiting_for_index, display_error, \
+    clear_screen
 import pyaudio
-from pydub import AudioSegment
+from audio_util import AudioCapture, StreamingTranscriber, speech_codec
 from pynput import keyboard
 from colorama import init, Fore
-from openai_util import transcribe_and_clean, ask
+from openai_util import TRANSCRIPTION_FAILED, atranscribe, clean_transcription, ask, warm_up
+from pipeline_util import PipelineScheduler
+from trace_util import Tracer
 
 init(autoreset=True)
 
-titles, locs, texts, embeddings = primary_gui()
-
-HOTKEY = get_config("hotkey")
-FOLDER_PATH = get_config("folder_path")
-
 FORMAT = pyaudio.paInt16
 CHANNELS = 2
 RATE = 44100
 CHUNK = 1024
-MP3_OUTPUT_FILENAME = "temp.mp3"
 DEVICE_INDEX = 1  # Index for BlackHole 2ch
-audio = pyaudio.PyAudio()
 
 recording_event = threading.Event()
-interruption_event = threading.Event()
-
-def record_audio():
-    frames = []
+scheduler = PipelineScheduler(on_cancel=display_cancelled)
+tracer = Tracer()
+indexer = None
+capture = None
+HOTKEY = None
+
+def start(folder_indexer):
+    """Opens the capture device and warms the API clients, leaving re-indexing to the indexer's thread."""
+    global indexer, capture, HOTKEY
+    indexer = folder_indexer
+    indexer.start()
+    warm_up()
+    threading.Thread(target=speech_codec, daemon=True).start()  # Probe ffmpeg's encoders before the first question
+    HOTKEY = get_config("hotkey")
+    capture = AudioCapture(pyaudio.PyAudio(), FORMAT, CHANNELS, RATE, CHUNK, DEVICE_INDEX)
+    capture.start()
+
+def record_audio(job):
+    def transcribe(audio_file):
+        return job.run(atranscribe(audio_file), "transcription", upload_bytes=len(audio_file[1]))
+
+    trace = tracer.question(job.job_id)
+    trace.activate()  # This thread's context is copied into every segment worker and coroutine of the job
+    pressed = time.time()
     display_recording()
 
     try:
-        stream = audio.open(format=FORMAT, channels=CHANNELS,
-                            rate=RATE, input=True, input_device_index=DEVICE_INDEX,
-                            frames_per_buffer=CHUNK)
-
-        while recording_event.is_set():
-            data = stream.read(CHUNK)
-            frames.append(data)
-
-        stream.stop_stream()
-        stream.close()
-
-        audio_segment = AudioSegment(
-            data=b''.join(frames),
-            sample_width=audio.get_sample_size(FORMAT),
-            frame_rate=RATE,
-            channels=CHANNELS
-        )
-        audio_segment.export(MP3_OUTPUT_FILENAME, format="mp3", bitrate="64k")
-
+        position = capture.mark()
+        transcriber = StreamingTranscriber(transcribe, capture.ring, position, RATE)
+        while recording_event.is_set() and not job.cancelled.is_set():
+            position = capture.ring.wait(position)
+            capture.check()  # A dead capture thread would otherwise pass for a question with no speech
+            transcriber.advance(position)
+
+        released, released_at = time.perf_counter(), time.time()
+        trace.record("capture", pressed, released_at - pressed)
         display_transcribing()
-        transcription_result = transcribe_and_clean(MP3_OUTPUT_FILENAME)
-
-        if transcription_result != "Transcription failed. Please try again.":
-            if not interruption_event.is_set():  # Only process if not interrupted
+        transcription_result = clean_transcription(transcriber.finish(capture.ring.position))
+        transcript_seconds = time.perf_counter() - released
+        display_transcription_latency(transcript_seconds)
+        trace.record("transcript_ready", released_at, transcript_seconds)
+
+        if not transcriber.speech_detected:
+            display_no_speech()
+        elif transcription_result != TRANSCRIPTION_FAILED:
+            if not job.cancelled.is_set():  # Only process if not interrupted
+                if not indexer.ready.is_set():
+                    display_waiting_for_index()  # First run, the folder is still being embedded
+                    indexer.ready.wait()
                 display_processing()
-                asyncio.run(ask(transcription_result, titles, locs, texts, embeddings, interruption_event))
+                job.run(ask(transcription_result, indexer.index, job.cancelled), "answer")
+                trace.record("end_to_end", released_at, time.perf_counter() - released)
         else:
             print(Fore.RED + transcription_result)
+    except CancelledError:
+        pass  # Preempted by a newer question, the scheduler has already reported what was saved
+    except RuntimeError as e:
+        display_error(e)  # The capture thread died; every later question would fail the same way
     finally:
-        frames.clear()
+        scheduler.finish(job)
 
 
 
 def on_press(key):
-    if key == getattr(keyboard.Key, HOTKEY) and not recording_event.is_set():
-        clear_screen()
-        recording_event.set()
-        threading.Thread(target=record_audio).start()
-    interruption_event.set()
+    if key == getattr(keyboard.Key, HOTKEY):
+        if not recording_event.is_set():
+            clear_screen()
+            recording_event.set()
+            # Starting a question cancels the previous one's transcription, embedding and stream.
+            threading.Thread(target=record_audio, args=(scheduler.start(),)).start()
+    elif not recording_event.is_set():
+        scheduler.cancel()
 
 def on_release(key):
     if key == getattr(keyboard.Key, HOTKEY) and recording_event.is_set():
-        recording_event.clear()
-        interruption_event.clear()
\ No newline at end of file
+        recording_event.clear()
\ No newline at end of file
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from ann_util import ANN_NPROBE, IVFIndex
+from lexical_util import LexicalIndex
+
+INDEX_DTYPES = ("float32", "float16", "int8")
+SCORE_BLOCK_ROWS = 8192  # Rows dequantized at a time so scoring never materializes the full matrix
+
+
+class ChunkTexts:
+    """Chunk texts as one UTF-8 byte array plus row offsets: text i is data[offsets[i]:offsets[i + 1]].
+
+    An index opened with load_index keeps the bytes memory-mapped and decodes a text only when
+    its row is read, so the texts are neither parsed from JSON nor held as Python strings.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def pack(cls, texts):
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        row = range(len(self))[row]
+        return self.data[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+def _texts(texts):
+    return texts if isinstance(texts, ChunkTexts) else list(texts)
+
+
+class VectorIndex:
+    """Chunk metadata plus a contiguous, row-normalized embedding matrix.
+
+    The matrix is float32 when built in memory. Indexes opened with load_index keep the
+    stored float16 or int8 rows memory-mapped, with a per-row scale for int8, and read the
+    texts from a memory-mapped ChunkTexts. A BM25
+    LexicalIndex over the same texts is built on first use of the lexical property. When an
+    IVFIndex is attached as ann, search only scores the rows of the lists closest to the query.
+    """
+
+    def __init__(self, titles, ids, texts, embeddings, token_counts=None):
+        self.titles = list(titles)
+        self.ids = list(ids)
+        self.texts = _texts(texts)
+        self.token_counts = list(token_counts) if token_counts is not None else None
+        self.scales = None
+        self.ann = None
+        self._lexical = None
+        self._fingerprint = None
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(self.texts), -1) if matrix.size else np.zeros((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = np.ascontiguousarray(matrix / norms)
+
+    @classmethod
+    def from_matrix(cls, titles, ids, texts, matrix, scales=None, ann=None, token_counts=None):
+        index = cls.__new__(cls)
+        index.titles = list(titles)
+        index.ids = list(ids)
+        index.texts = _texts(texts)
+        index.token_counts = list(token_counts) if token_counts is not None else None
+        index.matrix = matrix
+        index.scales = scales
+        index.ann = ann
+        index._lexical = None
+        index._fingerprint = None
+        return index
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def lexical(self) -> LexicalIndex:
+        if self._lexical is None:
+            self._lexical = LexicalIndex(self.texts)
+        return self._lexical
+
+    @property
+    def fingerprint(self) -> str:
+        # Chunk ids hash each chunk's title, position and text, so they identify the indexed content.
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.sha256("\0".join(self.ids).encode("utf-8")).hexdigest()
+        return self._fingerprint
+
+    @property
+    def dtype(self) -> str:
+        return self.matrix.dtype.name
+
+    @staticmethod
+    def _unit(query_embedding):
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        return query / norm if norm else query
+
+    def scores(self, query_embedding):
+        query = self._unit(query_embedding)
+
+        if self.matrix.dtype == np.float32:
+            scores = self.matrix @ query
+        else:
+            scores = np.empty(len(self.matrix), dtype=np.float32)
+            for start in range(0, len(self.matrix), SCORE_BLOCK_ROWS):
+                block = self.matrix[start:start + SCORE_BLOCK_ROWS]
+                scores[start:start + len(block)] = block.astype(np.float32) @ query
+
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def vectors(self, rows):
+        vectors = np.asarray(self.matrix[rows], dtype=np.float32)
+        if self.scales is not None:
+            vectors = vectors * self.scales[rows, None]
+        return vectors
+
+    def row_scores(self, query_embedding, rows):
+        # Sorted rows turn the gather from a memory-mapped matrix into a forward scan.
+        rows = np.sort(rows)
+        scores = np.asarray(self.matrix[rows], dtype=np.float32) @ self._unit(query_embedding)
+        if self.scales is not None:
+            scores *= self.scales[rows]
+        return rows, scores
+
+    def search(self, query_embedding, top_n: int, nprobe: int = ANN_NPROBE, exact: bool = False):
+        if not len(self) or top_n <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        rows = None
+        if self.ann is not None and not exact:
+            candidates = self.ann.candidates(self._unit(query_embedding), nprobe)
+            # Probed lists holding fewer than top_n rows would cut the results short, those queries scan the whole index.
+            if len(candidates) >= min(top_n, len(self)):
+                rows, scores = self.row_scores(query_embedding, candidates)
+        if rows is None:
+            scores = self.scores(query_embedding)
+        top_n = min(top_n, len(scores))
+        top = np.argpartition(scores, -top_n)[-top_n:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return (top if rows is None else rows[top]), scores[top]
+
+    def quantize(self, dtype: str):
+        if dtype not in INDEX_DTYPES:
+            raise ValueError(f"Unsupported index dtype '{dtype}', expected one of {', '.join(INDEX_DTYPES)}")
+
+        matrix = np.asarray(self.matrix, dtype=np.float32)
+        if self.scales is not None:
+            matrix = matrix * self.scales[:, None]
+
+        if dtype == "int8":
+            scales = np.abs(matrix).max(axis=1) / 127.0 if len(matrix) else np.zeros(0, dtype=np.float32)
+            scales[scales == 0] = 1.0
+            quantized = np.rint(matrix / scales[:, None]).astype(np.int8)
+            return VectorIndex.from_matrix(self.titles, self.ids, self.texts, quantized, scales.astype(np.float32),
+                                           self.ann, self.token_counts)
+        return VectorIndex.from_matrix(self.titles, self.ids, self.texts, matrix.astype(dtype), ann=self.ann,
+                                       token_counts=self.token_counts)
+
+
+def save_index(index: VectorIndex, path: str, dtype: str = "float32"):
+    os.makedirs(path, exist_ok=True)
+    quantized = index.quantize(dtype)
+
+    meta = {
+        "dtype": dtype,
+        "count": len(quantized),
+        "dimensions": int(quantized.matrix.shape[1]) if quantized.matrix.ndim == 2 else 0,
+        "titles": quantized.titles,
+        "ids": quantized.ids,
+        "token_counts": quantized.token_counts,
+        "ivf_lists": len(quantized.ann) if quantized.ann is not None else 0,
+    }
+    texts = quantized.texts if isinstance(quantized.texts, ChunkTexts) else ChunkTexts.pack(quantized.texts)
+    arrays = {"vectors.npy": quantized.matrix, "texts.npy": texts.data, "text_offsets.npy": texts.offsets}
+    if quantized.scales is not None:
+        arrays["scales.npy"] = quantized.scales
+    if quantized.ann is not None:
+        arrays.update({"ivf_centroids.npy": quantized.ann.centroids, "ivf_offsets.npy": quantized.ann.offsets,
+                       "ivf_order.npy": quantized.ann.order})
+
+    # meta.json is replaced last, so a reader never sees metadata for vectors that are not on disk yet.
+    for filename, array in arrays.items():
+        tmp_path = os.path.join(path, filename + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(tmp_path, os.path.join(path, filename))
+    tmp_path = os.path.join(path, "meta.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+
+def load_index(path: str):
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        matrix = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        offsets = np.load(os.path.join(path, "text_offsets.npy"))
+        # An empty file cannot be memory-mapped.
+        data = np.load(os.path.join(path, "texts.npy"), mmap_mode="r" if offsets[-1] else None)
+        scales = None
+        if meta["dtype"] == "int8":
+            scales = np.load(os.path.join(path, "scales.npy"))
+        ann = None
+        if meta.get("ivf_lists"):
+            ann = IVFIndex(np.load(os.path.join(path, "ivf_centroids.npy")),
+                           np.load(os.path.join(path, "ivf_offsets.npy")),
+                           np.load(os.path.join(path, "ivf_order.npy"), mmap_mode="r"))
+    except (OSError, ValueError, KeyError, IndexError):
+        return None
+    if len(matrix) != meta["count"] or matrix.dtype.name != meta["dtype"] or len(offsets) != meta["count"] + 1 \
+            or len(data) != offsets[-1]:
+        return None
+    if ann is not None and (len(ann) != meta["ivf_lists"] or len(ann.order) != meta["count"]):
+        ann = None
+    return VectorIndex.from_matrix(meta["titles"], meta["ids"], ChunkTexts(data, offsets), matrix, scales, ann,
+                                   meta.get("token_counts"))
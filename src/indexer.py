@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import threading
+
+import openai
+from colorama import Fore
+
+from ann_util import IVFIndex
+from config import get_file_type
+from cache_util import EmbeddingCache
+from index_util import VectorIndex, load_index, save_index
+from ingest_util import IngestPipeline
+from openai_util import CACHE_DIR, CHUNK_OVERLAP, CHUNK_SENTENCES, EMBEDDING_CACHE_KEY, MAX_LENGTH, embed_corpus, \
+    is_document
+
+INDEX_PATH = os.path.join(CACHE_DIR, "index")
+MANIFEST_PATH = os.path.join(CACHE_DIR, "manifest.json")
+INDEX_DTYPE = os.getenv("INDEX_DTYPE", "int8")  # float32, float16 or int8; float16 scores slowest
+ANN_MIN_CHUNKS = int(os.getenv("ANN_MIN_CHUNKS", "20000"))  # Corpora at least this large get an IVF index, 0 disables it
+REINDEX_INTERVAL = float(os.getenv("REINDEX_INTERVAL", "5"))  # Seconds between folder scans while running
+
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FolderIndexer:
+    """Keeps a VectorIndex in sync with the document folder.
+
+    Each file is tracked by mtime, size and content hash, so a refresh only re-extracts and
+    re-embeds files that were added or changed. The manifest lists each file's chunks by id
+    and token count only; their texts are stored once, in the saved index. The rebuilt index
+    replaces self.index in a single assignment, so readers always see either the old or the
+    new index. load() opens the saved index without scanning the folder; ready is set once it
+    succeeds or a refresh has run. A failure that repeats on every scan is printed only once.
+    """
+
+    def __init__(self, folder_path, interval=REINDEX_INTERVAL):
+        self.folder_path = folder_path
+        self.interval = interval
+        self.index = VectorIndex([], [], [], [])
+        self._files = {}
+        self._refresh_lock = threading.Lock()
+        self.ready = threading.Event()
+        self._last_error = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._load_manifest()
+
+    def _settings(self):
+        return {"folder_path": os.path.abspath(self.folder_path), "model": EMBEDDING_CACHE_KEY, "dtype": INDEX_DTYPE,
+                "chunking": [MAX_LENGTH, CHUNK_OVERLAP, CHUNK_SENTENCES]}
+
+    def _load_manifest(self):
+        try:
+            with open(MANIFEST_PATH, "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+        if manifest.get("settings") == self._settings():
+            self._files = manifest.get("files", {})
+
+    def _save_manifest(self):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = MANIFEST_PATH + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"settings": self._settings(), "files": self._files}, f)
+        os.replace(tmp_path, MANIFEST_PATH)
+
+    def _scan(self):
+        found = {}
+        for entry in os.scandir(self.folder_path):
+            if not entry.is_file() or not is_document(entry.name):
+                continue
+            file_type = get_file_type(entry.name)
+            if file_type == "none":
+                continue
+            stat = entry.stat()
+            found[entry.name] = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "file_type": file_type}
+        return found
+
+    def _changed_files(self, found):
+        changed = []
+        for filename, info in found.items():
+            known = self._files.get(filename)
+            if known and known["file_type"] == info["file_type"] \
+                    and known["mtime"] == info["mtime"] and known["size"] == info["size"]:
+                continue
+
+            info["sha256"] = file_digest(os.path.join(self.folder_path, filename))
+            if known and known["file_type"] == info["file_type"] and known["sha256"] == info["sha256"]:
+                # Touched but identical, keep the existing chunks.
+                known.update(mtime=info["mtime"], size=info["size"])
+                continue
+            changed.append(filename)
+        return changed
+
+    def refresh(self) -> bool:
+        with self._refresh_lock:
+            try:
+                opened = False
+                if not len(self.index):
+                    opened = self._open_saved()
+                    if not opened:
+                        self._files = {}  # The chunk texts are only in the saved index, which is missing or stale
+                found = self._scan()
+                changed = self._changed_files(found)
+                removed = set(self._files) - set(found)
+
+                if not changed and not removed:
+                    self._last_error = None
+                    return opened
+
+                files = {filename: info for filename, info in self._files.items() if filename not in removed}
+                pipeline = IngestPipeline()
+                failure = None
+                try:
+                    ingested = pipeline.run([
+                        (filename, os.path.join(self.folder_path, filename), os.path.splitext(filename)[0],
+                         found[filename]["file_type"])
+                        for filename in changed
+                    ])
+                except openai.OpenAIError as e:
+                    # Index the files whose chunks were all embedded and keep the previous version of the rest,
+                    # whose manifest entries stay stale so the next scan retries them.
+                    failure = e
+                    cache = EmbeddingCache(CACHE_DIR, EMBEDDING_CACHE_KEY)
+                    ingested = {filename: sections for filename, sections in pipeline.results.items()
+                                if all(section["text"] in cache for section in sections)}
+                for filename, sections in ingested.items():
+                    files[filename] = dict(found[filename], sections=sections)
+                if changed and failure is None:
+                    pipeline.report()
+
+                if ingested or removed:
+                    self._rebuild(files)
+                    if self._thread is not None:
+                        print(Fore.CYAN + f"\nRe-indexed {len(ingested)} changed and {len(removed)} removed file(s).")
+                if failure is not None:
+                    self._report_error(f"An error occurred: {str(failure)}")
+                    return bool(ingested or removed)
+                self._last_error = None
+                return True
+            except PermissionError:
+                self._report_error("Permission denied. Please check the folder path and ensure you have read access.")
+            except Exception as e:
+                self._report_error(f"An error occurred: {str(e)}")
+            finally:
+                self.ready.set()
+            return False
+
+    def _report_error(self, message):
+        if message != self._last_error:
+            print(Fore.RED + message)
+        self._last_error = message
+
+    def load(self) -> bool:
+        with self._refresh_lock:
+            loaded = bool(len(self.index)) or self._open_saved()
+        if loaded:
+            self.ready.set()
+        return loaded
+
+    def _open_saved(self) -> bool:
+        index = load_index(INDEX_PATH)
+        if index is None or len(index) != sum(len(f["sections"]) for f in self._files.values()):
+            return False
+        index.lexical  # Build BM25 postings here rather than on the first question
+        self.index = index
+        return True
+
+    def _rebuild(self, files):
+        sections = [section for filename in sorted(files) for section in files[filename]["sections"]]
+        titles = [section['title'] for section in sections]
+        ids = [section['id'] for section in sections]
+        token_counts = [section['tokens'] for section in sections]
+        # Newly ingested chunks carry their text; unchanged ones are read back from the current index.
+        rows = {chunk_id: row for row, chunk_id in enumerate(self.index.ids)}
+        texts = [section['text'] if 'text' in section else self.index.texts[rows[section['id']]]
+                 for section in sections]
+        # Every chunk was embedded during ingestion or earlier, so this is served from the embedding cache.
+        embeddings = embed_corpus(texts)
+
+        # Persist the quantized matrix and reopen it memory-mapped so resident memory scales with INDEX_DTYPE.
+        index = VectorIndex(titles, ids, texts, embeddings, token_counts)
+        if ANN_MIN_CHUNKS and len(index) >= ANN_MIN_CHUNKS:
+            index.ann = IVFIndex.build(index.matrix)
+        save_index(index, INDEX_PATH, INDEX_DTYPE)
+        for info in files.values():
+            info["sections"] = [{key: value for key, value in section.items() if key != "text"}
+                                for section in info["sections"]]
+        self._files = files
+        self._save_manifest()
+        mapped_index = load_index(INDEX_PATH)
+        index = mapped_index if mapped_index is not None else index
+        index.lexical  # Build BM25 postings here rather than on the first question
+        self.index = index
+
+    def _watch(self):
+        self.refresh()
+        while not self._stop_event.wait(self.interval):
+            self.refresh()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def embed_documents(folder_path):
+    indexer = FolderIndexer(folder_path)
+    indexer.refresh()
+    return indexer
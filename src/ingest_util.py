@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from colorama import Fore
+
+from openai_util import StreamingEmbedder, TextChunker, embedding_limiter
+from pdf_util import extract_pages, page_count
+
+INGEST_PROCESSES = int(os.getenv("INGEST_PROCESSES", "0")) or max(1, min(8, (os.cpu_count() or 2) - 1))
+PAGES_PER_TASK = 8  # PDF pages extracted per worker task
+TASKS_PER_PROCESS = 2  # Page ranges in flight per worker, which bounds the pages held in memory
+
+
+class StageStats:
+    def __init__(self, unit: str):
+        self.unit = unit
+        self.items = 0
+        self.seconds = 0.0
+
+    def add(self, items, seconds):
+        self.items += items
+        self.seconds += seconds
+
+    def __str__(self):
+        rate = self.items / self.seconds if self.seconds else float("inf")
+        return f"{self.items} {self.unit} in {self.seconds:.2f}s ({rate:.1f} {self.unit}/s)"
+
+
+class IngestPipeline:
+    """Extracts, chunks and embeds documents as a stream.
+
+    PDFs are split into page ranges that a spawn-based process pool extracts in parallel,
+    with at most TASKS_PER_PROCESS ranges per worker in flight. Ranges are fed to the
+    document's TextChunker in page order as they arrive, and finished chunks are handed to a
+    StreamingEmbedder straight away, so no document's full text is ever held and embedding
+    requests run while later pages are still being parsed.
+    """
+
+    def __init__(self, processes=INGEST_PROCESSES, pages_per_task=PAGES_PER_TASK, embed=True):
+        self.processes = processes
+        self.pages_per_task = pages_per_task
+        self.embed = embed
+        self.stats = {"extract": StageStats("pages"), "chunk": StageStats("chunks"), "embed": StageStats("chunks")}
+        self.throttling = None
+
+    def run(self, documents):
+        """Takes (filename, path, title, file_type) tuples and returns {filename: sections}.
+
+        When an embedding request fails its error is raised after every document was chunked,
+        and self.results still holds their sections; the chunks that were embedded are cached.
+        """
+        started = time.perf_counter()
+        embedder = StreamingEmbedder() if self.embed else None
+        results = self.results = {}
+
+        def emit(filename, sections, seconds):
+            self.stats["chunk"].add(len(sections), seconds)
+            if embedder is not None:
+                embedder.add(sections)
+            results.setdefault(filename, []).extend(sections)
+
+        pdfs = []
+        for filename, path, title, file_type in documents:
+            if path.endswith(".pdf"):
+                pdfs.append((filename, path, title, file_type))
+                continue
+            start = time.perf_counter()
+            with open(path, "r") as f:
+                text = f.read()
+            self.stats["extract"].add(1, time.perf_counter() - start)  # A text file counts as one page
+            start = time.perf_counter()
+            chunker = TextChunker(title, file_type)
+            emit(filename, chunker.add(text) + chunker.finish(), time.perf_counter() - start)
+
+        if pdfs:
+            self._extract_pdfs(pdfs, emit)
+
+        if embedder is not None:
+            try:
+                embedder.finish()
+            finally:
+                if embedder.started is not None:
+                    self.stats["embed"].add(embedder.embedded, time.perf_counter() - embedder.started)
+                    self.throttling = embedding_limiter.summary(embedder.throttling)
+        self.seconds = time.perf_counter() - started
+        return results
+
+    def _extract_pdfs(self, pdfs, emit):
+        context = multiprocessing.get_context("spawn")  # Forking would copy the capture and runtime threads' state
+        with ProcessPoolExecutor(max_workers=self.processes, mp_context=context) as executor:
+            extract_started = time.perf_counter()
+            documents = {}
+            tasks = deque()
+            counts = executor.map(page_count, [path for _, path, _, _ in pdfs])
+            for (filename, path, title, file_type), count in zip(pdfs, counts):
+                ranges = list(range(0, count, self.pages_per_task))
+                documents[filename] = {"chunker": TextChunker(title, file_type), "parts": len(ranges),
+                                       "next": 0, "pending": {}, "pages": count}
+                tasks.extend((filename, path, i, start) for i, start in enumerate(ranges))
+                if not ranges:
+                    emit(filename, [], 0.0)
+
+            in_flight = {}
+            while tasks or in_flight:
+                while tasks and len(in_flight) < self.processes * TASKS_PER_PROCESS:
+                    filename, path, part, start = tasks.popleft()
+                    future = executor.submit(extract_pages, path, start, start + self.pages_per_task)
+                    in_flight[future] = (filename, part)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filename, part = in_flight.pop(future)
+                    document = documents[filename]
+                    document["pending"][part] = future.result()
+                    start = time.perf_counter()
+                    sections = []
+                    # Ranges finish out of order; only the ones that continue the text chunked so far can be fed.
+                    while document["next"] in document["pending"]:
+                        sections += document["chunker"].add(document["pending"].pop(document["next"]))
+                        document["next"] += 1
+                    if document["next"] == document["parts"]:
+                        sections += document.pop("chunker").finish()
+                    emit(filename, sections, time.perf_counter() - start)
+            self.stats["extract"].add(sum(d["pages"] for d in documents.values()),
+                                      time.perf_counter() - extract_started)
+
+    def report(self):
+        print(Fore.CYAN + f"Ingested in {self.seconds:.2f}s: " + ", ".join(
+            f"{stage} {stats}" for stage, stats in self.stats.items() if stats.items))
+        if self.throttling is not None:
+            print(Fore.CYAN + f"Embedding requests: {self.throttling}")
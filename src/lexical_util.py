@@ -0,0 +1,93 @@
+import re
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+STOPWORDS = frozenset("""
+a about an and are as at be been but by can could did do does for from had has have how i if in is it its
+me my of on or so tell than that the their them then there these they this to us was we were what when where
+which who why will with would you your
+""".split())
+
+
+def terms(text: str):
+    return [term for term in re.findall(r"[a-z0-9]+", text.lower()) if term not in STOPWORDS]
+
+
+class LexicalIndex:
+    """BM25 over an inverted index of the chunk texts.
+
+    Postings are stored CSR-style: the documents containing term t are
+    doc_ids[offsets[t]:offsets[t + 1]], with matching term frequencies in tfs.
+    """
+
+    def __init__(self, texts, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}
+        postings = []
+        lengths = []
+        for doc_id, text in enumerate(texts):
+            counts = {}
+            for term in terms(text):
+                counts[term] = counts.get(term, 0) + 1
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+                postings.append((term_id, doc_id, count))
+
+        self.doc_lengths = np.asarray(lengths, dtype=np.float32)
+        self.avg_length = float(self.doc_lengths.mean()) if len(lengths) and self.doc_lengths.any() else 1.0
+        entries = np.asarray(postings, dtype=np.int64).reshape(-1, 3)
+        entries = entries[np.argsort(entries[:, 0], kind="stable")]
+        self.doc_ids = entries[:, 1].astype(np.int32)
+        self.tfs = entries[:, 2].astype(np.float32)
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(entries[:, 0], minlength=len(self.vocabulary)), out=self.offsets[1:])
+
+        doc_freq = np.diff(self.offsets).astype(np.float32)
+        self.idf = np.log1p((len(lengths) - doc_freq + 0.5) / (doc_freq + 0.5))
+        self._norms = k1 * (1 - b + b * self.doc_lengths / self.avg_length)
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def scores(self, query: str):
+        """Returns BM25 scores for every chunk and the score of a chunk matching every query term once.
+
+        Terms missing from the vocabulary count towards that reference score at the rarest
+        term's idf, so queries the corpus does not cover get a low confidence.
+        """
+        scores = np.zeros(len(self), dtype=np.float32)
+        reference = 0.0
+        for term in set(terms(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                reference += float(np.log1p((len(self) + 0.5) / 0.5))
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs, tfs = self.doc_ids[start:end], self.tfs[start:end]
+            scores[docs] += self.idf[term_id] * tfs * (self.k1 + 1) / (tfs + self._norms[docs])
+            reference += float(self.idf[term_id])
+        return scores, reference
+
+    def search(self, query: str, top_n: int):
+        """Returns the top chunk ids, their scores and the confidence of the best match, around 1 for a full match."""
+        scores, reference = self.scores(query)
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), 0.0
+        top_n = min(top_n, len(matched))
+        top = matched[np.argpartition(scores[matched], -top_n)[-top_n:]]
+        top = top[np.argsort(scores[top])[::-1]]
+        return top, scores[top], float(scores[top[0]] / reference)
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Merges ranked id lists; each list contributes 1 / (k + rank) for every id it contains."""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[int(doc_id)] = fused.get(int(doc_id), 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)
@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import aiohttp
+import numpy as np
+from colorama import Fore, Style
+
+QUESTIONS = [
+    "Tell me about a time you had to resolve a conflict within your team.",
+    "What is your experience with distributed systems?",
+    "Why do you want to work for this company?",
+    "Describe the most technically challenging project you have worked on.",
+    "How do you prioritize competing deadlines?",
+    "What are your salary expectations?",
+    "Tell me about a mistake you made and what you learned from it.",
+    "How would you design a rate limiter for a public API?",
+]
+
+
+async def run_session(http, url, number, audio=None):
+    """Asks one question and returns (seconds to the first answer token, total seconds, error)."""
+    started = time.perf_counter()
+    first_token = None
+    if audio is not None:
+        filename, data = audio
+        request = http.post(f"{url}/ask", data=data, params={"filename": filename},
+                            headers={"Content-Type": "application/octet-stream"})
+    else:
+        request = http.post(f"{url}/ask", json={"question": f"{QUESTIONS[number % len(QUESTIONS)]} (#{number})"})
+    try:
+        async with request as response:
+            if response.status != 200:
+                return None, time.perf_counter() - started, f"HTTP {response.status}"
+            async for line in response.content:
+                event = json.loads(line)
+                if event["type"] == "delta" and first_token is None:
+                    first_token = time.perf_counter() - started
+                elif event["type"] == "error":
+                    return first_token, time.perf_counter() - started, event["message"]
+    except aiohttp.ClientError as e:
+        return first_token, time.perf_counter() - started, str(e)
+    return first_token, time.perf_counter() - started, None
+
+
+async def load(url, sessions, concurrency, audio=None):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def limited(http, number):
+        async with limit:
+            return await run_session(http, url, number, audio)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=600)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(limited(http, number) for number in range(sessions)))
+        return results, time.perf_counter() - started
+
+
+def report(results, elapsed):
+    completed = [result for result in results if result[2] is None]
+    errors = [result[2] for result in results if result[2] is not None]
+    print(Style.BRIGHT + Fore.CYAN + f"{len(completed)}/{len(results)} sessions in {elapsed:.2f}s: "
+                                     f"{len(completed) / elapsed:.1f} sessions/s")
+    first_tokens = 1000 * np.array([result[0] for result in completed if result[0] is not None])
+    totals = 1000 * np.array([result[1] for result in completed])
+    if len(first_tokens):
+        p50, p95, p99 = np.percentile(first_tokens, [50, 95, 99])
+        print(Fore.LIGHTGREEN_EX + f"time to first token  p50 {p50:8.1f} ms  p95 {p95:8.1f} ms  p99 {p99:8.1f} ms")
+    if len(totals):
+        p50, p95 = np.percentile(totals, [50, 95])
+        print(Fore.LIGHTGREEN_EX + f"session              p50 {p50:8.1f} ms  p95 {p95:8.1f} ms")
+    if errors:
+        print(Fore.RED + f"{len(errors)} failed, first: {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the headless Hinterview server")
+    parser.add_argument("--url", default=None, help="a running server, otherwise one starts in-process on a mock API")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50, help="sessions in flight at once")
+    parser.add_argument("--audio", default=None, help="ask with this recording instead of text questions")
+    parser.add_argument("--upstream-concurrency", type=int, default=None, help="in-process server only")
+    parser.add_argument("--first-token", type=float, default=0.25, help="mock seconds to the first chat token")
+    parser.add_argument("--no-answer-cache", action="store_true",
+                        help="turn the answer cache off so every session reaches the chat endpoint (in-process only)")
+    args = parser.parse_args()
+
+    audio = None
+    if args.audio:
+        with open(args.audio, "rb") as f:
+            audio = (os.path.basename(args.audio), f.read())
+
+    url, server, mock, indexer, workdir = args.url, None, None, None, None
+    if url is None:
+        # The in-process server runs against a mock API and a throwaway cache directory; both
+        # are read when the project modules are imported, so set them first.
+        os.environ.setdefault("OPENAI_API_KEY", "mock")
+        if "HINTERVIEW_CACHE_DIR" not in os.environ:
+            workdir = tempfile.TemporaryDirectory(prefix="hinterview-load-")
+            os.environ["HINTERVIEW_CACHE_DIR"] = workdir.name
+        import openai_util
+        from e2e_bench import point_clients_at, synthetic_corpus
+        from indexer import FolderIndexer
+        from mock_openai import MockLatency, MockOpenAIServer
+        from server import UPSTREAM_CONCURRENCY, HinterviewServer
+        from trace_util import Tracer
+
+        mock = MockOpenAIServer(MockLatency(first_token=args.first_token)).start()
+        point_clients_at(mock)
+        if args.no_answer_cache:
+            openai_util.answer_cache = None
+        folder = os.path.join(openai_util.CACHE_DIR, "documents")
+        os.makedirs(folder, exist_ok=True)
+        synthetic_corpus(folder)
+        indexer = FolderIndexer(folder)
+        indexer.refresh()
+        server = HinterviewServer(indexer, port=0, upstream_concurrency=args.upstream_concurrency or
+                                  UPSTREAM_CONCURRENCY, tracer=Tracer(os.path.join(openai_util.CACHE_DIR,
+                                                                                   "trace.jsonl"))).start()
+        url = server.url
+        print(Style.BRIGHT + Fore.CYAN + f"In-process server at {url} on mock API {mock.base_url}, "
+                                         f"{server.upstream_concurrency} upstream sessions at once")
+
+    try:
+        print(Fore.CYAN + f"{args.sessions} sessions, {args.concurrency} concurrent, "
+                          f"{'audio ' + args.audio if audio else 'text questions'}")
+        results, elapsed = asyncio.run(load(url, args.sessions, args.concurrency, audio))
+        report(results, elapsed)
+    finally:
+        if server is not None:
+            server.stop()
+            mock.stop()
+        if workdir is not None:
+            workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
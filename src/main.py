@@ -1,8 +1,15 @@
-from helper import *
+from startup_util import startup
+
 
 def main():
+    # Imported here rather than at module level so spawned ingestion workers never start the menu.
+    from gui_util import primary_gui
+    indexer = primary_gui()
 
+    from helper import keyboard, on_press, on_release, start
+    start(indexer)
     with keyboard.Listener(on_press=on_press, on_release=on_release) as listener:
+        startup.report()
         listener.join()
 
 if __name__ == "__main__":
@@ -0,0 +1,217 @@
+import asyncio
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+
+import numpy as np
+from aiohttp import web
+
+MOCK_DIMENSIONS = 1536
+MOCK_TRANSCRIPT = "Can you walk me through a project where you improved the performance of a system?"
+PROMPT_CACHE_MIN_TOKENS = 1024  # Like the real API, shorter prompts are never cached
+PROMPT_CACHE_STEP = 128  # and longer ones are cached in increments of this many tokens
+MOCK_ANSWER = ("- Profiled the ingestion service and found most time went to per-item network calls.\n"
+               "- Batched the requests and added a content-addressed cache, cutting runtime by 80%.\n"
+               "- Added latency tracing so regressions show up per stage.")
+
+
+class MockLatency:
+    """Simulated server-side delays in seconds. per_prompt_token is paid for every uncached prompt token."""
+
+    def __init__(self, embeddings=0.05, embeddings_per_input=0.0005, transcription=0.3,
+                 transcription_per_mb=1.0, first_token=0.25, per_token=0.01, per_prompt_token=0.0):
+        self.embeddings = embeddings
+        self.embeddings_per_input = embeddings_per_input
+        self.transcription = transcription
+        self.transcription_per_mb = transcription_per_mb
+        self.first_token = first_token
+        self.per_token = per_token
+        self.per_prompt_token = per_prompt_token
+
+
+def hashed_embedding(text: str, dimensions: int):
+    # Hashing-trick bag of words, so chunks that share words get similar vectors like real embeddings.
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        digest = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+        vector[digest % dimensions] += 1.0 if digest >> 63 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class MockOpenAIServer:
+    """Local stand-in for the embeddings, audio transcription and chat completion endpoints.
+
+    Runs an aiohttp app on its own event loop thread, so it never competes with the
+    application's runtime loop it is being measured against. Counts every request it serves.
+    With embedding_rate set, embeddings requests beyond that many per second (after a burst of
+    embedding_burst) get a 429 with retry-after-ms and x-ratelimit-* headers like the real API,
+    and failure_rate answers that fraction of them with a 500. Chat prompts are cached by prefix
+    like the real API, and usage reports the cached tokens when the client asks for it.
+    """
+
+    def __init__(self, latency=None, host="127.0.0.1", port=0, dimensions=MOCK_DIMENSIONS,
+                 transcript=MOCK_TRANSCRIPT, answer=MOCK_ANSWER, embedding_rate=None, embedding_burst=5,
+                 failure_rate=0.0, seed=0):
+        self.latency = latency or MockLatency()
+        self.host = host
+        self.port = port
+        self.dimensions = dimensions
+        self.transcript = transcript
+        self.answer = answer
+        self.embedding_rate = embedding_rate
+        self.embedding_burst = embedding_burst
+        self.failure_rate = failure_rate
+        self.requests = {"embeddings": 0, "transcriptions": 0, "chat": 0, "throttled": 0, "failed": 0}
+        self._tokens = float(embedding_burst)
+        self._refilled = time.monotonic()
+        self._rng = np.random.default_rng(seed)
+        self._prompt_prefixes = set()
+        self._loop = asyncio.new_event_loop()
+        self._runner = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def _app(self):
+        app = web.Application(client_max_size=64 * 2 ** 20)
+        app.router.add_get("/v1/models", self._models)
+        app.router.add_post("/v1/embeddings", self._embeddings)
+        app.router.add_post("/v1/audio/transcriptions", self._transcriptions)
+        app.router.add_post("/v1/chat/completions", self._chat)
+        return app
+
+    async def _models(self, request):
+        return web.json_response({"object": "list", "data": [{"id": "mock", "object": "model", "created": 0,
+                                                              "owned_by": "mock"}]})
+
+    def _rate_limit_headers(self):
+        # A token bucket of embedding_burst requests refilled at embedding_rate per second.
+        now = time.monotonic()
+        self._tokens = min(self.embedding_burst, self._tokens + (now - self._refilled) * self.embedding_rate)
+        self._refilled = now
+        allowed = self._tokens >= 1
+        if allowed:
+            self._tokens -= 1
+        reset_ms = int(1000 * max(0.0, 1 - self._tokens) / self.embedding_rate)
+        headers = {"x-ratelimit-limit-requests": str(self.embedding_burst),
+                   "x-ratelimit-remaining-requests": str(int(self._tokens)),
+                   "x-ratelimit-reset-requests": f"{reset_ms}ms"}
+        if not allowed:
+            headers["retry-after-ms"] = str(max(1, reset_ms))
+        return allowed, headers
+
+    async def _embeddings(self, request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        headers = {}
+        if self.embedding_rate:
+            allowed, headers = self._rate_limit_headers()
+            if not allowed:
+                self.requests["throttled"] += 1
+                return web.json_response({"error": {"message": "Rate limit reached for requests", "type": "requests",
+                                                    "code": "rate_limit_exceeded"}}, status=429, headers=headers)
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            self.requests["failed"] += 1
+            return web.json_response({"error": {"message": "The server had an error", "type": "server_error"}},
+                                     status=500)
+        self.requests["embeddings"] += 1
+        await asyncio.sleep(self.latency.embeddings + self.latency.embeddings_per_input * len(inputs))
+
+        dimensions = body.get("dimensions") or self.dimensions
+        data = []
+        for i, text in enumerate(inputs):
+            vector = hashed_embedding(text, dimensions)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.astype(np.float32).tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(text.split()) for text in inputs)
+        return web.json_response({"object": "list", "data": data, "model": body.get("model", "mock"),
+                                  "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}, headers=headers)
+
+    async def _transcriptions(self, request):
+        form = await request.post()
+        audio = form["file"].file.read()
+        self.requests["transcriptions"] += 1
+        # Upload size stands in for clip length, so trimming and compression still pay off against the mock.
+        await asyncio.sleep(self.latency.transcription + self.latency.transcription_per_mb * len(audio) / 2 ** 20)
+        return web.json_response({"text": self.transcript})
+
+    def _prompt_usage(self, messages):
+        # Whitespace-separated words stand in for tokens; the longest prefix seen before is cached.
+        words = re.findall(r"\S+\s*", "".join(f"<{message['role']}>{message['content']}" for message in messages))
+        digest = hashlib.sha256()
+        cached = 0
+        for end in range(PROMPT_CACHE_STEP, len(words) + 1, PROMPT_CACHE_STEP):
+            digest.update("".join(words[end - PROMPT_CACHE_STEP:end]).encode("utf-8"))
+            if end < PROMPT_CACHE_MIN_TOKENS:
+                continue
+            prefix = digest.copy().hexdigest()  # Covers every word up to end, not just this step
+            if prefix in self._prompt_prefixes:
+                cached = end
+            self._prompt_prefixes.add(prefix)
+        completion = len(re.findall(r"\S+\s*", self.answer))
+        return {"prompt_tokens": len(words), "completion_tokens": completion, "total_tokens": len(words) + completion,
+                "prompt_tokens_details": {"cached_tokens": cached}}
+
+    async def _chat(self, request):
+        body = await request.json()
+        self.requests["chat"] += 1
+        tokens = re.findall(r"\S+\s*", self.answer)
+        usage = self._prompt_usage(body["messages"])
+        uncached = usage["prompt_tokens"] - usage["prompt_tokens_details"]["cached_tokens"]
+        await asyncio.sleep(self.latency.first_token + self.latency.per_prompt_token * uncached)
+
+        def chunk(delta, finish_reason=None):
+            return {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+        if not body.get("stream"):
+            return web.json_response({
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.answer},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(f"data: {json.dumps(chunk({'role': 'assistant', 'content': ''}))}\n\n".encode())
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.latency.per_token)
+            await response.write(f"data: {json.dumps(chunk({'content': token}))}\n\n".encode())
+        await response.write(f"data: {json.dumps(chunk({}, 'stop'))}\n\n".encode())
+        if (body.get("stream_options") or {}).get("include_usage"):
+            final = dict(chunk({}), choices=[], usage=usage)
+            await response.write(f"data: {json.dumps(final)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def _start(self):
+        self._runner = web.AppRunner(self._app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
@@ -1,49 +1,117 @@
+import asyncio
+import functools
+import hashlib
 import os
 import re
+import threading
+import time
 import warnings
 from concurrent.futures import as_completed
 from concurrent.futures import ThreadPoolExecutor
 from typing import List, Any
+import httpx
 import numpy as np
 import openai
 from openai import OpenAI, AsyncOpenAI
-from pypdf import PdfReader
 import tiktoken
 from colorama import Fore, Style
 from tqdm import tqdm
-from config import configure_gpt_settings, get_config, get_file_type
+from async_util import runtime
+from cache_util import AnswerCache, EmbeddingCache, PromptCacheStats
+from chunk_util import chunk_bounds, chunk_id, sentence_end_mask
+from context_util import SessionSummary, pack_context, profile_context
+from index_util import VectorIndex
+from lexical_util import reciprocal_rank_fusion
+from pdf_util import extract_pages
+from ratelimit_util import AdaptiveLimiter, call_with_retry
+from trace_util import current_trace, record, span
+from config import config_store, configure_gpt_settings, get_config, get_file_type
 
 configure_gpt_settings()
 
 EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None  # None keeps the model's native size
+EMBEDDING_OPTIONS = {"dimensions": EMBEDDING_DIMENSIONS} if EMBEDDING_DIMENSIONS else {}
+EMBEDDING_CACHE_KEY = f"{EMBEDDING_MODEL}-{EMBEDDING_DIMENSIONS}" if EMBEDDING_DIMENSIONS else EMBEDDING_MODEL
 GPT_MODEL = get_config('gpt_model')
 TEMPERATURE = get_config('temperature')
 TOP_P = get_config('top_p')
 MAX_TOKENS = get_config('max_tokens')
 SYSTEM_PROMPT = get_config('system_prompt')
 
-MAX_LENGTH = 200
+MAX_LENGTH = int(os.getenv("CHUNK_TOKENS", "200"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "0"))  # Tokens repeated at the start of the next chunk
+CHUNK_SENTENCES = os.getenv("CHUNK_SENTENCES", "0") == "1"  # Cut chunks after the last full sentence that fits
 TOP_N = 3
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")  # hybrid, vector or lexical
+FUSION_CANDIDATES = 20  # Results taken from each ranking before reciprocal rank fusion
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "700"))  # System prompt, instructions, excerpts and question
+PACK_CANDIDATES = 12  # Retrieved chunks the context packer chooses from
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "classic")  # classic, or cached: a stable profile prefix for API prompt caching
+PROFILE_TOKEN_BUDGET = int(os.getenv("PROFILE_TOKEN_BUDGET", "1500"))  # Resume and job description tokens in that prefix
+SESSION_SUMMARY_TOKENS = int(os.getenv("SESSION_SUMMARY_TOKENS", "400"))  # Earlier questions carried in cached prompts
+LEXICAL_SKIP_CONFIDENCE = float(os.getenv("LEXICAL_SKIP_CONFIDENCE", "0.7"))  # BM25 confidence that skips the query embedding
+EMBEDDING_BATCH_SIZE = 2048  # API limit on inputs per embeddings request
+EMBEDDING_BATCH_TOKENS = 250000  # Stay under the API's per-request token limit
+EMBEDDING_STREAM_BATCH = 256  # Chunks per request while documents are still being parsed
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "8"))  # Embeddings requests in flight at first
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "16"))  # Ceiling while no request is throttled
+EMBEDDING_RETRIES = int(os.getenv("EMBEDDING_RETRIES", "6"))  # Attempts per embeddings batch before it fails
+CACHE_DIR = os.getenv("HINTERVIEW_CACHE_DIR", ".hinterview_cache")
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))  # Cached answers kept, 0 disables the answer cache
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))  # Question similarity that reuses an answer
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "604800"))  # Seconds before a cached answer expires
+ANSWER_CACHE_REFRESH = os.getenv("ANSWER_CACHE_REFRESH", "0") == "1"  # Regenerate served answers in the background
+ANSWER_CACHE_SAVE_SECONDS = 2.0  # Answers cached within this long of each other are written to disk together
+TRANSCRIPTION_FAILED = "Transcription failed. Please try again."
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=300)
 
 tokenizer = tiktoken.get_encoding("cl100k_base")
 warnings.filterwarnings('ignore')
-client = OpenAI(api_key=get_config('openai_api_key'))
+client = OpenAI(api_key=get_config('openai_api_key'), http_client=httpx.Client(limits=HTTP_LIMITS))
+# Only ever awaited on the shared runtime loop, so its connection pool survives between questions.
+async_client = AsyncOpenAI(api_key=get_config('openai_api_key'), http_client=httpx.AsyncClient(limits=HTTP_LIMITS))
+# Shared by every ingestion, since the rate limits it adapts to are per account.
+embedding_limiter = AdaptiveLimiter(EMBEDDING_CONCURRENCY, EMBEDDING_MAX_CONCURRENCY)
+answer_cache = AnswerCache(CACHE_DIR, ANSWER_CACHE_SIMILARITY, ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL) \
+    if ANSWER_CACHE_SIZE else None
+prompt_cache_stats = PromptCacheStats()
+
+
+def apply_settings(section, key, value):
+    # Menu changes made after this module was imported apply from the next question, without a restart.
+    global GPT_MODEL, SYSTEM_PROMPT, TEMPERATURE, TOP_P, MAX_TOKENS
+    if section == "SETTINGS":
+        GPT_MODEL, SYSTEM_PROMPT, TEMPERATURE, TOP_P, MAX_TOKENS = (
+            get_config(name) for name in ("gpt_model", "system_prompt", "temperature", "top_p", "max_tokens"))
+
+
+config_store.subscribe(apply_settings)
+
+
+async def warm_clients():
+    # Opens the TLS connections ahead of the first question, so it does not pay the handshakes.
+    try:
+        await asyncio.gather(async_client.models.list(), asyncio.to_thread(client.models.list))
+    except openai.OpenAIError:
+        pass
+
+
+def warm_up():
+    return runtime.submit(warm_clients())
 
 def extract_text_from_pdf(file_path):
-    with open(file_path, "rb") as file:
-        reader = PdfReader(file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
-    return text
-
-def transcribe(audio_filepath) -> str:
+    return extract_pages(file_path)
+
+async def atranscribe(audio_file) -> str:
+    # Accepts a path or anything the API takes as a file, such as a (filename, bytes) tuple.
     try:
-        transcript = client.audio.transcriptions.create(
-            file=open(audio_filepath, "rb"),
-            model="whisper-1",
-            prompt="This is an audio recording of a professional, personable, and fluid conversation.",
-        )
+        with span("transcribe"):
+            transcript = await async_client.audio.transcriptions.create(
+                file=open(audio_file, "rb") if isinstance(audio_file, str) else audio_file,
+                model="whisper-1",
+                prompt="This is an audio recording of a professional, personable, and fluid conversation.",
+            )
         return transcript.text
     except openai.OpenAIError as api_err:
         print(Style.BRIGHT + Fore.RED + "API Error:", api_err)
@@ -52,195 +120,505 @@ def transcribe(audio_filepath) -> str:
     return ""
 
 
+def transcribe(audio_file) -> str:
+    return runtime.run(atranscribe(audio_file))
+
+
 def remove_non_ascii(text: str) -> str:
     return ''.join(i for i in text if ord(i) < 128)
 
-def transcribe_and_clean(mp3_filepath) -> str:
-    transcription = transcribe(mp3_filepath)
+def transcribe_and_clean(audio_file) -> str:
+    return clean_transcription(transcribe(audio_file))
+
+def clean_transcription(transcription: str) -> str:
     if transcription:
         cleaned_transcription = remove_non_ascii(transcription)
         return cleaned_transcription
     else:
-        return "Transcription failed. Please try again."
+        return TRANSCRIPTION_FAILED
 
-def num_tokens(text: str, model: str = GPT_MODEL) -> int:
-    encoding = tiktoken.encoding_for_model(model)
-    return len(encoding.encode(text))
+@functools.lru_cache(maxsize=None)
+def model_encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tokenizer
 
 
-def preprocess_text(text):
-    text = re.sub(r'\n', ' ', text)
+def num_tokens(text: str, model: str = None) -> int:
+    return len(model_encoding(model or GPT_MODEL).encode(text))
 
-    text = re.sub(r'\s+', ' ', text)
 
-    return text
+def preprocess_text(text):
+    return re.sub(r'\s+', ' ', text)
+
+
+class TextChunker:
+    """split_text for a document that arrives in pieces, such as PDF page ranges in page order.
+
+    add() returns the chunks that later text can no longer change; only the tokens after the
+    start of the last unfinished chunk are kept, so memory does not grow with the document.
+    Chunking one whole text gives exactly the chunks split_text did.
+    """
+
+    def __init__(self, document_title, file_type):
+        self.title = f"{document_title} - {file_type.capitalize()}"
+        self.tokens = np.zeros(0, dtype=np.int64)
+        self.offset = 0  # Document token offset of self.tokens[0]
+
+    def _sections(self, final):
+        tokens = self.tokens
+        sentence_ends = sentence_end_mask(tokens, tokenizer.decode_single_token_bytes) if CHUNK_SENTENCES else None
+        bounds = chunk_bounds(len(tokens), MAX_LENGTH, CHUNK_OVERLAP, sentence_ends)
+        keep_from = len(tokens)
+        if not final:
+            # A chunk reaching the end of the buffer may still grow; it and everything after it wait for more text.
+            unfinished = np.flatnonzero(bounds[:, 1] >= len(tokens))
+            if not len(unfinished):
+                return []
+            keep_from = int(bounds[unfinished[0], 0])
+            bounds = bounds[:unfinished[0]]
+        texts = tokenizer.decode_batch([tokens[start:end].tolist() for start, end in bounds])
+        sections = [
+            {"title": self.title, "id": chunk_id(self.title, self.offset + int(start), text.strip()),
+             "text": text.strip(), "tokens": int(end - start)}
+            for (start, end), text in zip(bounds, texts)
+        ]
+        self.tokens = tokens[keep_from:]
+        self.offset += keep_from
+        return sections
+
+    def add(self, text):
+        pieces = np.asarray(tokenizer.encode(preprocess_text(text)), dtype=np.int64)
+        self.tokens = np.concatenate((self.tokens, pieces))
+        return self._sections(final=False)
+
+    def finish(self):
+        return self._sections(final=True)
 
 
 def split_text(text, document_title, file_type):
-    text = preprocess_text(text)
-
-    tokens = tokenizer.encode(text)
-
-    sections = []
-
-    def decode_tokens(token_ids):
-        return tokenizer.decode(token_ids).strip()
-
-    processed_tokens = []
-    current_section = {"title": f"{document_title} - {file_type.capitalize()}", "loc": "", "text": "", "tokens": 0}
-
-    for token_id in tokens:
-        processed_tokens.append(token_id)
-        current_section["tokens"] += 1
-
-        if len(processed_tokens) == 10:
-            current_section["loc"] = decode_tokens(processed_tokens)
-
-        if current_section["tokens"] >= MAX_LENGTH:
-            current_section["text"] = decode_tokens(processed_tokens)
-            sections.append(current_section)
-
-            current_section = {"title": f"{document_title} - {file_type.capitalize()}", "loc": "", "text": "", "tokens": 0}
-            processed_tokens = []
-
-    if processed_tokens:
-        current_section["text"] = decode_tokens(processed_tokens)
-        sections.append(current_section)
-
-    return sections
+    chunker = TextChunker(document_title, file_type)
+    return chunker.add(text) + chunker.finish()
 
 
 def get_embeddings(document: str):
     response = client.embeddings.create(
         input=document,  # Adjusted to take a single document
-        model=EMBEDDING_MODEL
+        model=EMBEDDING_MODEL,
+        **EMBEDDING_OPTIONS
     )
     return response.data[0].embedding
 
 
-def embed_corpus(corpus: List[str], num_workers=8):
-    with ThreadPoolExecutor(max_workers=num_workers) as executor:
-        future_to_doc = {executor.submit(get_embeddings, doc): doc for doc in corpus}
-
-        embeddings = []
-        # Initialize tqdm progress bar
-        with tqdm(total=len(corpus), desc="Generating Embeddings") as pbar:
-            for future in as_completed(future_to_doc):
-                embeddings.append(
-                    future.result())  # Collect embeddings as they are completed
-                pbar.update(1)  # Update progress bar per completed task
-
+def get_embeddings_batch(documents: List[str]):
+    # The client's own retries would hide throttling from the limiter, which retries with backoff itself.
+    raw_response = call_with_retry(embedding_limiter, lambda: client.with_options(max_retries=0).embeddings
+                                   .with_raw_response.create(input=documents, model=EMBEDDING_MODEL,
+                                                             **EMBEDDING_OPTIONS),
+                                   EMBEDDING_RETRIES)
+    response = raw_response.parse()
+    # The API tags each item with the position of its input, so map by index rather than response order.
+    embeddings = [None] * len(documents)
+    for item in response.data:
+        embeddings[item.index] = item.embedding
     return embeddings
 
 
+def batch_corpus(corpus: List[str], max_inputs=EMBEDDING_BATCH_SIZE, max_tokens=EMBEDDING_BATCH_TOKENS):
+    batch = []
+    batch_tokens = 0
+    for i, doc in enumerate(corpus):
+        doc_tokens = len(tokenizer.encode(doc))
+        if batch and (len(batch) >= max_inputs or batch_tokens + doc_tokens > max_tokens):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(i)
+        batch_tokens += doc_tokens
+    if batch:
+        yield batch
 
-def embed_documents(folder_path):
-    try:
-        sections = []
-        for filename in os.listdir(folder_path):
-            file_type = get_file_type(filename)
-            if file_type != "none" and (filename.endswith(".txt") or filename.endswith(".pdf")):
-                if filename.endswith(".txt"):
-                    with open(os.path.join(folder_path, filename), 'r') as f:
-                        original = f.read()
-                elif filename.endswith(".pdf"):
-                    file_path = os.path.join(folder_path, filename)
-                    original = extract_text_from_pdf(file_path)
-                original_title = os.path.splitext(filename)[0]
-                sections.extend(split_text(original, original_title, file_type))
-
-        titles = [section['title'] for section in sections]
-        locs = [section['loc'] for section in sections]
-        texts = [section['text'] for section in sections]
-        embeddings = embed_corpus(texts)
-
-        return titles, locs, texts, embeddings
-    except PermissionError:
-        print(Fore.RED + "Permission denied. Please check the folder path and ensure you have read access.")
-        return [], [], [], []
-    except Exception as e:
-        print(Fore.RED + f"An error occurred: {str(e)}")
-        return [], [], [], []
-def cosine_similarity(a, b):
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
-def strings_ranked_by_relatedness(query: str, titles, locs, embeddings, relatedness_fn=cosine_similarity, top_n: int = TOP_N):
-    query_embedding_response = client.embeddings.create(
-        input=query,
-        model=EMBEDDING_MODEL
-    )
-    query_embedding = np.array(query_embedding_response.data[0].embedding)
-
-    relatedness_scores = np.array([relatedness_fn(query_embedding, embedding) for embedding in embeddings])
-    top_indices = np.argsort(relatedness_scores)[::-1][:top_n]
-
-    return [(titles[i], locs[i]) for i in top_indices]
-
-def query_message(query: str, titles, locs, texts, embeddings) -> tuple[str, str, list[tuple[Any, Any]]]:
-    introduction = ('Use the textual excerpts to provide detailed, bullet point answers for the subsequent question. '
-                    'If the answer cannot be found in the provided text, do your best to provide the most rational and  '
-                    'comprehensive response. The response should be able to be seamlessly used to quickly answer the question.'
-                    'Be as succinct as possible.')
-    question = query
+def embed_corpus(corpus: List[str], num_workers=8):
+    cache = EmbeddingCache(CACHE_DIR, EMBEDDING_CACHE_KEY)
+    embeddings = cache.get_many(corpus)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+    if missing:
+        missing_docs = [corpus[i] for i in missing]
+        # Spread small corpora across the workers instead of sending one giant request.
+        max_inputs = min(EMBEDDING_BATCH_SIZE, -(-len(missing) // num_workers))
+        throttling = embedding_limiter.snapshot()
+        started = time.perf_counter()
+        embedded = 0
+        failures = []
+
+        # embedding_limiter decides how many of these workers have a request in flight.
+        with ThreadPoolExecutor(max_workers=EMBEDDING_MAX_CONCURRENCY) as executor:
+            future_to_batch = {
+                executor.submit(get_embeddings_batch, [missing_docs[j] for j in batch]): batch
+                for batch in batch_corpus(missing_docs, max_inputs=max_inputs)
+            }
+
+            # Initialize tqdm progress bar
+            with tqdm(total=len(missing), desc="Generating Embeddings") as pbar:
+                for future in as_completed(future_to_batch):
+                    batch = future_to_batch[future]
+                    try:
+                        batch_embeddings = future.result()
+                    except openai.OpenAIError as e:
+                        failures.append(e)
+                        continue
+                    for j, embedding in zip(batch, batch_embeddings):
+                        i = missing[j]
+                        embeddings[i] = embedding
+                        cache.put(corpus[i], embedding)
+                    embedded += len(batch)
+                    pbar.update(len(batch))  # Update progress bar per completed batch
+
+        # Chunks that made it are kept, so the next attempt only requests the ones that failed.
+        cache.save()
+        seconds = time.perf_counter() - started
+        print(Fore.CYAN + f"Embedded {embedded} chunks in {seconds:.2f}s ({embedded / seconds:.1f} chunks/s): "
+                          f"{embedding_limiter.summary(throttling)}")
+        if failures:
+            print(Fore.RED + f"{len(missing) - embedded} chunks could not be embedded and will be retried.")
+            raise failures[0]
 
-    message = introduction
-    full_message = introduction
+    return embeddings
 
-    docs_used = []
 
-    relevant_sections = strings_ranked_by_relatedness(query, titles, locs, embeddings)
-    docs_used.extend(relevant_sections[:5])
+class StreamingEmbedder:
+    """Embeds chunks while later documents are still being extracted.
+
+    add() queues sections and sends a request whenever EMBEDDING_STREAM_BATCH new chunks or
+    EMBEDDING_BATCH_TOKENS tokens are waiting. Results go straight into the embedding cache,
+    so a later embed_corpus over the same texts is served without touching the API. Requests
+    are paced by embedding_limiter, and finish() saves every batch that succeeded even when
+    another one failed.
+    """
+
+    def __init__(self, num_workers=EMBEDDING_MAX_CONCURRENCY, batch_size=EMBEDDING_STREAM_BATCH,
+                 max_tokens=EMBEDDING_BATCH_TOKENS):
+        self.cache = EmbeddingCache(CACHE_DIR, EMBEDDING_CACHE_KEY)
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.embedded = 0
+        self.cached = 0
+        self.started = None
+        self.throttling = embedding_limiter.snapshot()
+        self._batch = []
+        self._batch_tokens = 0
+        self._queued = set()
+        self._futures = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=num_workers)
+
+    def add(self, sections):
+        for section in sections:
+            text = section["text"]
+            if text in self._queued or text in self.cache:
+                self.cached += 1
+                continue
+            if self._batch and (len(self._batch) >= self.batch_size
+                                or self._batch_tokens + section["tokens"] > self.max_tokens):
+                self._flush()
+            self._queued.add(text)
+            self._batch.append(text)
+            self._batch_tokens += section["tokens"]
+
+    def _flush(self):
+        if self.started is None:
+            self.started = time.perf_counter()
+        self._futures.append(self._executor.submit(self._embed, self._batch))
+        self._batch = []
+        self._batch_tokens = 0
+
+    def _embed(self, texts):
+        embeddings = get_embeddings_batch(texts)
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                self.cache.put(text, embedding)
+            self.embedded += len(texts)
+
+    def finish(self):
+        """Waits for every request, saves what was embedded and re-raises the first failure."""
+        if self._batch:
+            self._flush()
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._executor.shutdown(wait=True)
+            self.cache.save()
+
+
+def is_document(filename):
+    return filename.endswith(".txt") or filename.endswith(".pdf")
+
+
+def load_document(file_path):
+    if file_path.endswith(".pdf"):
+        return extract_text_from_pdf(file_path)
+    with open(file_path, 'r') as f:
+        return f.read()
+
+
+def load_sections(folder_path):
+    sections = []
+    for filename in os.listdir(folder_path):
+        file_type = get_file_type(filename)
+        if file_type != "none" and is_document(filename):
+            original_title = os.path.splitext(filename)[0]
+            sections.extend(split_text(load_document(os.path.join(folder_path, filename)), original_title, file_type))
+    return sections
 
-    for title, loc in docs_used:
-        doc_info = f'\n\nTitle: {title}'
-        section_text = texts[locs.index(loc)]
-        next_article = doc_info + f'\nTextual excerpt section:\n"""\n{section_text}\n"""'
-        message += doc_info
-        full_message += next_article
 
-    full_message += question
-    return message, full_message, docs_used
+def cosine_similarity(a, b):
+    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
-async def ask(transcription, titles, locs, texts, embeddings, interruption_event) -> str:
-    async_client = AsyncOpenAI(
-        api_key=get_config('openai_api_key'),
-    )
-    if interruption_event.is_set():
+async def embed_query(query: str):
+    with span("query_embedding"):
+        query_embedding_response = await async_client.embeddings.create(
+            input=query,
+            model=EMBEDDING_MODEL,
+            **EMBEDDING_OPTIONS
+        )
+    return query_embedding_response.data[0].embedding
+
+async def embedding_result(task: asyncio.Future):
+    """The embedding task's result once it finishes, or None when its request failed."""
+    await asyncio.wait((task,))
+    return None if task.exception() is not None else task.result()
+
+async def strings_ranked_by_relatedness(query: str, index: VectorIndex, top_n: int = TOP_N,
+                                        mode: str = RETRIEVAL_MODE, query_embedding=None) -> List[int]:
+    # Retrieval spans cover local ranking only, the query embedding request is traced on its own. Ranking
+    # runs in a worker thread so a large index never stalls other coroutines on the shared loop.
+    # query_embedding may also be a task still fetching it, shared with the answer cache lookup. When that
+    # shared request fails the ranking falls back to lexical, so the answer can still be prompted.
+    if mode == "vector":
+        if query_embedding is None:
+            query_embedding = await embed_query(query)
+        elif isinstance(query_embedding, asyncio.Future):
+            query_embedding = await embedding_result(query_embedding)
+            if query_embedding is None:
+                return await strings_ranked_by_relatedness(query, index, top_n, mode="lexical")
+        with span("retrieval"):
+            top_indices, _ = await asyncio.to_thread(index.search, query_embedding, top_n)
+        return top_indices.tolist()
+
+    # The embedding request is already in flight while BM25 runs locally, so hybrid ranking adds no round trip.
+    embedding_task = owned_task = None
+    if isinstance(query_embedding, asyncio.Future):
+        embedding_task, query_embedding = query_embedding, None
+    elif mode == "hybrid" and query_embedding is None:
+        embedding_task = owned_task = asyncio.ensure_future(embed_query(query))
+    try:
+        with span("retrieval"):
+            lexical_top, _, confidence = await asyncio.to_thread(index.lexical.search, query, FUSION_CANDIDATES)
+        if mode != "hybrid" or confidence >= LEXICAL_SKIP_CONFIDENCE:
+            return lexical_top[:top_n].tolist()
+
+        if query_embedding is None:
+            query_embedding = await embedding_result(embedding_task)
+            if query_embedding is None:
+                return lexical_top[:top_n].tolist()
+    finally:
+        if owned_task is not None:
+            owned_task.cancel()  # No-op once it finished, otherwise stops the request when ranking ends early
+    with span("retrieval"):
+        vector_top, _ = await asyncio.to_thread(index.search, query_embedding, FUSION_CANDIDATES)
+        return reciprocal_rank_fusion([lexical_top, vector_top])[:top_n]
+
+EXCERPT_HEADER = '\n\nTitle: {title}\nTextual excerpt section:\n"""\n'
+INTRODUCTION = ('Use the textual excerpts to provide detailed, bullet point answers for the subsequent question. '
+                'If the answer cannot be found in the provided text, do your best to provide the most rational and  '
+                'comprehensive response. The response should be able to be seamlessly used to quickly answer the question.'
+                'Be as succinct as possible.')
+
+def excerpt_header_tokens(titles) -> int:
+    return max((num_tokens(EXCERPT_HEADER.format(title=title) + '\n"""') for title in set(titles)), default=0)
+
+async def pack_excerpts(query: str, index: VectorIndex, token_budget: int, reserved: str, query_embedding=None,
+                        skip_rows=frozenset()) -> tuple[str, str, list[tuple[Any, Any]]]:
+    """Titles, excerpt text and docs_used for query, within token_budget less the tokens of reserved."""
+    relevant_indices = await strings_ranked_by_relatedness(query, index, top_n=PACK_CANDIDATES,
+                                                           query_embedding=query_embedding)
+    relevant_indices = [i for i in relevant_indices if i not in skip_rows]
+
+    titles, articles, docs_used = "", "", []
+    with span("prompt_build"):
+        context_budget = token_budget - num_tokens(reserved)
+        header_tokens = excerpt_header_tokens(index.titles[i] for i in relevant_indices)
+        for title, rows, section_text in pack_context(index, relevant_indices, context_budget, num_tokens,
+                                                      header_tokens):
+            docs_used.append((title, [index.ids[i] for i in rows]))
+            titles += f'\n\nTitle: {title}'
+            articles += EXCERPT_HEADER.format(title=title) + f'{section_text}\n"""'
+    return titles, articles, docs_used
+
+async def query_message(query: str, index: VectorIndex, token_budget: int = PROMPT_TOKEN_BUDGET,
+                        query_embedding=None) -> tuple[str, str, list[tuple[Any, Any]]]:
+    question = query
+    titles, articles, docs_used = await pack_excerpts(query, index, token_budget,
+                                                      SYSTEM_PROMPT + INTRODUCTION + question, query_embedding)
+    return INTRODUCTION + titles, INTRODUCTION + articles + question, docs_used
+
+_profile = (None, None)
+interview_session = SessionSummary(SESSION_SUMMARY_TOKENS, num_tokens)  # The hotkey's questions form one session
+
+def profile_prefix(index: VectorIndex) -> tuple[str, frozenset]:
+    """The system message opening every cached-layout prompt, and the chunk rows it already holds.
+
+    Built once per index and prompt settings, so it is byte-identical across questions and the
+    API can serve it from its prompt cache.
+    """
+    global _profile
+    key = (index.fingerprint, SYSTEM_PROMPT, PROFILE_TOKEN_BUDGET)
+    if _profile[0] != key:
+        profile = profile_context(index, PROFILE_TOKEN_BUDGET, num_tokens, excerpt_header_tokens(index.titles))
+        system = SYSTEM_PROMPT + "\n\n" + INTRODUCTION + "".join(
+            EXCERPT_HEADER.format(title=title) + f'{text}\n"""' for title, _, text in profile)
+        _profile = (key, (system, frozenset(row for _, rows, _ in profile for row in rows)))
+    return _profile[1]
+
+async def prompt_messages(query: str, index: VectorIndex, query_embedding=None,
+                          session: SessionSummary = None) -> tuple[list, list[tuple[Any, Any]]]:
+    """Chat messages answering query, and the documents they quote.
+
+    The classic layout sends the instructions, the excerpts most relevant first and the question
+    in one user message. The cached layout puts what never changes first, the system prompt,
+    instructions and the resume and job description (profile_prefix), then what changes a
+    little, the session summary, and only then the excerpts and question, so successive
+    questions share the longest possible prompt prefix.
+    """
+    if PROMPT_LAYOUT != "cached":
+        _, full_message, docs_used = await query_message(query, index, query_embedding=query_embedding)
+        return [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": full_message}], docs_used
+
+    system, profile_rows = profile_prefix(index)
+    history = session.text if session is not None else ""
+    history = f"Earlier in this interview:\n{history}\n\n" if history else ""
+    question = f'\n\nQuestion: {query}'
+    # Budgeted like the classic layout, the profile prefix comes on top of PROMPT_TOKEN_BUDGET.
+    _, articles, docs_used = await pack_excerpts(query, index, PROMPT_TOKEN_BUDGET,
+                                                 SYSTEM_PROMPT + INTRODUCTION + history + question, query_embedding,
+                                                 profile_rows)
+    return [{"role": "system", "content": system}, {"role": "user", "content": history + articles + question}], \
+        docs_used
+
+def answer_fingerprint(index: VectorIndex) -> str:
+    # An answer is only reusable against the same documents, model and prompt it was generated from.
+    settings = "\0".join(str(value) for value in (index.fingerprint, EMBEDDING_CACHE_KEY, GPT_MODEL, SYSTEM_PROMPT,
+                                                   PROMPT_LAYOUT, PROMPT_TOKEN_BUDGET, TEMPERATURE, TOP_P, MAX_TOKENS))
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+async def refresh_answer(transcription, index: VectorIndex, query_embedding, fingerprint):
+    current_trace.set(None)  # Runs after the question was answered, so it stays out of its trace
+    try:
+        messages, _ = await prompt_messages(transcription, index, query_embedding=query_embedding)
+        response = await async_client.chat.completions.create(
+            model=GPT_MODEL,
+            messages=messages,
+            max_tokens=MAX_TOKENS,
+            temperature=TEMPERATURE,
+            top_p=TOP_P
+        )
+    except openai.OpenAIError:
         return
-
-    print(Fore.CYAN + "\n──────────────────────────────────────────────────────────────────────────")
-    print(Style.BRIGHT + Fore.BLUE + "Question:" + "\n" + Style.NORMAL + Fore.RESET + f"{transcription}")
-    print(Style.BRIGHT + Fore.MAGENTA + "\n" + "AI Response:")
-    max_tokens = MAX_TOKENS
-    temperature = TEMPERATURE
-    top_p = TOP_P
-    model = GPT_MODEL
-    message, full_message, docs_used = query_message(transcription, titles, locs, texts,
-                                                     embeddings)
-    max_tokens = max_tokens - num_tokens(transcription + full_message, model=model)
-    messages = [
-        {"role": "system",
-         "content": SYSTEM_PROMPT},
-        {"role": "user", "content": full_message},
-    ]
+    answer = response.choices[0].message.content
+    if answer:
+        answer_cache.put(transcription, query_embedding, answer, fingerprint)
+        answer_cache.save_later(ANSWER_CACHE_SAVE_SECONDS)
+
+def print_prompt_cache_status(prompt_tokens: int, cached_tokens: int):
+    print(Fore.LIGHTBLACK_EX + f"[STATUS] Prompt cache: {cached_tokens}/{prompt_tokens} prompt tokens cached, "
+                               f"{100 * prompt_cache_stats.hit_rate:.0f}% this session")
+
+def print_cache_status(hit: bool):
+    status = "hit" if hit else "miss"
+    lookups = answer_cache.hits + answer_cache.misses
+    print(Fore.LIGHTBLACK_EX + f"[STATUS] Answer cache {status}, {answer_cache.hits}/{lookups} questions "
+                               f"served from cache ({100 * answer_cache.hit_rate:.0f}%)")
+
+async def answer_events(transcription, index: VectorIndex, interruption_event, session: SessionSummary = None):
+    """Yields ("delta", text) events of the answer to transcription, then ("done", info).
+
+    An answer cache hit arrives as a single delta. info holds first_token (seconds after the
+    call), cached (the answer cache entry served, or None), similarity, docs_used, and
+    prompt_tokens and cached_tokens as reported by the API (None when it reports no usage).
+    Answered questions are added to session, if given. The generator stops without "done"
+    when interruption_event is set.
+    """
+    started = time.perf_counter()
+    embedding_task = fingerprint = None
+    # prompt_messages keeps the prompt within PROMPT_TOKEN_BUDGET, so MAX_TOKENS is left entirely to the answer.
+    if answer_cache is None:
+        messages, docs_used = await prompt_messages(transcription, index, session=session)
+    else:
+        # The lookup's embedding request runs alongside the lexical search and retrieval shares it, so the
+        # lookup costs no extra request. When BM25 is confident the prompt is ready first and the lookup is
+        # skipped instead of waited for; the embedding still arrives in time to cache the answer.
+        fingerprint = answer_fingerprint(index)
+        embedding_task = asyncio.ensure_future(embed_query(transcription))
+        prompt_task = asyncio.ensure_future(prompt_messages(transcription, index, query_embedding=embedding_task,
+                                                            session=session))
+        try:
+            await asyncio.wait((embedding_task, prompt_task), return_when=asyncio.FIRST_COMPLETED)
+            embedded = embedding_task.done() and embedding_task.exception() is None
+            cached = answer_cache.lookup(embedding_task.result(), fingerprint) if embedded else None
+            if cached is not None:
+                entry, similarity = cached
+                if ANSWER_CACHE_REFRESH:
+                    runtime.submit(refresh_answer(transcription, index, embedding_task.result(), fingerprint))
+                if session is not None:
+                    session.add(transcription, entry["answer"])
+                yield "delta", entry["answer"]
+                yield "done", {"first_token": time.perf_counter() - started, "cached": entry,
+                               "similarity": similarity, "docs_used": [], "prompt_tokens": None,
+                               "cached_tokens": None}
+                return
+            messages, docs_used = await prompt_task
+        except BaseException:
+            embedding_task.cancel()  # Failed, cancelled or closed before the answer request, nothing left to cache
+            raise
+        finally:
+            prompt_task.cancel()  # No-op once it finished
 
     response_content = ""
-    response = await async_client.chat.completions.create(
-        model=model,
-        messages=messages,
-        max_tokens=max_tokens,
-        temperature=temperature,
-        top_p=top_p,
-        stream=True
-    )
+    first_token = None
+    usage = None
+    requested = time.perf_counter()
+    try:
+        response = await async_client.chat.completions.create(
+            model=GPT_MODEL,
+            messages=messages,
+            max_tokens=MAX_TOKENS,
+            temperature=TEMPERATURE,
+            top_p=TOP_P,
+            stream=True,
+            extra_body={"stream_options": {"include_usage": True}}  # Reports cached prompt tokens in a final chunk
+        )
+    except BaseException:
+        if embedding_task is not None:
+            embedding_task.cancel()
+        raise
 
     try:
         async for chunk in response:
             if interruption_event.is_set():
                 return
+            if not chunk.choices:
+                usage = prompt_cache_stats.add(getattr(chunk, "usage", None))
+                continue
             content = chunk.choices[0].delta.content
             if content is not None:
-                print(content, end='')
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                    record("first_token", time.perf_counter() - requested)
+                yield "delta", content
                 response_content += content
 
     except RuntimeError as e:
@@ -248,6 +626,50 @@ async def ask(transcription, titles, locs, texts, embeddings, interruption_event
             print("Generator was interrupted.")
         else:
             raise
+    else:
+        if session is not None and response_content:
+            session.add(transcription, response_content)
+        if embedding_task is not None and response_content:
+            query_embedding = await embedding_result(embedding_task)
+            if query_embedding is not None:  # Otherwise only the cache entry is lost, the answer was already streamed
+                answer_cache.put(transcription, query_embedding, response_content, fingerprint)
+    finally:
+        if embedding_task is not None:
+            embedding_task.cancel()  # No-op once it finished, otherwise the answer was interrupted or abandoned
+        await response.close()  # Frees the connection when the consumer stops early
+
+    if first_token is not None:
+        record("stream", time.perf_counter() - started - first_token)
+    if answer_cache is not None:
+        answer_cache.save_later(ANSWER_CACHE_SAVE_SECONDS)
+    yield "done", {"first_token": first_token, "cached": None, "similarity": None, "docs_used": docs_used,
+                   "prompt_tokens": usage[0] if usage else None, "cached_tokens": usage[1] if usage else None}
+
+async def ask(transcription, index: VectorIndex, interruption_event) -> str:
+    if interruption_event.is_set():
+        return
+
+    print(Fore.CYAN + "\n──────────────────────────────────────────────────────────────────────────")
+    print(Style.BRIGHT + Fore.BLUE + "Question:" + "\n" + Style.NORMAL + Fore.RESET + f"{transcription}")
+    print(Style.BRIGHT + Fore.MAGENTA + "\n" + "AI Response:")
+
+    info = None
+    async for kind, value in answer_events(transcription, index, interruption_event, interview_session):
+        if kind == "delta":
+            print(value, end='')
+        else:
+            info = value
+    if info is None:
+        return  # Interrupted
 
     print(Fore.CYAN + "\n──────────────────────────────────────────────────────────────────────────")
+    if info["cached"] is not None:
+        print(Fore.LIGHTBLACK_EX + f"[STATUS] Cached answer after {info['first_token']:.2f}s, "
+                                   f"{info['similarity']:.2f} similar to: {info['cached']['question']}")
+    elif info["first_token"] is not None:
+        print(Fore.LIGHTBLACK_EX + f"[STATUS] First token after {info['first_token']:.2f}s")
+    if answer_cache is not None:
+        print_cache_status(hit=info["cached"] is not None)
+    if info["prompt_tokens"]:
+        print_prompt_cache_status(info["prompt_tokens"], info["cached_tokens"])
     print(Fore.LIGHTGREEN_EX + "\nPress and hold the hotkey again to record another segment.")
\ No newline at end of file
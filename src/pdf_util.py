@@ -0,0 +1,35 @@
+import os
+from collections import OrderedDict
+
+from pypdf import PdfReader
+
+# Kept free of project imports: process pool workers import this module on their own.
+
+OPEN_READERS = 2  # Parsed PDFs kept per process; ranges of at most two documents are in flight at once
+_readers = OrderedDict()  # path -> (mtime_ns, file, reader), least recently used first
+
+
+def _reader(file_path) -> PdfReader:
+    # Every page range of a document is a separate task, so parse each PDF once per worker
+    # rather than reopening it and rebuilding its page tree for every range.
+    mtime_ns = os.stat(file_path).st_mtime_ns
+    cached = _readers.pop(file_path, None)
+    if cached is not None and cached[0] != mtime_ns:
+        cached[1].close()
+        cached = None
+    if cached is None:
+        file = open(file_path, "rb")
+        cached = (mtime_ns, file, PdfReader(file))
+        while len(_readers) >= OPEN_READERS:
+            _readers.popitem(last=False)[1][1].close()
+    _readers[file_path] = cached
+    return cached[2]
+
+
+def page_count(file_path) -> int:
+    return len(_reader(file_path).pages)
+
+
+def extract_pages(file_path, start=0, end=None) -> str:
+    pages = _reader(file_path).pages
+    return "".join(pages[i].extract_text() for i in range(start, len(pages) if end is None else min(end, len(pages))))
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import CancelledError
+
+from async_util import runtime
+
+
+class QuestionJob:
+    """One question's trip through transcription, retrieval and answering.
+
+    Every API coroutine of the job is scheduled through run(), so cancel() can abort the
+    requests that are still in flight on the shared runtime instead of waiting for them.
+    """
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.started = time.perf_counter()
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.completed = Counter()
+
+    def run(self, coro, kind: str, upload_bytes: int = 0):
+        """Runs coro on the shared runtime and returns its result, raising CancelledError once cancelled."""
+        with self._lock:
+            if self.cancelled.is_set():
+                coro.close()
+                raise CancelledError()
+            future = runtime.submit(coro)
+            self._in_flight[future] = (kind, upload_bytes)
+        try:
+            result = future.result()
+        finally:
+            with self._lock:
+                self._in_flight.pop(future, None)
+        self.completed[kind] += 1
+        return result
+
+    def cancel(self) -> dict:
+        with self._lock:
+            self.cancelled.set()
+            in_flight = list(self._in_flight.items())
+        saved = {"job": self.job_id, "seconds": time.perf_counter() - self.started,
+                 "requests": Counter(), "upload_bytes": 0}
+        for future, (kind, upload_bytes) in in_flight:
+            if future.cancel():
+                saved["requests"][kind] += 1
+                saved["upload_bytes"] += upload_bytes
+        return saved
+
+
+class PipelineScheduler:
+    """Keeps at most one question pipeline active.
+
+    start() cancels whatever job is still running before handing out a new one, and every
+    cancellation report is passed to on_cancel so the saved work can be shown or logged.
+    """
+
+    def __init__(self, on_cancel=None):
+        self.on_cancel = on_cancel
+        self.active = None
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def start(self) -> QuestionJob:
+        with self._lock:
+            previous = self.active
+            self.active = QuestionJob(self._next_id)
+            self._next_id += 1
+            job = self.active
+        if previous is not None:
+            self._report(previous.cancel())
+        return job
+
+    def cancel(self):
+        with self._lock:
+            job, self.active = self.active, None
+        if job is not None:
+            self._report(job.cancel())
+
+    def finish(self, job: QuestionJob):
+        with self._lock:
+            if self.active is job:
+                self.active = None
+
+    def _report(self, saved):
+        if self.on_cancel is not None and saved["requests"]:
+            self.on_cancel(saved)
@@ -0,0 +1,162 @@
+import email.utils
+import random
+import re
+import threading
+import time
+
+import openai
+from tenacity import Retrying, retry_if_exception, stop_after_attempt
+
+BACKOFF_BASE = 0.5  # Seconds before the first retry, doubled per attempt
+BACKOFF_MAX = 30.0
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value):
+    """Seconds in an x-ratelimit-reset-* value such as '1s', '6m0s' or '120ms', None if unparseable."""
+    if not value:
+        return None
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after(headers):
+    """Seconds the server asked to wait before retrying, from retry-after-ms or retry-after."""
+    if headers is None:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error) -> bool:
+    # Throttling, server errors and dropped connections are worth retrying, malformed requests are not.
+    return isinstance(error, (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError))
+
+
+class AdaptiveLimiter:
+    """AIMD limit on concurrent requests to one rate-limited API.
+
+    Every success raises the limit by 1/limit, roughly one more request in flight per round of
+    successes, up to max_limit. A 429 halves it, once per round: requests that were already in
+    flight when the limit last dropped do not drop it again. New requests are held back for the
+    server's retry-after hint, and until the reset when x-ratelimit-remaining-* reports zero.
+    """
+
+    def __init__(self, initial: int = 8, max_limit: int = 16, min_limit: int = 1):
+        self.limit = float(min(initial, max_limit))
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.throttles = 0
+        self.retries = 0
+        self.failures = 0
+        self._decreased = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> float:
+        with self._condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause <= 0 and self.in_flight < int(self.limit):
+                    break
+                self._condition.wait(pause if pause > 0 else None)
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, headers):
+        with self._condition:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            for kind in ("requests", "tokens"):
+                if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+                    reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                    if reset:
+                        self.paused_until = max(self.paused_until, time.monotonic() + reset)
+            self._condition.notify_all()
+
+    def on_throttle(self, headers, started: float):
+        with self._condition:
+            now = time.monotonic()
+            self.throttles += 1
+            if started >= self._decreased:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._decreased = now
+            hint = retry_after(headers)
+            if hint:
+                self.paused_until = max(self.paused_until, now + hint)
+            self._condition.notify_all()
+
+    def on_retry(self, retry_state=None):
+        with self._condition:
+            self.retries += 1
+
+    def on_failure(self):
+        with self._condition:
+            self.failures += 1
+
+    def snapshot(self):
+        with self._condition:
+            return {"throttles": self.throttles, "retries": self.retries, "failures": self.failures}
+
+    def summary(self, since) -> str:
+        counts = self.snapshot()
+        return (f"{counts['throttles'] - since['throttles']} throttled request(s), "
+                f"{counts['retries'] - since['retries']} retries, concurrency now {int(self.limit)}")
+
+
+def backoff(retry_state) -> float:
+    # Full jitter spreads out retries from parallel workers; a longer retry-after hint always wins.
+    error = retry_state.outcome.exception()
+    hint = retry_after(error.response.headers) if isinstance(error, openai.APIStatusError) else None
+    jittered = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (retry_state.attempt_number - 1)))
+    return max(hint or 0.0, jittered)
+
+
+def call_with_retry(limiter: AdaptiveLimiter, request, attempts: int):
+    """Calls request() under limiter, retrying retryable failures with jittered backoff.
+
+    request must return a raw API response, whose rate-limit headers feed the limiter.
+    """
+    def attempt():
+        started = limiter.acquire()
+        try:
+            response = request()
+        except openai.RateLimitError as e:
+            limiter.on_throttle(e.response.headers, started)
+            raise
+        finally:
+            limiter.release()
+        limiter.on_success(response.headers)
+        return response
+
+    try:
+        return Retrying(retry=retry_if_exception(is_retryable), wait=backoff, stop=stop_after_attempt(attempts),
+                        before_sleep=limiter.on_retry, reraise=True)(attempt)
+    except openai.OpenAIError:
+        limiter.on_failure()
+        raise
@@ -0,0 +1,272 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+
+import openai
+from aiohttp import WSMsgType, web
+from colorama import Fore, Style
+
+import openai_util
+from async_util import runtime
+from config import config_store
+from context_util import SessionSummary
+from indexer import FolderIndexer
+from trace_util import Tracer
+
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8765"))
+UPSTREAM_CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", "16"))  # Sessions transcribing or answering at once
+MAX_UPLOAD_MB = 64
+INDEX_LOADING = "The document index is still loading, try again shortly"
+
+
+class HinterviewServer:
+    """Headless Hinterview: one shared document index answering many sessions over HTTP and WebSocket.
+
+    The aiohttp app runs on the shared runtime loop, so every session reuses the API clients'
+    connection pools. At most upstream_concurrency sessions transcribe or stream an answer at
+    once and the rest queue, instead of every client adding to the account's rate limits.
+
+    POST /ask takes {"question": ...} as JSON, or audio as the body or a multipart "file",
+    and streams newline-delimited JSON events: transcript, delta, done or error. GET /ws
+    carries the same events; each text or binary message is a new question and cancels the
+    previous one on that socket, like the hotkey does, and questions on one socket share a
+    session summary in the cached prompt layout. POST /documents saves uploaded files
+    into the folder and re-indexes it. Questions are refused with 503 until the indexer's first
+    refresh has finished, rather than answered from an empty or stale index.
+    """
+
+    def __init__(self, indexer: FolderIndexer, host=SERVER_HOST, port=SERVER_PORT,
+                 upstream_concurrency=UPSTREAM_CONCURRENCY, tracer=None):
+        self.indexer = indexer
+        self.host = host
+        self.port = port
+        self.upstream_concurrency = upstream_concurrency
+        self.tracer = tracer or Tracer()
+        self.active = 0
+        self.served = 0
+        self._sessions = itertools.count(1)
+        self._upstream = None
+        self._documents_lock = None
+        self._runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _app(self):
+        app = web.Application(client_max_size=MAX_UPLOAD_MB * 2 ** 20)
+        app.router.add_get("/health", self._health)
+        app.router.add_post("/documents", self._documents)
+        app.router.add_post("/ask", self._ask)
+        app.router.add_get("/ws", self._websocket)
+        return app
+
+    async def _health(self, request):
+        return web.json_response({"chunks": len(self.indexer.index), "ready": self.indexer.ready.is_set(),
+                                  "active_sessions": self.active, "sessions_served": self.served,
+                                  "upstream_concurrency": self.upstream_concurrency})
+
+    async def _documents(self, request):
+        saved = []
+        async with self._documents_lock:
+            if request.content_type.startswith("multipart/"):
+                reader = await request.multipart()
+                file_type = "other"
+                while (part := await reader.next()) is not None:
+                    if part.name == "type":
+                        file_type = (await part.text()).strip() or "other"
+                    elif part.name == "file" and part.filename:
+                        filename = os.path.basename(part.filename)
+                        if not openai_util.is_document(filename):
+                            raise web.HTTPBadRequest(text=f"{filename}: only .txt and .pdf documents are indexed")
+                        data = await part.read()
+                        await asyncio.to_thread(self._save_document, filename, data, file_type)
+                        saved.append(filename)
+            changed = await asyncio.to_thread(self.indexer.refresh)
+        return web.json_response({"saved": saved, "reindexed": changed, "chunks": len(self.indexer.index)})
+
+    def _save_document(self, filename, data, file_type):
+        path = os.path.join(self.indexer.folder_path, filename)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+        config_store.set("FILES", filename, file_type)
+
+    async def _read_question(self, request):
+        """Returns (question, audio), where audio is a (filename, bytes) tuple for the transcription API."""
+        if request.content_type == "application/json":
+            body = await request.json()
+            question = (body.get("question") or "").strip()
+            if not question:
+                raise web.HTTPBadRequest(text='Expected {"question": "..."}')
+            return question, None
+        if request.content_type.startswith("multipart/"):
+            reader = await request.multipart()
+            while (part := await reader.next()) is not None:
+                if part.name == "file":
+                    return None, (os.path.basename(part.filename or "question.wav"), await part.read())
+            raise web.HTTPBadRequest(text='Expected a multipart "file" field with the audio')
+        audio = await request.read()
+        if not audio:
+            raise web.HTTPBadRequest(text="Expected a question or audio")
+        return None, (request.query.get("filename", "question.wav"), audio)
+
+    async def _events(self, question, audio, interruption_event, summary=None):
+        session = next(self._sessions)
+        self.tracer.question(session).activate()  # Each session runs in its own task and context
+        queued = time.perf_counter()
+        async with self._upstream:
+            waited = time.perf_counter() - queued
+            self.active += 1
+            try:
+                if audio is not None:
+                    question = openai_util.clean_transcription(await openai_util.atranscribe(audio))
+                    if question == openai_util.TRANSCRIPTION_FAILED:
+                        yield {"type": "error", "session": session, "message": question}
+                        return
+                    yield {"type": "transcript", "session": session, "text": question}
+                answers = openai_util.answer_events(question, self.indexer.index, interruption_event, summary)
+                try:
+                    async for kind, value in answers:
+                        if kind == "delta":
+                            yield {"type": "delta", "content": value}
+                        else:
+                            yield {"type": "done", "session": session, "first_token": value["first_token"],
+                                   "queued": waited, "cached": value["cached"] is not None,
+                                   "sources": [title for title, _ in value["docs_used"]],
+                                   "prompt_tokens": value["prompt_tokens"],
+                                   "cached_prompt_tokens": value["cached_tokens"]}
+                finally:
+                    await answers.aclose()  # Closing this generator does not close the one it iterates
+                self.served += 1
+            except openai.OpenAIError as e:
+                yield {"type": "error", "session": session, "message": str(e)}
+            except Exception as e:
+                # Anything else, such as a cache write failing, must still end the stream with an error
+                # event; the deltas already sent stay with the client.
+                print(Fore.RED + f"Session {session} failed: {e!r}")
+                yield {"type": "error", "session": session, "message": f"{type(e).__name__}: {e}"}
+            finally:
+                self.active -= 1
+
+    async def _ask(self, request):
+        if not self.indexer.ready.is_set():
+            raise web.HTTPServiceUnavailable(text=INDEX_LOADING, headers={"Retry-After": "5"})
+        question, audio = await self._read_question(request)
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        interruption_event = threading.Event()
+        events = self._events(question, audio, interruption_event)
+        try:
+            async for event in events:
+                await response.write((json.dumps(event) + "\n").encode("utf-8"))
+            await response.write_eof()
+        except ConnectionResetError:
+            pass  # The client went away
+        finally:
+            # Also reached when aiohttp cancels the handler on disconnect: stop paying for the
+            # answer and release the upstream slot now, not when the generator is collected.
+            interruption_event.set()
+            await events.aclose()
+        return response
+
+    async def _answer_over_socket(self, socket, question, audio, interruption_event, summary):
+        events = self._events(question, audio, interruption_event, summary)
+        try:
+            async for event in events:
+                await socket.send_json(event)
+        except ConnectionResetError:
+            pass
+        finally:
+            interruption_event.set()  # Also reached when a newer question or closing the socket cancels this one
+            await events.aclose()
+
+    async def _websocket(self, request):
+        socket = web.WebSocketResponse(heartbeat=30)
+        await socket.prepare(request)
+        current = None
+        summary = SessionSummary(openai_util.SESSION_SUMMARY_TOKENS, openai_util.num_tokens)  # One per socket
+
+        def cancel_current():
+            if current is not None and not current[0].done():
+                current[1].set()
+                current[0].cancel()
+                return True
+            return False
+
+        async for message in socket:
+            if message.type == WSMsgType.TEXT:
+                try:
+                    question, audio = (json.loads(message.data).get("question") or "").strip(), None
+                except (ValueError, AttributeError):
+                    question = ""
+                if not question:
+                    await socket.send_json({"type": "error", "message": 'Expected {"question": "..."}'})
+                    continue
+            elif message.type == WSMsgType.BINARY:
+                question, audio = None, (request.query.get("filename", "question.wav"), message.data)
+            else:
+                continue
+            if not self.indexer.ready.is_set():
+                await socket.send_json({"type": "error", "message": INDEX_LOADING})
+                continue
+            if cancel_current():
+                await socket.send_json({"type": "cancelled"})
+            interruption_event = threading.Event()
+            current = (asyncio.ensure_future(self._answer_over_socket(socket, question, audio, interruption_event,
+                                                                 summary)),
+                       interruption_event)
+        cancel_current()
+        return socket
+
+    async def _start(self):
+        self._upstream = asyncio.Semaphore(self.upstream_concurrency)
+        self._documents_lock = asyncio.Lock()
+        self._runner = web.AppRunner(self._app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def start(self):
+        runtime.run(self._start())
+        return self
+
+    def stop(self):
+        runtime.run(self._runner.cleanup())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve one shared Hinterview document index over HTTP and WebSocket")
+    parser.add_argument("--folder", default=None, help="document folder, the configured one if omitted")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--upstream-concurrency", type=int, default=UPSTREAM_CONCURRENCY,
+                        help="sessions transcribing or answering at once, the rest queue")
+    args = parser.parse_args()
+
+    folder_path = args.folder or config_store.get("SETTINGS", "folder_path", fallback="")
+    if not folder_path or not os.path.isdir(folder_path):
+        parser.error("set folder_path in config.ini or pass --folder")
+
+    indexer = FolderIndexer(folder_path)
+    indexer.load()
+    indexer.start()  # Embeds new and changed files in the background while requests are served
+    openai_util.warm_up()
+    server = HinterviewServer(indexer, args.host, args.port, args.upstream_concurrency).start()
+    print(Style.BRIGHT + Fore.CYAN + f"Serving {folder_path} ({len(indexer.index)} chunks) at {server.url}")
+    print(Fore.LIGHTBLACK_EX + f"Traces in {server.tracer.path}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        indexer.stop()
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
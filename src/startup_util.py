@@ -0,0 +1,89 @@
+import importlib
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+from colorama import Fore
+
+LAUNCHED = time.perf_counter()
+PRELOAD_MODULES = ("numpy", "openai_util", "indexer", "audio_util")  # Imported while the menu waits for input
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+class Startup:
+    """Startup milestones, plus a background thread that preloads the heavy modules and saved index.
+
+    preload() is called once the menu is drawn, so imports and opening the memory-mapped
+    index overlap with the user reading the menu instead of delaying it. Milestones are
+    seconds since this module was imported, which main.py does first.
+    """
+
+    def __init__(self):
+        self.marks = {}
+        self._folder_path = None
+        self._indexer = None
+        self._error = None
+        self._thread = None
+
+    def mark(self, milestone: str):
+        self.marks.setdefault(milestone, time.perf_counter() - LAUNCHED)
+
+    def preload(self, folder_path):
+        self.mark("menu")
+        self._folder_path = folder_path
+        self._thread = threading.Thread(target=self._preload, daemon=True)
+        self._thread.start()
+
+    def _preload(self):
+        try:
+            for name in PRELOAD_MODULES:
+                importlib.import_module(name)
+            self.mark("imports")
+            if self._folder_path and os.path.isdir(self._folder_path):
+                from indexer import FolderIndexer
+                indexer = FolderIndexer(self._folder_path)
+                if indexer.load():
+                    self.mark("index_loaded")
+                self._indexer = indexer
+        except Exception as e:
+            self._error = e
+
+    def indexer(self, folder_path):
+        """The preloaded indexer, or a new one if the folder was changed in the settings menu."""
+        if self._thread is not None:
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+        from indexer import FolderIndexer
+        if self._indexer is None or os.path.abspath(self._indexer.folder_path) != os.path.abspath(folder_path):
+            self._indexer = FolderIndexer(folder_path)
+            self._indexer.load()
+        return self._indexer
+
+    def report(self):
+        self.mark("ready")
+        milestones = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.marks.items())
+        line = f"[STATUS] Startup milestones after launch: {milestones}"
+        if "start" in self.marks:
+            line += f"; hotkey ready {self.marks['ready'] - self.marks['start']:.2f}s after Start Interview"
+        print(Fore.LIGHTBLACK_EX + line)
+
+
+def import_times(module: str, env=None):
+    """Runs `python -X importtime -c "import module"` and returns (self_us, cumulative_us, depth, name) rows."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True,
+                            text=True, cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"import {module} failed")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            rows.append((int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2, match.group(4)))
+    return rows
+
+
+startup = Startup()
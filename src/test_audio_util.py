@@ -0,0 +1,41 @@
+import threading
+
+import numpy as np
+
+from audio_util import RingBuffer
+
+
+def frames(start, count, channels=1):
+    return np.arange(start, start + count, dtype=np.int16).repeat(channels).reshape(count, channels)
+
+
+def test_read_returns_written_frames_by_absolute_position():
+    ring = RingBuffer(8, 1)
+    ring.write(frames(0, 5))
+    assert ring.position == 5 and ring.oldest == 0
+    np.testing.assert_array_equal(ring.read(1, 4), frames(1, 3))
+
+
+def test_reads_across_the_wrap_around():
+    ring = RingBuffer(8, 2)
+    ring.write(frames(0, 6, 2))
+    ring.write(frames(6, 6, 2))
+    assert ring.position == 12 and ring.oldest == 4
+    np.testing.assert_array_equal(ring.read(5, 12), frames(5, 7, 2))
+    np.testing.assert_array_equal(ring.read(8, 16), frames(8, 4, 2))
+
+
+def test_overwritten_and_future_frames_are_clipped():
+    ring = RingBuffer(4, 1)
+    ring.write(frames(0, 10))  # Only the last capacity frames are kept
+    np.testing.assert_array_equal(ring.read(0, 100), frames(6, 4))
+    assert len(ring.read(10, 12)) == 0
+
+
+def test_wait_returns_once_frames_arrive():
+    ring = RingBuffer(4, 1)
+    assert ring.wait(0, timeout=0.01) == 0
+    writer = threading.Timer(0.01, ring.write, args=(frames(0, 2),))
+    writer.start()
+    assert ring.wait(0, timeout=1) == 2
+    writer.join()
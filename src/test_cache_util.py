@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from cache_util import AnswerCache, EmbeddingCache
+
+
+def vector(seed, dimensions=8):
+    return np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+
+
+def one_hot(i, dimensions=256):
+    # Orthogonal questions, so none of them is similar enough to replace another.
+    embedding = np.zeros(dimensions, dtype=np.float32)
+    embedding[i] = 1.0
+    return embedding
+
+
+def test_embedding_cache_round_trip(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model")
+    cache.put("a", vector(0))
+    cache.put("b", vector(1))
+    cache.save()
+    cache.put("c", vector(2))
+    cache.save()
+
+    reloaded = EmbeddingCache(str(tmp_path), "model")
+    assert len(reloaded) == 3 and "b" in reloaded and "d" not in reloaded
+    np.testing.assert_array_equal(reloaded.get("c"), vector(2))
+    assert reloaded.get_many(["a", "d"])[1] is None
+
+
+def test_embedding_cache_concurrent_saves_keep_every_row(tmp_path):
+    errors = []
+
+    def worker(worker_id):
+        try:
+            cache = EmbeddingCache(str(tmp_path), "model")
+            for i in range(20):
+                cache.put(f"{worker_id}-{i}", vector(worker_id * 100 + i))
+                cache.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(worker_id,)) for worker_id in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    cache = EmbeddingCache(str(tmp_path), "model")
+    assert len(cache) == 120
+    np.testing.assert_array_equal(cache.get("5-19"), vector(519))
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_embedding_cache_ignores_a_torn_save(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model")
+    cache.put("a", vector(0))
+    cache.save()
+    # A crash after the rows were written but before their keys were complete.
+    with open(cache.vectors_path, "ab") as f:
+        f.write(vector(1).tobytes())
+    with open(cache.keys_path, "ab") as f:
+        f.write(cache.key("b")[:10].encode("ascii"))
+
+    cache = EmbeddingCache(str(tmp_path), "model")
+    assert len(cache) == 1 and "b" not in cache
+    cache.put("b", vector(1))
+    cache.save()
+    reloaded = EmbeddingCache(str(tmp_path), "model")
+    assert len(reloaded) == 2
+    np.testing.assert_array_equal(reloaded.get("b"), vector(1))
+
+
+def test_embedding_cache_migrates_the_legacy_layout(tmp_path):
+    legacy = EmbeddingCache(str(tmp_path), "model")
+    keys = [legacy.key("a"), legacy.key("b")]
+    keys_path, vectors_path = legacy.legacy_paths
+    with open(keys_path, "w") as f:
+        json.dump(keys, f)
+    np.save(vectors_path, np.stack([vector(0), vector(1)]))
+
+    cache = EmbeddingCache(str(tmp_path), "model")
+    assert len(cache) == 2
+    np.testing.assert_array_equal(cache.get("b"), vector(1))
+    assert not os.path.exists(keys_path) and not os.path.exists(vectors_path)
+
+
+def test_answer_cache_matches_similar_questions_for_the_same_fingerprint(tmp_path):
+    cache = AnswerCache(str(tmp_path), similarity=0.95)
+    cache.put("Tell me about yourself", vector(0), "answer", "index-1")
+
+    entry, similarity = cache.lookup(vector(0) * 2, "index-1")
+    assert entry["answer"] == "answer" and similarity > 0.99
+    assert cache.lookup(vector(1), "index-1") is None
+    assert cache.lookup(vector(0), "index-2") is None
+    assert len(cache) == 0  # Entries built from another index are dropped
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_answer_cache_concurrent_saves_write_a_consistent_cache(tmp_path):
+    cache = AnswerCache(str(tmp_path), max_entries=1000)
+    errors = []
+
+    def worker(worker_id):
+        try:
+            for i in range(25):
+                cache.put(f"question {worker_id}-{i}", one_hot(worker_id * 25 + i), "answer", "index")
+                cache.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(worker_id,)) for worker_id in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(AnswerCache(str(tmp_path), max_entries=1000)) == 200
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_answer_cache_saves_only_changes(tmp_path):
+    cache = AnswerCache(str(tmp_path))
+    cache.save()
+    assert not os.path.exists(cache.entries_path)
+
+    cache.put("question", vector(0), "answer", "index")
+    cache.save()
+    modified = os.stat(cache.entries_path).st_mtime_ns
+    os.utime(cache.entries_path, ns=(0, 0))
+    cache.save()
+    assert os.stat(cache.entries_path).st_mtime_ns == 0 != modified
+
+
+def test_answer_cache_save_later_coalesces_changes(tmp_path):
+    cache = AnswerCache(str(tmp_path))
+    cache.put("first", one_hot(0), "answer", "index")
+    cache.save_later(0.05)
+    cache.put("second", one_hot(1), "answer", "index")
+    cache.save_later(0.05)
+    timer = cache._timer
+    timer.join(1)
+
+    assert cache._timer is None
+    assert len(AnswerCache(str(tmp_path))) == 2
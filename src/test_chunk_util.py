@@ -0,0 +1,38 @@
+import numpy as np
+
+from chunk_util import chunk_bounds, chunk_id
+
+
+def test_fixed_stride_bounds_cover_every_token():
+    assert chunk_bounds(10, 4).tolist() == [[0, 4], [4, 8], [8, 10]]
+    assert chunk_bounds(10, 4, overlap=1).tolist() == [[0, 4], [3, 7], [6, 10]]
+    assert chunk_bounds(3, 4).tolist() == [[0, 3]]
+    assert chunk_bounds(0, 4).shape == (0, 2)
+
+
+def test_overlap_is_capped_below_max_length():
+    bounds = chunk_bounds(5, 2, overlap=5)
+    assert bounds.tolist() == [[0, 2], [1, 3], [2, 4], [3, 5]]
+
+
+def test_sentence_bounds_cut_after_the_last_sentence_end():
+    sentence_ends = np.zeros(20, dtype=bool)
+    sentence_ends[[5, 8, 15]] = True
+    assert chunk_bounds(20, 10, sentence_ends=sentence_ends).tolist() == [[0, 9], [9, 16], [16, 20]]
+
+
+def test_sentence_bounds_fall_back_to_a_hard_cut_for_short_sentences():
+    sentence_ends = np.zeros(20, dtype=bool)
+    sentence_ends[1] = True  # Cutting here would leave a chunk under half of max_length
+    assert chunk_bounds(20, 10, sentence_ends=sentence_ends).tolist() == [[0, 10], [10, 20]]
+
+
+def test_sentence_bounds_with_overlap_always_advance():
+    sentence_ends = np.ones(30, dtype=bool)
+    bounds = chunk_bounds(30, 4, overlap=3, sentence_ends=sentence_ends)
+    assert np.all(np.diff(bounds[:, 0]) > 0) and bounds[-1, 1] == 30
+
+
+def test_chunk_ids_are_stable_and_distinct():
+    assert chunk_id("cv", 0, "text") == chunk_id("cv", 0, "text")
+    assert len({chunk_id("cv", 0, "text"), chunk_id("cv", 10, "text"), chunk_id("notes", 0, "text")}) == 3
@@ -0,0 +1,49 @@
+import configparser
+
+from config import ConfigStore
+
+
+def read(path):
+    parser = configparser.ConfigParser()
+    parser.read(path)
+    return parser
+
+
+def test_a_missing_file_is_created_with_default_settings(tmp_path):
+    path = tmp_path / "config.ini"
+    store = ConfigStore(str(path))
+    assert store.get("SETTINGS", "hotkey") == "alt_l"
+    assert read(path).has_section("FILES")
+
+
+def test_batch_writes_once_when_the_outermost_batch_ends(tmp_path, monkeypatch):
+    store = ConfigStore(str(tmp_path / "config.ini"))
+    store.parser  # Creates the file before writes are counted
+    writes = []
+    write = store._write
+    monkeypatch.setattr(store, "_write", lambda: writes.append(1) or write())
+
+    with store.batch():
+        store.set("FILES", "a.pdf", "cv")
+        with store.batch():
+            store.set("FILES", "b.txt", "notes")
+        assert not writes
+        store.set("SETTINGS", "temperature", 0.5)
+    assert len(writes) == 1
+    assert dict(read(tmp_path / "config.ini")["FILES"]) == {"a.pdf": "cv", "b.txt": "notes"}
+
+    store.set("FILES", "a.pdf", "cv")  # Unchanged values are not written again
+    assert len(writes) == 1
+
+
+def test_setting_none_removes_the_key_and_notifies_subscribers(tmp_path):
+    store = ConfigStore(str(tmp_path / "config.ini"))
+    changes = []
+    store.subscribe(lambda *change: changes.append(change))
+    store.set("SETTINGS", "gpt_model", "gpt-4o")
+    store.set("SETTINGS", "gpt_model", None)
+    store.set("SETTINGS", "gpt_model", None)
+
+    assert store.get("SETTINGS", "gpt_model") is None
+    assert not read(tmp_path / "config.ini").has_option("SETTINGS", "gpt_model")
+    assert changes == [("SETTINGS", "gpt_model", "gpt-4o"), ("SETTINGS", "gpt_model", None)]
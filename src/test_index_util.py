@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from ann_util import IVFIndex
+from index_util import INDEX_DTYPES, ChunkTexts, VectorIndex, load_index, save_index
+
+
+def random_index(count=300, dimensions=32, seed=0):
+    embeddings = np.random.default_rng(seed).standard_normal((count, dimensions)).astype(np.float32)
+    return VectorIndex(["title"] * count, [str(i) for i in range(count)], [f"text {i}" for i in range(count)],
+                       embeddings, [2] * count)
+
+
+def brute_force(index, query, top_n):
+    query = query / np.linalg.norm(query)
+    return np.argsort(index.matrix @ query)[::-1][:top_n]
+
+
+def test_search_ranks_by_cosine_similarity():
+    index = random_index()
+    query = np.random.default_rng(1).standard_normal(32)
+    rows, scores = index.search(query, 5)
+    np.testing.assert_array_equal(rows, brute_force(index, query, 5))
+    assert np.all(np.diff(scores) <= 0)
+
+
+@pytest.mark.parametrize("top_n", [0, -1])
+def test_search_returns_nothing_for_non_positive_top_n(top_n):
+    rows, scores = random_index().search(np.ones(32), top_n)
+    assert len(rows) == len(scores) == 0
+
+
+def test_search_of_an_empty_index():
+    rows, scores = VectorIndex([], [], [], []).search(np.ones(32), 5)
+    assert len(rows) == len(scores) == 0
+
+
+def test_search_caps_top_n_at_the_index_size():
+    rows, _ = random_index(count=4).search(np.ones(32), 10)
+    assert sorted(rows.tolist()) == [0, 1, 2, 3]
+
+
+def test_ann_search_falls_back_to_exact_when_probed_lists_are_too_small():
+    index = random_index()
+    index.ann = IVFIndex.build(index.matrix, n_lists=100)
+    query = np.random.default_rng(2).standard_normal(32)
+    rows, _ = index.search(query, 50, nprobe=1)
+    np.testing.assert_array_equal(rows, brute_force(index, query, 50))
+
+
+def test_ann_search_only_returns_probed_rows():
+    index = random_index(count=2000)
+    index.ann = IVFIndex.build(index.matrix, n_lists=20)
+    query = index.matrix[7]
+    rows, _ = index.search(query, 3, nprobe=1)
+    assert rows[0] == 7
+    assert set(rows.tolist()) <= set(index.ann.candidates(query, 1).tolist())
+
+
+@pytest.mark.parametrize("dtype", INDEX_DTYPES)
+def test_saved_index_round_trip(tmp_path, dtype):
+    index = random_index()
+    save_index(index, str(tmp_path), dtype)
+    loaded = load_index(str(tmp_path))
+
+    assert loaded.dtype == dtype and isinstance(loaded.texts, ChunkTexts)
+    assert list(loaded.texts) == index.texts and loaded.ids == index.ids and loaded.token_counts == index.token_counts
+    query = np.random.default_rng(3).standard_normal(32)
+    assert loaded.search(query, 1)[0][0] == index.search(query, 1)[0][0]
+
+
+def test_load_index_rejects_a_missing_or_mismatched_index(tmp_path):
+    assert load_index(str(tmp_path)) is None
+    save_index(random_index(), str(tmp_path))
+    np.save(str(tmp_path / "vectors.npy"), np.zeros((3, 32), dtype=np.float32))
+    assert load_index(str(tmp_path)) is None
+
+
+def test_chunk_texts_pack_round_trip():
+    texts = ChunkTexts.pack(["a", "", "naïve résumé"])
+    assert len(texts) == 3 and texts[-1] == "naïve résumé" and list(texts) == ["a", "", "naïve résumé"]
@@ -0,0 +1,36 @@
+from lexical_util import LexicalIndex, reciprocal_rank_fusion, terms
+
+TEXTS = [
+    "Migrated the billing database to PostgreSQL with zero downtime.",
+    "Led a team of five engineers building the mobile app.",
+    "Cut API latency by caching database queries in Redis.",
+]
+
+
+def test_terms_drop_stopwords_and_punctuation():
+    assert terms("Tell me about the Redis cache!") == ["redis", "cache"]
+
+
+def test_bm25_ranks_documents_sharing_rare_terms_first():
+    rows, scores, confidence = LexicalIndex(TEXTS).search("database latency", 3)
+    assert rows.tolist() == [2, 0]
+    assert scores[0] > scores[1] > 0
+    assert 0 < confidence <= 1
+
+
+def test_bm25_confidence_drops_for_terms_the_corpus_lacks():
+    index = LexicalIndex(TEXTS)
+    _, _, covered = index.search("redis caching", 1)
+    _, _, partial = index.search("redis kubernetes", 1)
+    assert partial < covered
+
+
+def test_bm25_without_matches():
+    rows, scores, confidence = LexicalIndex(TEXTS).search("kubernetes", 3)
+    assert len(rows) == len(scores) == 0 and confidence == 0.0
+    assert len(LexicalIndex([]).search("anything", 3)[0]) == 0
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    assert reciprocal_rank_fusion([[1, 2], [2, 3]]) == [2, 1, 3]
+    assert reciprocal_rank_fusion([]) == []
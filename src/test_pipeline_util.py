@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from pipeline_util import PipelineScheduler, QuestionJob
+
+
+async def value_after(seconds, value):
+    await asyncio.sleep(seconds)
+    return value
+
+
+def run_in_thread(job, coro, kind):
+    """Runs coro through job on a worker thread and returns (thread, outcome)."""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = job.run(coro, kind)
+        except CancelledError:
+            outcome["cancelled"] = True
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread, outcome
+
+
+def wait_until_in_flight(job, count=1):
+    for _ in range(200):
+        with job._lock:
+            if len(job._in_flight) >= count:
+                return
+        time.sleep(0.005)
+    raise AssertionError("the job never scheduled its request")
+
+
+def test_run_returns_the_result_and_counts_completed_requests():
+    job = QuestionJob(1)
+    assert job.run(value_after(0, "answer"), "answer") == "answer"
+    assert job.completed["answer"] == 1
+
+
+def test_cancel_aborts_requests_in_flight():
+    job = QuestionJob(1)
+    thread, outcome = run_in_thread(job, value_after(10, "late"), "transcription")
+    wait_until_in_flight(job)
+
+    saved = job.cancel()
+    thread.join(1)
+    assert not thread.is_alive() and outcome == {"cancelled": True}
+    assert saved["job"] == 1 and saved["requests"] == {"transcription": 1}
+    assert job.cancelled.is_set() and not job.completed
+
+
+def test_run_after_cancel_never_schedules_the_coroutine():
+    job = QuestionJob(1)
+    job.cancel()
+    coro = value_after(0, "answer")
+    with pytest.raises(CancelledError):
+        job.run(coro, "answer")
+    assert coro.cr_frame is None  # Closed without being awaited
+
+
+def test_starting_a_question_cancels_the_previous_one():
+    reports = []
+    scheduler = PipelineScheduler(on_cancel=reports.append)
+    first = scheduler.start()
+    thread, outcome = run_in_thread(first, value_after(10, "late"), "answer")
+    wait_until_in_flight(first)
+
+    second = scheduler.start()
+    thread.join(1)
+    assert outcome == {"cancelled": True} and first.cancelled.is_set()
+    assert scheduler.active is second and second.job_id == 2 and not second.cancelled.is_set()
+    assert [report["job"] for report in reports] == [1]
+
+
+def test_finish_and_idle_cancel_report_nothing():
+    reports = []
+    scheduler = PipelineScheduler(on_cancel=reports.append)
+    job = scheduler.start()
+    scheduler.finish(job)
+    assert scheduler.active is None
+    scheduler.cancel()
+    scheduler.start()
+    scheduler.cancel()  # Nothing was in flight, so there is no saved work to report
+    assert scheduler.active is None and reports == []
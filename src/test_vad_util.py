@@ -0,0 +1,60 @@
+import numpy as np
+
+from vad_util import SilenceSplitter, trim_silence
+
+RATE = 16000
+
+
+def noise(seconds, rng, level=30):
+    return (rng.standard_normal(int(seconds * RATE)) * level).astype(np.int16)
+
+
+def tone(seconds, frequency=220, level=8000):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (np.sin(2 * np.pi * frequency * t) * level).astype(np.int16)
+
+
+def speech_with_pause(rng):
+    return np.concatenate((noise(1.0, rng), tone(1.5), noise(2.0, rng), tone(1.2), noise(1.0, rng)))
+
+
+def test_splitter_cuts_at_long_pauses():
+    splitter = SilenceSplitter(RATE)
+    samples = speech_with_pause(np.random.default_rng(0))
+    segments = splitter.feed(samples) + splitter.finish()
+
+    assert len(segments) == 2
+    starts = [start / RATE for start, _ in segments]
+    assert abs(starts[0] - 1.0) < 0.3 and abs(starts[1] - 4.5) < 0.3
+    assert all(1.0 < len(audio) / RATE < 2.0 for _, audio in segments)
+
+
+def test_splitter_output_does_not_depend_on_block_size():
+    samples = speech_with_pause(np.random.default_rng(1))
+    whole = SilenceSplitter(RATE)
+    expected = whole.feed(samples) + whole.finish()
+
+    streamed = SilenceSplitter(RATE)
+    segments = []
+    for start in range(0, len(samples), 1234):
+        segments += streamed.feed(samples[start:start + 1234])
+    segments += streamed.finish()
+
+    assert [start for start, _ in segments] == [start for start, _ in expected]
+    assert streamed.position == len(samples)
+    for (_, audio), (_, reference) in zip(segments, expected):
+        np.testing.assert_array_equal(audio, reference)
+
+
+def test_splitter_drops_segments_shorter_than_min_speech():
+    rng = np.random.default_rng(2)
+    splitter = SilenceSplitter(RATE)
+    samples = np.concatenate((noise(1.0, rng), tone(0.3), noise(2.0, rng)))
+    assert splitter.feed(samples) + splitter.finish() == []
+
+
+def test_trim_silence_shortens_long_pauses():
+    samples = speech_with_pause(np.random.default_rng(3))
+    trimmed = trim_silence(samples, RATE)
+    assert len(trimmed) < len(samples) - 2 * RATE
+    assert len(trimmed) > 2.5 * RATE  # Both words survive
@@ -0,0 +1,125 @@
+import argparse
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from colorama import Fore, Style
+
+TRACE_DIR = os.getenv("HINTERVIEW_TRACE_DIR", os.path.join(os.getenv("HINTERVIEW_CACHE_DIR", ".hinterview_cache"), "traces"))
+STAGES = ("capture", "vad", "encode", "transcribe", "transcript_ready", "query_embedding", "retrieval",
+          "prompt_build", "first_token", "stream", "end_to_end")
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Tracer:
+    """Appends one JSON line per span to a trace file for the session."""
+
+    def __init__(self, path=None):
+        self.session = time.strftime("%Y%m%d-%H%M%S")
+        self.path = path or os.path.join(TRACE_DIR, f"session-{self.session}.jsonl")
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._file = open(self.path, "a", buffering=1)
+            self._file.write(line)
+
+    def question(self, question_id):
+        return QuestionTrace(self, question_id)
+
+
+class QuestionTrace:
+    def __init__(self, tracer: Tracer, question_id):
+        self.tracer = tracer
+        self.question_id = question_id
+
+    def record(self, stage: str, start: float, seconds: float):
+        """start is a time.time() timestamp, seconds the span's duration."""
+        self.tracer.write({"session": self.tracer.session, "question": self.question_id, "stage": stage,
+                           "start": round(start, 6), "seconds": round(seconds, 6)})
+
+    @contextmanager
+    def span(self, stage: str):
+        # Only spans that complete are recorded; cancelled or failed work would skew the percentiles.
+        start, started = time.time(), time.perf_counter()
+        yield
+        self.record(stage, start, time.perf_counter() - started)
+
+    def activate(self):
+        # Coroutines scheduled and executor tasks submitted with a copied context inherit the trace.
+        return current_trace.set(self)
+
+
+def span(stage: str):
+    """Times the block under the question traced in the current context, if any."""
+    trace = current_trace.get()
+    return trace.span(stage) if trace is not None else _untraced()
+
+
+@contextmanager
+def _untraced():
+    yield
+
+
+def record(stage: str, seconds: float):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.record(stage, time.time() - seconds, seconds)
+
+
+def load_spans(paths):
+    spans = []
+    for path in paths:
+        with open(path, "r") as f:
+            spans.extend(json.loads(line) for line in f if line.strip())
+    return spans
+
+
+def summarize(spans):
+    """Per stage, the total time each question spent in it, as {stage: array of seconds}."""
+    per_question = {}
+    for item in spans:
+        key = (item["session"], item["question"])
+        per_question.setdefault(item["stage"], {}).setdefault(key, 0.0)
+        per_question[item["stage"]][key] += item["seconds"]
+    return {stage: np.array(list(totals.values())) for stage, totals in per_question.items()}
+
+
+def print_summary(spans):
+    stages = summarize(spans)
+    print(Style.BRIGHT + Fore.CYAN + f"{'stage':<18} {'questions':>9} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} "
+                                     f"{'max ms':>10}")
+    for stage in [s for s in STAGES if s in stages] + sorted(set(stages) - set(STAGES)):
+        seconds = 1000 * stages[stage]
+        p50, p95, p99 = np.percentile(seconds, [50, 95, 99])
+        print(Fore.LIGHTGREEN_EX + f"{stage:<18} {len(seconds):>9} {p50:>10.1f} {p95:>10.1f} {p99:>10.1f} {seconds.max():>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency percentiles from Hinterview traces")
+    parser.add_argument("traces", nargs="*", help="trace files, the latest session if omitted")
+    parser.add_argument("--all", action="store_true", help="summarize every session in the trace directory")
+    args = parser.parse_args()
+
+    paths = args.traces or sorted(glob.glob(os.path.join(TRACE_DIR, "session-*.jsonl")))
+    if not args.traces and not args.all:
+        paths = paths[-1:]
+    if not paths:
+        print(Fore.RED + f"No traces found in {TRACE_DIR}")
+        return
+    print(Fore.CYAN + ", ".join(paths))
+    print_summary(load_spans(paths))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import numpy as np
+
+FRAME_MS = 30
+MIN_THRESHOLD_DB = -55.0  # Never treat anything quieter than this as speech
+MAX_THRESHOLD_DB = -35.0  # Normal speech is louder than this even when the clip has no pauses to learn from
+NOISE_MARGIN_DB = 10.0
+UNVOICED_ZCR = 0.25  # Fricatives are quiet but cross zero far more often than hum or room noise
+PADDING_SECONDS = 0.2  # Kept around every speech run so word onsets and tails survive
+MAX_PAUSE_SECONDS = 0.6  # Internal pauses longer than this are shortened to this length
+
+
+def frame_features(samples, rate: int):
+    frame = max(1, rate * FRAME_MS // 1000)
+    count = len(samples) // frame
+    frames = np.asarray(samples[:count * frame], dtype=np.float32).reshape(count, frame) / 32768.0
+
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    energy_db = 20 * np.log10(np.maximum(rms, 1e-10))
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame
+    return energy_db, zcr, frame
+
+
+def speech_mask(samples, rate: int):
+    energy_db, zcr, frame = frame_features(samples, rate)
+    if not len(energy_db):
+        return np.zeros(0, dtype=bool), frame
+
+    noise_floor = np.percentile(energy_db, 10)
+    threshold = np.clip(noise_floor + NOISE_MARGIN_DB, MIN_THRESHOLD_DB, MAX_THRESHOLD_DB)
+    voiced = energy_db > threshold
+    unvoiced = (energy_db > max(noise_floor + NOISE_MARGIN_DB / 2, MIN_THRESHOLD_DB)) & (zcr > UNVOICED_ZCR)
+    mask = voiced | unvoiced
+
+    # Dilate by the padding so short gaps between syllables are not cut.
+    pad = int(round(PADDING_SECONDS * 1000 / FRAME_MS))
+    if pad and mask.any():
+        mask = np.convolve(mask.astype(np.int8), np.ones(2 * pad + 1, dtype=np.int8), mode="same") > 0
+    return mask, frame
+
+
+def trim_silence(samples, rate: int, max_pause=MAX_PAUSE_SECONDS):
+    """Drops leading and trailing silence and shortens long internal pauses.
+
+    Returns an empty array when the clip contains no speech at all.
+    """
+    mask, frame = speech_mask(samples, rate)
+    if not mask.any():
+        return samples[:0]
+
+    # Run boundaries of the speech mask, as [start, end) frame pairs for each speech run.
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    runs = edges.reshape(-1, 2)
+    keep_pause = int(max_pause * rate)
+
+    pieces = []
+    for i, (start, end) in enumerate(runs):
+        if i:
+            gap = samples[runs[i - 1][1] * frame:start * frame]
+            if len(gap) > keep_pause:
+                half = keep_pause // 2
+                gap = np.concatenate((gap[:half], gap[len(gap) - (keep_pause - half):]))
+            pieces.append(gap)
+        end_sample = len(samples) if end == len(mask) else end * frame
+        pieces.append(samples[start * frame:end_sample])
+    return np.concatenate(pieces)
+
+
+class SilenceSplitter:
+    """Cuts a stream of 16-bit mono samples into speech segments at long pauses.
+
+    feed() takes blocks of any length and returns the segments that ended in them as
+    (start_sample, samples) pairs; finish() flushes the last one. The noise floor is learned
+    from the most recent NOISE_WINDOW_SECONDS of frames, so only the open segment and one
+    frame of leftover samples are ever held in memory.
+    """
+
+    NOISE_WINDOW_SECONDS = 30.0
+
+    def __init__(self, rate: int, min_silence=1.5, min_speech=1.0, max_segment=120.0):
+        self.rate = rate
+        self.frame = max(1, rate * FRAME_MS // 1000)
+        self.min_silence_frames = int(min_silence * 1000 / FRAME_MS)
+        self.min_speech_frames = int(min_speech * 1000 / FRAME_MS)
+        self.max_segment_frames = int(max_segment * 1000 / FRAME_MS)
+        self.pad_frames = int(round(PADDING_SECONDS * 1000 / FRAME_MS))
+        self.position = 0  # Samples consumed, including the leftover
+        self._leftover = np.zeros(0, dtype=np.int16)
+        self._energies = np.zeros(0, dtype=np.float32)
+        self._preroll = []
+        self._frames = []
+        self._start = 0
+        self._speech_frames = 0
+        self._silent_frames = 0
+
+    def _threshold(self, energy_db):
+        window = int(self.NOISE_WINDOW_SECONDS * 1000 / FRAME_MS)
+        self._energies = np.concatenate((self._energies, energy_db))[-window:]
+        noise_floor = np.percentile(self._energies, 10)
+        return noise_floor, np.clip(noise_floor + NOISE_MARGIN_DB, MIN_THRESHOLD_DB, MAX_THRESHOLD_DB)
+
+    def _close(self, segments):
+        # Trailing silence beyond the padding carries no speech worth uploading.
+        frames = self._frames[:len(self._frames) - max(0, self._silent_frames - self.pad_frames)]
+        if self._speech_frames >= self.min_speech_frames:
+            segments.append((self._start, np.concatenate(frames)))
+        self._frames = []
+        self._speech_frames = 0
+        self._silent_frames = 0
+
+    def feed(self, samples):
+        samples = np.concatenate((self._leftover, np.asarray(samples, dtype=np.int16)))
+        count = len(samples) // self.frame
+        first = self.position - len(self._leftover)
+        self.position = first + len(samples)
+        self._leftover = samples[count * self.frame:]
+        if not count:
+            return []
+
+        energy_db, zcr, _ = frame_features(samples[:count * self.frame], self.rate)
+        noise_floor, threshold = self._threshold(energy_db)
+        speech = (energy_db > threshold) | ((energy_db > max(noise_floor + NOISE_MARGIN_DB / 2, MIN_THRESHOLD_DB))
+                                            & (zcr > UNVOICED_ZCR))
+        segments = []
+        for i in range(count):
+            frame = samples[i * self.frame:(i + 1) * self.frame]
+            if not self._frames:
+                if not speech[i]:
+                    self._preroll = (self._preroll + [frame])[-self.pad_frames:] if self.pad_frames else []
+                    continue
+                self._start = first + (i - len(self._preroll)) * self.frame
+                self._frames = self._preroll
+                self._preroll = []
+            self._frames.append(frame)
+            if speech[i]:
+                self._speech_frames += 1
+                self._silent_frames = 0
+            else:
+                self._silent_frames += 1
+            if self._silent_frames >= self.min_silence_frames or len(self._frames) >= self.max_segment_frames:
+                self._close(segments)
+        return segments
+
+    def finish(self):
+        segments = []
+        if self._frames:
+            self._close(segments)
+        return segments